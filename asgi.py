@@ -0,0 +1,5 @@
+# ASGI entry point - serve with e.g. gunicorn --worker-class uvicorn.workers.UvicornWorker asgi:app
+from main import create_app
+from utils.asgi import create_asgi_app
+
+app = create_asgi_app(create_app())
@@ -0,0 +1,252 @@
+"""Concurrent throughput of the read endpoints served as WSGI and as ASGI.
+
+Seeds the database, then starts the API twice with gunicorn and the same number of worker processes - sync
+workers running main:create_app() and uvicorn workers running asgi:app - and sends the same mix of GET
+requests to each, --concurrency at a time, reporting requests per second and p50/p95/p99 latency:
+
+    python benchmarks/asgi_benchmark.py --workers 2 --concurrency 1,16,64
+
+--database-url (or BENCHMARK_DATABASE_URL) picks the database, DATABASE_URL is never used so the app's own
+database can't be dropped. Without one it uses a SQLite file of its own in the temporary directory, seeded
+again on every run unless --no-seed is given; a database that is given is only dropped and seeded with
+--reseed. The async mode only pays off when queries wait on the network, so compare the modes against the
+PostgreSQL server the API really uses, or give SQLite a made up round trip with --db-latency-ms, which
+delays every statement inside the driver.
+The read cache is turned off in both servers unless --cache is given.
+"""
+import argparse
+import http.client
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from random import Random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+from sqlalchemy import select
+
+import config
+from main import create_app, db
+from commands import generate_dataset
+from models.users import User
+from models.employees import Employee
+from models.assets import Asset
+from models.service_job import ServiceJob
+from utils.passwords import hash_password
+
+# the benchmark's own database, used when none is given
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "asgi_benchmark.db")
+ADMIN_EMAIL = "benchmark-admin@email.com"
+ADMIN_PASSWORD = "password123"
+
+# the requests sent, with {asset}, {employee} and {service_job} replaced by seeded ids
+URLS = (
+    "/assets/?limit=50",
+    "/assets/{asset}/",
+    "/assets/service_job/{asset}",
+    "/assets/manufacturer/{asset}",
+    "/employees/?limit=50",
+    "/employees/{employee}/",
+    "/employees/manufacturer/{employee}",
+    "/service_job/{service_job}/",
+    "/departments/",
+    "/manufacturers/?limit=50",
+)
+# how each mode is started, with the port and number of workers filled in
+SERVERS = {
+    "wsgi": [sys.executable, "-m", "gunicorn", "--workers", "{workers}", "--bind", "127.0.0.1:{port}",
+             "--log-level", "warning", "{app}"],
+    "asgi": [sys.executable, "-m", "gunicorn", "--worker-class", "uvicorn.workers.UvicornWorker", "--workers", "{workers}",
+             "--bind", "127.0.0.1:{port}", "--log-level", "warning", "{app}"],
+}
+# the apps served, and the same apps on a SQLite database with a made up round trip
+APPS = {"wsgi": "main:create_app()", "asgi": "asgi:app"}
+SLOW_APPS = {"wsgi": "benchmarks.asgi_benchmark:slow_app('wsgi')", "asgi": "benchmarks.asgi_benchmark:slow_app('asgi')"}
+
+
+class SlowCursor(sqlite3.Cursor):
+    # a cursor whose statements take BENCHMARK_DB_LATENCY_MS longer, in the thread running them: the worker's
+    # own with pysqlite, aiosqlite's with the async engine - the same as waiting on a database server
+    def execute(self, *args):
+        time.sleep(float(os.environ["BENCHMARK_DB_LATENCY_MS"]) / 1000)
+        return super().execute(*args)
+
+
+class SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=SlowCursor):
+        return super().cursor(factory)
+
+
+def slow_app(mode):
+    # the app (for gunicorn) with both engines connecting through SlowConnection
+    options = {"connect_args": {"factory": SlowConnection}}
+    config.app_config.SQLALCHEMY_ENGINE_OPTIONS = options
+    config.app_config.ASYNC_ENGINE_OPTIONS = options
+    if mode == "wsgi":
+        return create_app()
+    from utils.asgi import create_asgi_app
+    return create_asgi_app(create_app())
+
+
+def free_port():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        return listener.getsockname()[1]
+
+
+def start_server(mode, workers, cache, latency):
+    port = free_port()
+    app = SLOW_APPS[mode] if latency else APPS[mode]
+    command = [part.format(workers=workers, port=port, app=app) for part in SERVERS[mode]]
+    environment = dict(os.environ)
+    if not cache:
+        environment["CACHE_BACKEND"] = "null"
+    if latency:
+        environment["BENCHMARK_DB_LATENCY_MS"] = str(latency)
+    server = subprocess.Popen(command, cwd=ROOT, env=environment)
+    # wait until it answers
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit("The %s server stopped: %s" % (mode, " ".join(command)))
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/departments/")
+            connection.getresponse().read()
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("The %s server didn't start: %s" % (mode, " ".join(command)))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_load(port, urls, headers, requests, concurrency):
+    # send the urls round robin from concurrency threads, each over its own keep-alive connection
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            with lock:
+                number = next(remaining, None)
+            if number is None:
+                break
+            started = time.perf_counter()
+            try:
+                connection.request("GET", urls[number % len(urls)], headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status != 200:
+                    errors.append(status)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--service-jobs", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-seed", action="store_true", help="use the data already in the database")
+    parser.add_argument("--database-url", default=os.environ.get("BENCHMARK_DATABASE_URL"),
+                        help="database to run against, BENCHMARK_DATABASE_URL by default, else a SQLite file of its own")
+    parser.add_argument("--reseed", action="store_true", help="drop every table of --database-url and seed it again")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes of each server")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma separated numbers of requests sent at a time")
+    parser.add_argument("--requests", type=int, default=2000, help="requests sent at each concurrency")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--cache", action="store_true", help="keep the read cache on")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="made up round trip added to every SQLite statement")
+    args = parser.parse_args()
+    if args.database_url is None:
+        args.database_url = DEFAULT_DATABASE_URL
+    elif not args.no_seed and not args.reseed:
+        sys.exit("Seeding drops every table of %s, give --reseed to do it or --no-seed to use its data" % args.database_url)
+    # the app here and the servers started below read the database url from the environment
+    os.environ["DATABASE_URL"] = args.database_url
+    if args.db_latency_ms and not os.environ["DATABASE_URL"].startswith("sqlite"):
+        sys.exit("--db-latency-ms only works with SQLite")
+
+    app = create_app()
+    with app.app_context():
+        if not args.no_seed:
+            db.drop_all()
+            db.create_all()
+            generate_dataset(20, args.employees, args.assets, args.service_jobs, 100, 1, args.seed)
+            db.session.add(User(email=ADMIN_EMAIL, password=hash_password(ADMIN_PASSWORD), admin=True))
+            db.session.commit()
+        ids = {
+            name: db.session.scalars(select(pk).order_by(pk).limit(1000)).all()
+            for name, pk in (("asset", Asset.asset_id), ("employee", Employee.employee_id),
+                             ("service_job", ServiceJob.service_job_id))
+        }
+    token = app.test_client().post("/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}).get_json()["token"]
+    headers = {"Authorization": "Bearer " + token}
+    random = Random(args.seed)
+    urls = [url.format(**{name: random.choice(values) for name, values in ids.items()})
+            for _ in range(50) for url in URLS]
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = {}
+    for mode in args.modes.split(","):
+        server, port = start_server(mode, args.workers, args.cache, args.db_latency_ms)
+        try:
+            # warm up the workers' pools and caches
+            run_load(port, urls, headers, len(urls), max(levels))
+            for concurrency in levels:
+                result = results[(mode, concurrency)] = run_load(port, urls, headers, args.requests, concurrency)
+                print("%-5s concurrency %4d  %8.1f req/s  p50 %8.2fms  p95 %8.2fms  p99 %8.2fms  %d errors" % (
+                    mode, concurrency, result["throughput_rps"], result["p50_ms"], result["p95_ms"],
+                    result["p99_ms"], result["errors"]))
+        finally:
+            server.terminate()
+            server.wait()
+    if "wsgi" in args.modes and "asgi" in args.modes:
+        for concurrency in levels:
+            print("concurrency %4d  asgi/wsgi throughput %.2fx" % (
+                concurrency, results[("asgi", concurrency)]["throughput_rps"] / results[("wsgi", concurrency)]["throughput_rps"]))
+
+
+if __name__ == "__main__":
+    main()
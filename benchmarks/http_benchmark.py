@@ -0,0 +1,359 @@
+"""HTTP benchmark for every route of the API.
+
+Boots create_app() against a seeded database, drives every route of the blueprints in
+controllers.registerable_controllers through the WSGI app and reports p50/p95/p99 latency,
+throughput and SQL queries per endpoint. Results are saved as JSON, and a previous results
+file can be given as the baseline to fail on regressions, e.g. in CI:
+
+    python benchmarks/http_benchmark.py --assets 20000 --output bench.json
+    python benchmarks/http_benchmark.py --assets 20000 --baseline bench.json --threshold 0.25
+
+--database-url (or BENCHMARK_DATABASE_URL) picks the database, DATABASE_URL is never used so the
+benchmark can't drop the app's own database. Without one it uses a SQLite file of its own in the
+temporary directory, dropped and seeded again on every run unless --no-seed is given. A database
+given with --database-url is only dropped and seeded with --reseed, otherwise use --no-seed.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+from sqlalchemy import event, select
+
+from main import create_app, db
+from commands import generate_dataset
+from controllers import registerable_controllers
+from models.users import User
+from models.departments import Department
+from models.employees import Employee
+from models.assets import Asset
+from models.service_job import ServiceJob
+from models.manufacturer import Manufacturer
+from utils.passwords import hash_password
+
+# the benchmark's own database, used when none is given
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "asset_benchmark.db")
+ADMIN_EMAIL = "benchmark-admin@email.com"
+ADMIN_PASSWORD = "password123"
+
+# the model whose ids fill an url argument - by argument name, or by blueprint for the plain "id"
+ARGUMENT_MODELS = {"asset_id": Asset, "employee_id": Employee, "department_id": Department}
+BLUEPRINT_MODELS = {"assets": Asset, "employees": Employee, "departments": Department,
+                    "service_jobs": ServiceJob, "manufacturers": Manufacturer}
+
+# query strings for the endpoints that need one
+QUERY_STRINGS = {"search.search_all": "q=bench"}
+
+# writes that remove rows run last, so the other endpoints see the whole dataset
+DESTRUCTIVE = ("DELETE",)
+# deletes go from the child tables up, so a cascade doesn't remove the rows a later delete was given
+DELETE_ORDER = ("service_jobs", "manufacturers", "assets", "employees", "departments")
+
+
+class Dataset(object):
+    # ids of the seeded rows, handed out to the requests that need them
+    def __init__(self, sample_size, seed):
+        self.random = Random(seed)
+        self.ids = {}
+        for model in (Department, Employee, Asset, ServiceJob, Manufacturer):
+            pk = model.__mapper__.primary_key[0]
+            self.ids[model] = db.session.scalars(select(pk).order_by(pk).limit(sample_size)).all()
+            if not self.ids[model]:
+                sys.exit("The %s table is empty, run without --no-seed" % model.__tablename__)
+        self.unique = count()
+        self.lock = threading.Lock()
+
+    def pick(self, model):
+        with self.lock:
+            return self.random.choice(self.ids[model])
+
+    def take(self, model):
+        # an id nobody else will use - for deletes
+        with self.lock:
+            return self.ids[model].pop() if len(self.ids[model]) > 1 else self.ids[model][0]
+
+    def number(self):
+        with self.lock:
+            return next(self.unique)
+
+
+def department_body(data):
+    return {"department_name": "Bench %d" % data.number(), "building_number": 1, "address": "1 Bench Road"}
+
+
+def employee_body(data):
+    number = data.number()
+    return {"first_name": "Bench", "last_name": "Mark", "email_address": "bench%d-%d@asset.com" % (os.getpid(), number),
+            "contact_number": 1900000000 + number, "room_number": 1, "position": "Analyst",
+            "department_id": data.pick(Department)}
+
+
+def asset_body(data):
+    return {"asset_name": "Bench", "serial_number": "b%07d" % data.number(), "date_purchased": "2015-06-01",
+            "employee_id": data.pick(Employee)}
+
+
+def service_job_body(data):
+    return {"service_description": "PM", "service_date": "2021-06-01", "asset_id": data.pick(Asset)}
+
+
+def manufacturer_body(data):
+    return {"manufacturer_name": "Bench", "manufacturer_contact_number": 1, "manufacturer_email": "bench@manufacturer.com",
+            "manufacturer_address": "1 Bench Road", "asset_id": data.pick(Asset)}
+
+
+def with_key(body_fn, model, key):
+    def body(data):
+        fields = body_fn(data)
+        fields[key] = data.pick(model)
+        return fields
+    return body
+
+
+def batch_of(body_fn, size):
+    return lambda data: [body_fn(data) for _ in range(size)]
+
+
+def request_bodies(batch_size):
+    # JSON body for every endpoint that needs one
+    bodies = {
+        "auth.auth_register": lambda data: {"email": "bench%d-%d@email.com" % (os.getpid(), data.number()), "password": "password123"},
+        "auth.auth_login": lambda data: {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD},
+    }
+    for blueprint, body_fn, model, key in (
+        ("departments", department_body, Department, "department_id"),
+        ("employees", employee_body, Employee, "employee_id"),
+        ("assets", asset_body, Asset, "asset_id"),
+        ("service_jobs", service_job_body, ServiceJob, "service_job_id"),
+        ("manufacturers", manufacturer_body, Manufacturer, "manufacturer_id"),
+    ):
+        bodies[(blueprint, "POST", False)] = body_fn
+        bodies[(blueprint, "PUT", False)] = body_fn
+        bodies[(blueprint, "POST", True)] = batch_of(body_fn, batch_size)
+        bodies[(blueprint, "PUT", True)] = batch_of(with_key(body_fn, model, key), batch_size)
+        bodies[(blueprint, "DELETE", True)] = lambda data, model=model: {"ids": [data.take(model) for _ in range(batch_size)]}
+        bodies["%s.lookup_%s" % (blueprint, blueprint)] = lambda data, model=model: {"ids": [data.pick(model) for _ in range(batch_size)]}
+    return bodies
+
+
+def find_body(bodies, rule, method):
+    blueprint = rule.endpoint.split(".")[0]
+    if rule.endpoint in bodies:
+        return bodies[rule.endpoint]
+    return bodies.get((blueprint, method, rule.rule.endswith("/batch")))
+
+
+def build_url(rule, method, data):
+    # fill the url arguments with seeded ids, deletes get an id of their own
+    blueprint = rule.endpoint.split(".")[0]
+    values = {}
+    for argument in rule.arguments:
+        model = ARGUMENT_MODELS.get(argument) or BLUEPRINT_MODELS[blueprint]
+        values[argument] = data.take(model) if method in DESTRUCTIVE else data.pick(model)
+    url = rule.build(values, append_unknown=False)[1]
+    return url + "?" + QUERY_STRINGS[rule.endpoint] if rule.endpoint in QUERY_STRINGS else url
+
+
+def routes(app):
+    # every (rule, method) of the registered controllers, the destructive ones last
+    names = {controller.name for controller in registerable_controllers}
+    found = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.split(".")[0] not in names:
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            found.append((rule, method))
+    def order(route):
+        rule, method = route
+        blueprint = rule.endpoint.split(".")[0]
+        if method not in DESTRUCTIVE:
+            return (0, 0, rule.endpoint, method)
+        return (1, DELETE_ORDER.index(blueprint) if blueprint in DELETE_ORDER else len(DELETE_ORDER), rule.endpoint, method)
+    return sorted(found, key=order)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def failed(response):
+    # a 4xx or 5xx, or a batch response that reports errors for some of its items
+    if response.status_code >= 400:
+        return True
+    body = response.get_json(silent=True)
+    return isinstance(body, dict) and bool(body.get("errors"))
+
+
+def run_route(app, rule, method, body_fn, data, token, requests, concurrency, query_counter):
+    local = threading.local()
+
+    def one(_):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        url = build_url(rule, method, data)
+        body = body_fn(data) if body_fn else None
+        query_counter.start()
+        started = time.perf_counter()
+        response = local.client.open(url, method=method, json=body, headers={"Authorization": "Bearer " + token})
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        return elapsed, query_counter.stop(), response.status_code, failed(response)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    latencies = [sample[0] * 1000 for sample in samples]
+    return {
+        "endpoint": rule.endpoint,
+        "method": method,
+        "rule": rule.rule,
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample[3]),
+        "statuses": sorted({sample[2] for sample in samples}),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": sum(latencies) / len(latencies),
+        "throughput_rps": len(samples) / wall if wall else None,
+        "queries_per_request": sum(sample[1] for sample in samples) / len(samples),
+    }
+
+
+class QueryCounter(object):
+    # counts the SQL statements each thread sends while it is timing a request
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, "before_cursor_execute", self.count)
+
+    def count(self, *args):
+        if getattr(self.local, "queries", None) is not None:
+            self.local.queries += 1
+
+    def start(self):
+        self.local.queries = 0
+
+    def stop(self):
+        queries, self.local.queries = self.local.queries, None
+        return queries
+
+
+def seed(args):
+    db.drop_all()
+    db.create_all()
+    generate_dataset(args.departments, args.employees, args.assets, args.service_jobs,
+                     args.manufacturers, args.users, args.seed)
+    db.session.add(User(email=ADMIN_EMAIL, password=hash_password(ADMIN_PASSWORD), admin=True))
+    db.session.commit()
+
+
+def compare(results, baseline_path, threshold):
+    # the endpoints whose p95 latency or query count went up by more than the threshold
+    with open(baseline_path) as baseline_file:
+        baseline = {(item["endpoint"], item["method"]): item for item in json.load(baseline_file)["results"]}
+    regressions = []
+    for item in results:
+        before = baseline.get((item["endpoint"], item["method"]))
+        if not before:
+            continue
+        if before["p95_ms"] and item["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append("%s %s p95 %.2fms -> %.2fms" % (item["method"], item["rule"], before["p95_ms"], item["p95_ms"]))
+        if item["queries_per_request"] > before["queries_per_request"] * (1 + threshold):
+            regressions.append("%s %s queries %.1f -> %.1f" % (item["method"], item["rule"], before["queries_per_request"], item["queries_per_request"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--departments", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--service-jobs", type=int, default=30000)
+    parser.add_argument("--manufacturers", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-seed", action="store_true", help="use the data already in the database")
+    parser.add_argument("--database-url", default=os.environ.get("BENCHMARK_DATABASE_URL"),
+                        help="database to run against, BENCHMARK_DATABASE_URL by default, else a SQLite file of its own")
+    parser.add_argument("--reseed", action="store_true", help="drop every table of --database-url and seed it again")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads sending requests at the same time")
+    parser.add_argument("--batch-size", type=int, default=50, help="items per batch endpoint request")
+    parser.add_argument("--sample-size", type=int, default=5000, help="seeded ids of each table used in urls")
+    parser.add_argument("--skip-writes", action="store_true", help="only benchmark GET endpoints")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline, 0.2 = 20%%")
+    args = parser.parse_args()
+    if args.database_url is None:
+        args.database_url = DEFAULT_DATABASE_URL
+    elif not args.no_seed and not args.reseed:
+        sys.exit("Seeding drops every table of %s, give --reseed to do it or --no-seed to use its data" % args.database_url)
+    # the app reads the database url when it is created
+    os.environ["DATABASE_URL"] = args.database_url
+
+    app = create_app()
+    with app.app_context():
+        if not args.no_seed:
+            seed(args)
+        data = Dataset(args.sample_size, args.seed)
+        query_counter = QueryCounter(db.engine)
+    token = app.test_client().post("/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}).get_json()["token"]
+
+    bodies = request_bodies(args.batch_size)
+    results = []
+    skipped = []
+    for rule, method in routes(app):
+        if args.skip_writes and method != "GET":
+            continue
+        body_fn = find_body(bodies, rule, method)
+        if method in ("POST", "PUT") and body_fn is None:
+            skipped.append("%s %s" % (method, rule.rule))
+            continue
+        result = run_route(app, rule, method, body_fn, data, token, args.requests, args.concurrency, query_counter)
+        results.append(result)
+        print("%-7s %-45s p50 %8.2fms  p95 %8.2fms  p99 %8.2fms  %8.1f req/s  %5.1f queries  %d errors" % (
+            method, rule.rule, result["p50_ms"], result["p95_ms"], result["p99_ms"],
+            result["throughput_rps"], result["queries_per_request"], result["errors"]))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0],
+        "dataset": {"departments": args.departments, "employees": args.employees, "assets": args.assets,
+                    "service_jobs": args.service_jobs, "manufacturers": args.manufacturers, "users": args.users},
+        "requests_per_endpoint": args.requests,
+        "concurrency": args.concurrency,
+        "skipped": skipped,
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print("Results saved to %s" % args.output)
+    for route in skipped:
+        print("No request body known for %s, skipped" % route)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Search time of the in-process trigram index used by /search without PostgreSQL.
+
+Builds the index from the database in DATABASE_URL, then runs each query --repeat times and reports the
+p50/p95/max time of a search and the number of results it found a place for:
+
+    flask db seed-large --assets 1000000 --manufacturers 1000000
+    python benchmarks/search_benchmark.py --repeat 20
+
+The queries cover the common cases: a name shared by a large part of the assets, a manufacturer, a part of
+a serial number, an employee's name and a text matching almost nothing - and "ufa", a few letters found
+inside a very large number of different names, the slow case of the index.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+from main import create_app, db
+from utils.search import MemoryIndex, SOURCES
+
+QUERIES = ("vanquish", "orbitrap", "thermo", "manufacturer 1234", "m0001234", "0001234", "tucker", "sonia", "zzzzzz", "ufa")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="times each query is run")
+    parser.add_argument("--limit", type=int, default=50, help="results per search")
+    parser.add_argument("--queries", default=",".join(QUERIES), help="comma separated queries")
+    args = parser.parse_args()
+
+    app = create_app()
+    # measure the index past the size the API builds it for
+    app.config["SEARCH_MEMORY_MAX_ROWS"] = sys.maxsize
+    with app.app_context():
+        index = MemoryIndex()
+        started = time.perf_counter()
+        with index.lock:
+            index.refresh(db.session)
+        # ru_maxrss is in kilobytes on Linux
+        print("index built in %.1fs, peak memory %dMB" % (time.perf_counter() - started,
+                                                          resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024))
+        worst = 0
+        for text in args.queries.split(","):
+            times = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results = index.search(db.session, text, list(SOURCES), args.limit)
+                times.append((time.perf_counter() - started) * 1000)
+            worst = max(worst, percentile(times, 0.95))
+            print("%-20s p50 %7.2fms  p95 %7.2fms  max %7.2fms  %d results" % (
+                text, percentile(times, 0.5), percentile(times, 0.95), max(times), len(results)))
+        print("slowest p95 %.2fms" % worst)
+
+
+if __name__ == "__main__":
+    main()
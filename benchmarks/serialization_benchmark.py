@@ -0,0 +1,102 @@
+"""Benchmark of the fast serialization path of the list endpoints.
+
+Sends the same list and export requests with FAST_SERIALIZATION off (ORM objects, marshmallow and jsonify)
+and on (plain column rows encoded with orjson), checks that both give exactly the same bytes and reports
+the time each takes:
+
+    python benchmarks/serialization_benchmark.py --assets 50000 --limit 500
+
+It runs on a SQLite file of its own in the temporary directory, dropped and seeded again every time.
+--database-url (or BENCHMARK_DATABASE_URL) picks another database, which is only dropped with --reseed.
+DATABASE_URL is never used, so the app's own database can't be dropped by accident.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+from main import create_app, db
+from commands import generate_dataset
+from models.users import User
+from utils import serialization
+from utils.passwords import hash_password
+
+# the benchmark's own database, used when none is given
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "serialization_benchmark.db")
+ADMIN_EMAIL = "benchmark-admin@email.com"
+ADMIN_PASSWORD = "password123"
+
+
+def time_request(client, url, headers, repeat):
+    # the body of the response and the mean seconds taken to get it
+    body = None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = client.get(url, headers=headers).get_data()
+    return body, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--assets", type=int, default=20000)
+    parser.add_argument("--service-jobs", type=int, default=40000)
+    parser.add_argument("--limit", type=int, default=500, help="rows per page of the list requests")
+    parser.add_argument("--repeat", type=int, default=20, help="times each request is sent")
+    parser.add_argument("--database-url", default=os.environ.get("BENCHMARK_DATABASE_URL"),
+                        help="database to run against, BENCHMARK_DATABASE_URL by default, else a SQLite file of its own")
+    parser.add_argument("--reseed", action="store_true", help="drop every table of --database-url and seed it again")
+    args = parser.parse_args()
+    if args.database_url is None:
+        args.database_url = DEFAULT_DATABASE_URL
+    elif not args.reseed:
+        sys.exit("The benchmark drops every table of %s and seeds it, give --reseed to do it" % args.database_url)
+    # the app reads the database url when it is created
+    os.environ["DATABASE_URL"] = args.database_url
+
+    app = create_app()
+    # debug mode indents the JSON, which the standard encoder always does - benchmark the production output
+    app.debug = False
+    app.config["MAX_PAGE_SIZE"] = max(app.config["MAX_PAGE_SIZE"], args.limit)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate_dataset(20, args.employees, args.assets, args.service_jobs, 100, 1)
+        db.session.add(User(email=ADMIN_EMAIL, password=hash_password(ADMIN_PASSWORD), admin=True))
+        db.session.commit()
+    client = app.test_client()
+    token = client.post("/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}).get_json()["token"]
+    headers = {"Authorization": "Bearer " + token}
+
+    urls = [
+        "/assets/?limit=%d" % args.limit,
+        "/assets/?limit=%d&sort=-date_purchased" % args.limit,
+        "/employees/?limit=%d" % args.limit,
+        "/service_job/?limit=%d&sort=service_date" % args.limit,
+        "/assets/?export=json",
+        "/service_job/?export=ndjson",
+    ]
+    print("orjson %s" % ("installed" if serialization.orjson is not None else "not installed, using the standard encoder"))
+    different = []
+    for url in urls:
+        results = {}
+        for fast in (False, True):
+            app.config["FAST_SERIALIZATION"] = fast
+            # a request first so both sides start warm
+            client.get(url, headers=headers)
+            results[fast] = time_request(client, url, headers, args.repeat)
+        if results[False][0] != results[True][0]:
+            different.append(url)
+        print("%-45s marshmallow %8.2fms  fast %8.2fms  %5.1fx faster  %s" % (
+            url, results[False][1] * 1000, results[True][1] * 1000, results[False][1] / results[True][1],
+            "same output" if url not in different else "DIFFERENT OUTPUT"))
+    if different:
+        sys.exit("The fast path changed the output of: " + ", ".join(different))
+
+
+if __name__ == "__main__":
+    main()
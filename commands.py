@@ -1,13 +1,21 @@
+import csv
+import io
+import time
+import click
+from random import Random
 from main import db
 from flask import Blueprint
 from main import bcrypt
+from sqlalchemy import func, insert, select, text
 from models.users import User
 from models.departments import Department
 from models.employees import Employee
 from models.assets import Asset
 from models.service_job import ServiceJob
 from models.manufacturer import Manufacturer
-from datetime import date
+from datetime import date, timedelta
+from utils import tracking, summary
+from utils.passwords import hash_password
 
 
 db_commands = Blueprint("db", __name__)
@@ -767,6 +775,166 @@ def seed_db():
     db.session.commit()
     print("Tables seeded (added)") 
 
+# names used to make up the large synthetic dataset
+FIRST_NAMES = ["Sonia", "Peter", "Mary", "John", "Linda", "David", "Susan", "James", "Karen", "Robert", "Amy", "Michael", "Nina", "Thomas", "Grace", "Daniel"]
+LAST_NAMES = ["Lorry", "Tucker", "Robertson", "Lam", "Lee", "Smith", "Nguyen", "Brown", "Wilson", "Taylor", "Martin", "White", "Walker", "Hall", "Young", "King"]
+POSITIONS = ["Manager", "Scientist", "Lab Technician", "Supervisor", "Analyst", "Researcher"]
+ASSET_NAMES = ["Vanquish", "Infinity", "Maldi", "8060NX", "Nexera", "QExactive", "Orbitrap", "Centrifuge", "Incubator", "Spectrophotometer", "Microscope", "Freezer"]
+ASSET_TYPES = ["HPLC", "LCMS", "GCMS", "Mass Spec", "Centrifuge", "Incubator", "Spectrophotometer", "Microscope", "Freezer"]
+MANUFACTURER_NAMES = ["Thermo", "Agilent", "Shimadzu", "Waters", "Bruker", "Sciex", "PerkinElmer", "Eppendorf", "Beckman", "Zeiss"]
+SERVICE_DESCRIPTIONS = ["PM", "Qualification", "Repair", "Calibration", "Relocation", "Software update"]
+
+
+def next_id(column):
+    # the new rows get ids after the ones already in the table
+    return (db.session.scalar(select(func.max(column))) or 0) + 1
+
+
+def write_rows(table, columns, rows, chunk_size):
+    # write the rows chunk by chunk - COPY on PostgreSQL, executemany everywhere else
+    connection = db.session.connection()
+    use_copy = connection.dialect.name == "postgresql"
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            count += write_chunk(connection, table, columns, chunk, use_copy)
+            chunk = []
+    if chunk:
+        count += write_chunk(connection, table, columns, chunk, use_copy)
+    if use_copy and count:
+        # COPY goes around the session, so record the change for the table versions and the read cache ourselves
+        tracking.record(db.session, [tracking.Change(table.name, None, "insert", frozenset())])
+    db.session.commit()
+    return count
+
+
+def write_chunk(connection, table, columns, chunk, use_copy):
+    if use_copy:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert("COPY %s (%s) FROM STDIN WITH (FORMAT csv)" % (table.name, ", ".join(columns)), buffer)
+        cursor.close()
+    else:
+        db.session.execute(insert(table), [dict(zip(columns, row)) for row in chunk])
+    return len(chunk)
+
+
+def reset_sequences(tables):
+    # the ids were given explicitly, so move the PostgreSQL sequences past them
+    connection = db.session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    for table in tables:
+        column = table.primary_key.columns.values()[0].name
+        connection.execute(text(
+            "SELECT setval(pg_get_serial_sequence('%s', '%s'), (SELECT COALESCE(MAX(%s), 1) FROM %s))" % (table.name, column, column, table.name)
+        ))
+    db.session.commit()
+
+
+def generate_dataset(departments, employees, assets, service_jobs, manufacturers, users, seed=1, chunk_size=10000):
+    # add a large, referentially consistent made up dataset to all six tables and return the number of rows per table.
+    # The asset summaries are made once at the end rather than after every chunk
+    with summary.deferred(db.session):
+        return write_dataset(departments, employees, assets, service_jobs, manufacturers, users, seed, chunk_size)
+
+
+def write_dataset(departments, employees, assets, service_jobs, manufacturers, users, seed, chunk_size):
+    random = Random(seed)
+    today = date.today()
+    counts = {}
+
+    # every user gets the same password, so it is hashed once
+    password = hash_password("password123")
+    first_user = next_id(User.id)
+    counts["users"] = write_rows(User.__table__, ("id", "email", "password", "admin"), (
+        (id, "user%d@email.com" % id, password, False) for id in range(first_user, first_user + users)
+    ), chunk_size)
+
+    first_department = next_id(Department.department_id)
+    department_ids = range(first_department, first_department + departments)
+    counts["departments"] = write_rows(Department.__table__, ("department_id", "department_name", "building_number", "address"), (
+        (id, "Department %d" % id, random.randint(1, 60), "%d Glen drive, Melbourne, VIC" % random.randint(1, 500))
+        for id in department_ids
+    ), chunk_size)
+
+    first_employee = next_id(Employee.employee_id)
+    employee_ids = range(first_employee, first_employee + employees)
+    # contact numbers are unique, so they are made from the id
+    first_contact = (db.session.scalar(select(func.max(Employee.contact_number))) or 0) + 1
+    def employee_rows():
+        for id in employee_ids:
+            first_name = random.choice(FIRST_NAMES)
+            last_name = random.choice(LAST_NAMES)
+            yield (id, first_name, last_name, "%s.%s%d@asset.com" % (first_name[0], last_name, id),
+                   first_contact + id - first_employee, random.randint(1, 400), random.choice(POSITIONS), random.choice(department_ids))
+    counts["employees"] = write_rows(Employee.__table__, ("employee_id", "first_name", "last_name", "email_address", "contact_number", "room_number", "position", "department_id"), employee_rows(), chunk_size)
+
+    first_asset = next_id(Asset.asset_id)
+    asset_ids = range(first_asset, first_asset + assets)
+    # the purchase dates are needed again for the service jobs, so they are worked out up front from the seed
+    def purchase_date(id):
+        return date(2000, 1, 1) + timedelta(days=Random(seed * 1000003 + id).randint(0, (today - date(2000, 1, 1)).days))
+    def asset_rows():
+        for id in asset_ids:
+            yield (id, random.choice(ASSET_NAMES), "%s%07d" % (chr(97 + id % 26), id), purchase_date(id),
+                   random.choice(ASSET_TYPES), random.choice(employee_ids))
+    counts["assets"] = write_rows(Asset.__table__, ("asset_id", "asset_name", "serial_number", "date_purchased", "asset_type", "employee_id"), asset_rows(), chunk_size)
+
+    # one manufacturer row per asset, the names come from a list of manufacturers companies
+    names = MANUFACTURER_NAMES + ["Manufacturer %d" % number for number in range(len(MANUFACTURER_NAMES), manufacturers)]
+    names = names[:max(manufacturers, 1)]
+    first_manufacturer = next_id(Manufacturer.manufacturer_id)
+    def manufacturer_rows():
+        for offset, asset_id in enumerate(asset_ids):
+            number = random.randrange(len(names))
+            yield (first_manufacturer + offset, names[number], 10000 + number, "contact%d@manufacturer.com" % number,
+                   "%d Tree Road, Sydney, NSW" % (number + 1), asset_id)
+    counts["manufacturers"] = write_rows(Manufacturer.__table__, ("manufacturer_id", "manufacturer_name", "manufacturer_contact_number", "manufacturer_email", "manufacturer_address", "asset_id"), manufacturer_rows(), chunk_size)
+
+    # service jobs on random assets, always after the asset was bought
+    first_service_job = next_id(ServiceJob.service_job_id)
+    def service_job_rows():
+        for offset in range(service_jobs if assets else 0):
+            asset_id = random.choice(asset_ids)
+            purchased = purchase_date(asset_id)
+            yield (first_service_job + offset, random.choice(SERVICE_DESCRIPTIONS),
+                   purchased + timedelta(days=random.randint(0, max((today - purchased).days, 0))), asset_id)
+    counts["service_jobs"] = write_rows(ServiceJob.__table__, ("service_job_id", "service_description", "service_date", "asset_id"), service_job_rows(), chunk_size)
+
+    reset_sequences([User.__table__, Department.__table__, Employee.__table__, Asset.__table__, Manufacturer.__table__, ServiceJob.__table__])
+    return counts
+
+
+# add a large made up dataset, for load testing, e.g. "flask db seed-large --assets 1000000"
+@db_commands .cli.command("seed-large")
+@click.option("--departments", default=50, help="number of departments")
+@click.option("--employees", default=5000, help="number of employees")
+@click.option("--assets", default=100000, help="number of assets, each with one manufacturer row")
+@click.option("--service-jobs", default=300000, help="number of service jobs")
+@click.option("--manufacturers", default=600, help="number of different manufacturer names")
+@click.option("--users", default=100, help="number of (non admin) users, all with the password password123")
+@click.option("--seed", default=1, help="random seed, the same seed makes the same data")
+@click.option("--chunk-size", default=10000, help="rows written per statement")
+def seed_large_db(departments, employees, assets, service_jobs, manufacturers, users, seed, chunk_size):
+    started = time.monotonic()
+    counts = generate_dataset(departments, employees, assets, service_jobs, manufacturers, users, seed, chunk_size)
+    for table, count in counts.items():
+        print("%s: %d rows" % (table, count))
+    print("Tables seeded in %.1f seconds" % (time.monotonic() - started))
+
+# make the asset summary table again from the other tables, e.g. after loading data around the app
+@db_commands .cli.command("rebuild-summary")
+def rebuild_summary():
+    started = time.monotonic()
+    count = summary.rebuild_summaries(db.session)
+    db.session.commit()
+    print("Asset summary rebuilt with %d rows in %.1f seconds" % (count, time.monotonic() - started))
+
 # drop all the tables
 @db_commands .cli.command("drop")
 def drop_db():
@@ -4,6 +4,56 @@ class Config(object):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # access to .env and get the value of SECRET_KEY, the variable name can be any but needs to match
     JWT_SECRET_KEY =  os.environ.get("SECRET_KEY")
+    # default and maximum number of rows returned by one page of a collection endpoint
+    PAGE_SIZE = int(os.environ.get("PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 500))
+    # number of rows read from the database cursor at a time by the streaming exports
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+    # most items accepted by one batch request, and the number written per transaction
+    BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 5000))
+    BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 500))
+    # read cache for the single item endpoints: "simple" (in each worker), "redis" (shared) or "null" (off)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "simple")
+    CACHE_TTL = int(os.environ.get("CACHE_TTL", 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # bcrypt cost for new password hashes, stored hashes with another cost are rehashed at the next login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+    # processes doing the bcrypt work (0 runs it in the request thread), how many requests may wait for them
+    # and how many seconds they wait before getting a 503
+    BCRYPT_POOL_SIZE = int(os.environ.get("BCRYPT_POOL_SIZE", 2))
+    BCRYPT_MAX_PENDING = int(os.environ.get("BCRYPT_MAX_PENDING", 16))
+    BCRYPT_QUEUE_TIMEOUT = float(os.environ.get("BCRYPT_QUEUE_TIMEOUT", 5))
+    # seconds a worker trusts the admin flag it read from the users table, an admin token is checked against it
+    # so a demoted or deleted admin loses access within this time (at once on the worker that changed the user)
+    ADMIN_CHECK_SECONDS = float(os.environ.get("ADMIN_CHECK_SECONDS", 30))
+    # read list pages and exports as plain column rows and encode them with orjson when it gives the same output
+    FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "true").lower() == "true"
+    # days between services used by /assets/service_due when the request doesn't give interval_days
+    SERVICE_INTERVAL_DAYS = int(os.environ.get("SERVICE_INTERVAL_DAYS", 365))
+    # how /search finds matches: "postgres" (pg_trgm indexes), "memory" (an index kept in each worker) or
+    # "auto" (postgres on PostgreSQL, memory on anything else)
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")
+    # most rows of the searched tables the memory index is built from, searches get a 503 above it
+    SEARCH_MEMORY_MAX_ROWS = int(os.environ.get("SEARCH_MEMORY_MAX_ROWS", 100000))
+    # count and time the SQL queries of each request, reported in a Server-Timing header and the log,
+    # and warn about requests running more queries than the budget
+    INSTRUMENTATION = os.environ.get("INSTRUMENTATION", "false").lower() == "true"
+    QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", 10))
+    # ASGI mode (asgi.py): the database url of the asyncio engine serving the read requests, made from
+    # DATABASE_URL with the asyncpg (or aiosqlite) driver when not set, and the threads serving the rest
+    ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+    ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 10))
+    # read replicas of the database, comma separated. GET requests read from them in turn, skipping the ones
+    # that are down (checked every REPLICA_HEALTH_INTERVAL seconds by a thread in each worker), and a client's GET
+    # requests go to the primary for REPLICA_STICKY_SECONDS after its own write so it sees it
+    REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    REPLICA_HEALTH_INTERVAL = float(os.environ.get("REPLICA_HEALTH_INTERVAL", 10))
+    REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+    @property
+    def SQLALCHEMY_BINDS(self):
+        # an engine for each replica, replica_0, replica_1, ... with the same engine options as the primary
+        return {"replica_%d" % number: url for number, url in enumerate(self.REPLICA_URLS)}
     @property
     def SQLALCHEMY_DATABASE_URI(self):
         # access to .env and get the value of DATABASE_URL, the variable name can be any but needs to match
@@ -18,10 +68,55 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
-    pass
+    # the pg_trgm indexes, production runs on PostgreSQL and the memory index doesn't scale to it
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "postgres")
+    @property
+    def SQLALCHEMY_ENGINE_OPTIONS(self):
+        # connection pool and driver settings, each one can be changed with an environment variable
+        return {
+            # connections kept open, and extra ones allowed when they are all in use
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+            # seconds to wait for a free connection before giving up
+            "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+            # replace connections older than this many seconds
+            "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+            # test each connection when it is taken from the pool, so connections left over from before a failover are replaced
+            "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+            # options passed to psycopg2 when connecting
+            "connect_args": {
+                "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 10)),
+                "application_name": os.environ.get("DB_APPLICATION_NAME", "lab-asset-api"),
+                # cancel any statement running longer than this many milliseconds
+                "options": "-c statement_timeout=%d" % int(os.environ.get("DB_STATEMENT_TIMEOUT", 30000)),
+                # detect dead connections that would otherwise hang
+                "keepalives": 1,
+                "keepalives_idle": int(os.environ.get("DB_KEEPALIVES_IDLE", 30)),
+                "keepalives_interval": 10,
+                "keepalives_count": 5,
+            },
+        }
+
+    @property
+    def ASYNC_ENGINE_OPTIONS(self):
+        # the same pool for the asyncio engine of ASGI mode, with the driver settings asyncpg understands
+        options = dict(self.SQLALCHEMY_ENGINE_OPTIONS)
+        options["connect_args"] = {
+            "timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 10)),
+            "server_settings": {
+                "application_name": os.environ.get("DB_APPLICATION_NAME", "lab-asset-api"),
+                "statement_timeout": str(int(os.environ.get("DB_STATEMENT_TIMEOUT", 30000))),
+            },
+        }
+        return options
 
 class TestingConfig(Config):
     TESTING = True
+    # every request goes to the database so one test can't see another test's data
+    CACHE_BACKEND = "null"
+    # cheap password hashing done in the request thread, so tests stay fast
+    BCRYPT_LOG_ROUNDS = 4
+    BCRYPT_POOL_SIZE = 0
 
 environment = os.environ.get("FLASK_ENV")
 
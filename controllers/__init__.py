@@ -4,6 +4,11 @@ from controllers.employee_controller import employees
 from controllers.asset_controller import assets
 from controllers.service_job_controller import service_job
 from controllers.manufacturer_controller import manufacturers
+from controllers.status_controller import status
+from controllers.metrics_controller import metrics
+from controllers.report_controller import reports
+from controllers.search_controller import searches
+from controllers.change_controller import changes
 
 registerable_controllers = [
     auth,
@@ -12,4 +17,9 @@ registerable_controllers = [
     assets,
     service_job,
     manufacturers,
+    status,
+    metrics,
+    reports,
+    searches,
+    changes,
 ]
\ No newline at end of file
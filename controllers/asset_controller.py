@@ -1,16 +1,54 @@
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, jsonify, request, abort, current_app
 from main import db
 from models.assets import Asset
-from models.users import User
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from models.asset_summary import AssetSummary
+from models.employees import Employee
+from models.departments import Department
 from schemas.asset_schema import asset_schema, assets_schema
+from schemas.asset_summary_schema import asset_summaries_schema
+from utils.pagination import paginate, page_limit, after_position, encode_cursor
+from utils.serialization import json_response
+from utils.lookup import lookup
+from utils.projection import project, column_options
+from utils.includes import include
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, row_tag, children_tag
+from utils.filters import apply_filters, sort_column, parse_value
+from utils.streaming import export_format, stream_export
 from werkzeug.exceptions import BadRequest
 from sqlalchemy.exc import DataError, IntegrityError
 from marshmallow import ValidationError
-from datetime import date
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from utils.auth import admin_required
+# keeps the asset summary table up to date on every write
+from utils import summary
+from utils.bulk import batch_items, batch_ids, validate_items, bulk_insert, bulk_update, bulk_delete
 
 assets = Blueprint('assets', __name__, url_prefix="/assets")
 
+# query string filters for the assets collection - parameter: (column, comparison)
+ASSET_FILTERS = {
+    "asset_type": (Asset.asset_type, "eq"),
+    "employee_id": (Asset.employee_id, "eq"),
+    "date_purchased_from": (Asset.date_purchased, "ge"),
+    "date_purchased_to": (Asset.date_purchased, "le"),
+}
+# columns the assets collection can be sorted by
+ASSET_SORTS = ("date_purchased",)
+# query string filters and sorts for the asset summaries
+SUMMARY_FILTERS = {
+    "asset_type": (AssetSummary.asset_type, "eq"),
+    "employee_id": (AssetSummary.employee_id, "eq"),
+    "department_id": (AssetSummary.department_id, "eq"),
+    "last_service_from": (AssetSummary.last_service_date, "ge"),
+    "last_service_to": (AssetSummary.last_service_date, "le"),
+}
+SUMMARY_SORTS = ("last_service_date",)
+
 # error handler for validation error in marshmallow
 @assets.errorhandler(ValidationError)
 def handle_validation_error(error):
@@ -20,31 +58,62 @@ def handle_validation_error(error):
 
 # The GET route endpoint - get all the assets
 @assets.route("/", methods=["GET"])
+@conditional(Asset, includes=Asset)
 def get_assets():
-    # get all the assets from the database table
-    assets_list = Asset.query.all()
-    # Convert the assets from the database into a JSON format and store them in result
-    result = assets_schema.dump(assets_list)
+    # get the assets with the ids in the query string instead, e.g. ids=1,2,3
+    if "ids" in request.args:
+        return json_response(lookup(Asset.asset_id, assets_schema))
+    # only keep the assets matching the filters in the query string
+    query = apply_filters(Asset.query, ASSET_FILTERS)
+    # stream the whole table instead when an export is asked for
+    export = export_format()
+    if export:
+        return stream_export(query, Asset.asset_id, asset_schema, export)
+    # get one page of assets from the database table and convert them into a JSON format
+    result = paginate(query, Asset.asset_id, assets_schema, sort=sort_column(Asset, ASSET_SORTS))
+    # add the related rows asked for with the include parameter
+    included = include(result["data"], Asset)
+    if included is not None:
+        result["included"] = included
     # return the data in JSON format
-    return jsonify(result)
+    return json_response(result)
+
+# The POST route endpoint - get many assets by id, for more ids than fit in a query string
+@assets.route("/lookup", methods=["POST"])
+def lookup_assets():
+    # {"ids": [...]} in the body, answered like the GET with ids=
+    return json_response(lookup(Asset.asset_id, assets_schema))
 
 # The GET routes endpoint - get details on one asset
 @assets.route("/<int:id>/", methods=["GET"])
+@conditional(Asset, includes=Asset)
+@cached
 def get_asset(id):
-    asset = Asset.query.get(id)
+    cache_tags(row_tag("assets", id))
+    # only read and send the fields asked for with the fields parameter
+    schema = project(asset_schema)
+    asset = db.session.get(Asset, id, options=[column_options(Asset, schema)])
     #return an error if the card doesn't exist
     if not asset:
         return jsonify({'error': 'Asset not found'})
     # Convert the cards from the database into a JSON format and store them in result
-    result = asset_schema.dump(asset)
+    result = schema.dump(asset)
+    # with the include parameter the asset comes as data, next to its related rows
+    included = include([result], Asset)
+    if included is not None:
+        return json_response({"data": result, "included": included})
     # return the data in JSON format
     return jsonify(result)
 
 # The GET routes endpoint - get manufacturer for asset
 @assets.route('/manufacturer/<int:asset_id>', methods=["GET"])
+@conditional(Asset, Manufacturer)
+@cached
 def manufacturer_assets (asset_id):
-    # check if asset exists
-    asset = Asset.query.get(asset_id)
+    # the response changes with the asset or any manufacturer pointing to it
+    cache_tags(row_tag("assets", asset_id), children_tag("assets", asset_id, "manufacturers"))
+    # check if asset exists, loading its manufacturers in one extra query
+    asset = db.session.get(Asset, asset_id, options=[selectinload(Asset.manufacturer_id)])
     # return error if asset doesnt exist
     if not asset:
         return jsonify({'error': 'Asset not found'})
@@ -59,11 +128,77 @@ def manufacturer_assets (asset_id):
     asset_dict = {'manufacturers': manufacturer_dict_list, 'asset_id': asset.asset_id, 'asset_name': asset.asset_name, 'serial_number':asset.serial_number }
     return jsonify(asset_dict)
 
+# The GET routes endpoint - when every asset is next due for service
+@assets.route('/service_due', methods=["GET"])
+# overdue is worked out from today's date
+@conditional(Asset, ServiceJob, daily=True)
+def service_due():
+    # days between services, from the query string or the configured default
+    interval_days = request.args.get("interval_days", current_app.config["SERVICE_INTERVAL_DAYS"], type=int)
+    if interval_days < 1:
+        return abort(400, description="interval_days must be a positive number")
+    interval = timedelta(days=interval_days)
+    limit = page_limit()
+    # the page of assets is picked first, in asset_id order from the cursor, so only the service jobs of the
+    # assets on it are read - however far into the table the page is
+    query = db.session.query(Asset.asset_id, Asset.asset_name, Asset.serial_number, Asset.date_purchased)
+    query = apply_filters(query, ASSET_FILTERS)
+    due_before = request.args.get("due_before")
+    if due_before:
+        # an asset that was never serviced is due one interval after it was bought. The latest service of
+        # each asset looked at is one lookup in the (asset_id, service_date) index
+        latest = select(func.max(ServiceJob.service_date)).where(ServiceJob.asset_id == Asset.asset_id).scalar_subquery()
+        cutoff = parse_value(Asset.date_purchased, due_before, "due_before") - interval
+        query = query.filter(func.coalesce(latest, Asset.date_purchased) <= cutoff)
+    after = request.args.get("after")
+    if after:
+        query = after_position(query, Asset.asset_id, None, after)
+    assets = query.order_by(Asset.asset_id).limit(limit + 1).all()
+    next_cursor = None
+    if len(assets) > limit:
+        assets = assets[:limit]
+        next_cursor = encode_cursor(assets[-1].asset_id)
+    # the latest service and the number of services of every asset on the page, in one grouped query
+    services = {row.asset_id: row for row in db.session.query(
+        ServiceJob.asset_id,
+        func.max(ServiceJob.service_date).label("service_date"),
+        func.count().label("service_count"),
+    ).filter(ServiceJob.asset_id.in_([asset.asset_id for asset in assets])).group_by(ServiceJob.asset_id)} if assets else {}
+    today = date.today()
+    data = []
+    for asset in assets:
+        service = services.get(asset.asset_id)
+        last_service = service.service_date if service else None
+        next_due = (last_service or asset.date_purchased) + interval
+        data.append({
+            "asset_id": asset.asset_id,
+            "asset_name": asset.asset_name,
+            "serial_number": asset.serial_number,
+            "last_service_date": last_service,
+            "service_count": service.service_count if service else 0,
+            "next_due_date": next_due,
+            "overdue": next_due < today,
+        })
+    return json_response({"data": data, "next": next_cursor, "interval_days": interval_days})
+
+# The GET routes endpoint - every asset with its owner, department, manufacturers and last service in one row
+@assets.route('/summary', methods=["GET"])
+@conditional(Asset, Employee, Department, Manufacturer, ServiceJob)
+def get_asset_summaries():
+    # read from the asset summary table, kept up to date by utils.summary, instead of joining five tables
+    query = apply_filters(AssetSummary.query, SUMMARY_FILTERS)
+    result = paginate(query, AssetSummary.asset_id, asset_summaries_schema, sort=sort_column(AssetSummary, SUMMARY_SORTS))
+    return json_response(result)
+
 # The GET routes endpoint - get service jobs for asset
 @assets.route('/service_job/<int:asset_id>', methods=["GET"])
+@conditional(Asset, ServiceJob)
+@cached
 def service_job_assets (asset_id):
-    # check if asset exists
-    asset = Asset.query.get(asset_id)
+    # the response changes with the asset or any service job pointing to it
+    cache_tags(row_tag("assets", asset_id), children_tag("assets", asset_id, "service_jobs"))
+    # check if asset exists, loading its service jobs in one extra query
+    asset = db.session.get(Asset, asset_id, options=[selectinload(Asset.service_job_id)])
     # return error if asset doesnt exist
     if not asset:
         return jsonify({'error': 'Asset not found'})
@@ -81,18 +216,8 @@ def service_job_assets (asset_id):
 
 # The POST route endpoint - add a asset
 @assets.route("/", methods=["POST"])
-@jwt_required()
+@admin_required
 def create_asset():
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     try:
         #Create a new asset
         asset_fields = asset_schema.load(request.json)
@@ -119,20 +244,10 @@ def create_asset():
 
 # The PUT route endpoint - update asset details
 @assets.route("/<int:id>/", methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_asset(id):
     # Create a new asset
     asset_fields = asset_schema.load(request.json)
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the asset
     asset = Asset.query.filter_by(asset_id=id).first()
     #return an error if the asset doesn't exist
@@ -163,18 +278,8 @@ def update_asset(id):
 
 # The DELETE route endpoint - delete a asset
 @assets.route("/<int:id>/", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_asset(id):
-    #get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    #Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return abort(401, description="Invalid user")
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return abort(401, description="Unauthorised user")
     # find the asset
     asset = Asset.query.filter_by(asset_id=id).first()
     #return an error if the asset doesn't exist
@@ -185,3 +290,29 @@ def delete_asset(id):
     db.session.commit()
     #return the asset in the response
     return jsonify("Asset deleted",asset_schema.dump(asset))
+
+
+# The POST route endpoint - add many assets at once
+@assets.route("/batch", methods=["POST"])
+@admin_required
+def create_assets_batch():
+    # validate every asset in the array, keeping the errors of the bad ones under their index
+    items, errors = validate_items(assets_schema, Asset, batch_items())
+    # insert the good ones in chunks
+    created = bulk_insert(Asset, items, errors)
+    return jsonify({"created": created, "errors": errors})
+
+# The PUT route endpoint - update many assets at once, each item needs its asset_id
+@assets.route("/batch", methods=["PUT"])
+@admin_required
+def update_assets_batch():
+    items, errors = validate_items(assets_schema, Asset, batch_items(), require_key=True)
+    updated = bulk_update(Asset, items, errors)
+    return jsonify({"updated": updated, "errors": errors})
+
+# The DELETE route endpoint - delete many assets at once, sent as {"ids": [...]}
+@assets.route("/batch", methods=["DELETE"])
+@admin_required
+def delete_assets_batch():
+    deleted, missing = bulk_delete(Asset, batch_ids())
+    return jsonify({"deleted": deleted, "missing": missing})
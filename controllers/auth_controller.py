@@ -4,8 +4,9 @@ from models.users import User
 from schemas.user_schema import user_schema
 from marshmallow import ValidationError
 from datetime import timedelta
-from main import bcrypt
+from utils.passwords import hash_password, check_password, needs_rehash
 from flask_jwt_extended import create_access_token
+from utils.auth import admin_claims
 
 auth = Blueprint('auth', __name__, url_prefix="/auth")
 
@@ -30,7 +31,7 @@ def auth_register():
     #Add the email attribute
     user.email = user_fields["email"]
     #Add the password attribute hashed by bcrypt
-    user.password = bcrypt.generate_password_hash(user_fields["password"]).decode("utf-8")
+    user.password = hash_password(user_fields["password"])
     #set the admin attribute to false
     user.admin = False
     #Add it to the database and commit the changes
@@ -38,8 +39,8 @@ def auth_register():
     db.session.commit()
     #create a variable that sets an expiry date
     expiry = timedelta(days=1)
-    #create the access token
-    access_token = create_access_token(identity=str(user.id), expires_delta=expiry)
+    #create the access token, with the admin flag as a claim
+    access_token = create_access_token(identity=str(user.id), additional_claims=admin_claims(user), expires_delta=expiry)
     # return the user email and the access token
     return jsonify({"user":user.email, "token": access_token })
 
@@ -51,11 +52,15 @@ def auth_login():
     #find the user in the database by email
     user = User.query.filter_by(email=user_fields["email"]).first()
     # there is not a user with that email or if the password is no correct send an error
-    if not user or not bcrypt.check_password_hash(user.password, user_fields["password"]):
+    if not user or not check_password(user.password, user_fields["password"]):
         return abort(401, description="Incorrect username and password")
+    # the password is known now, so move the hash to the configured cost if it was made with another one
+    if needs_rehash(user.password):
+        user.password = hash_password(user_fields["password"])
+        db.session.commit()
     #create a variable that sets an expiry date
     expiry = timedelta(days=1)
-    #create the access token
-    access_token = create_access_token(identity=str(user.id), expires_delta=expiry)
+    #create the access token, with the admin flag as a claim
+    access_token = create_access_token(identity=str(user.id), additional_claims=admin_claims(user), expires_delta=expiry)
     # return the user email and the access token
     return jsonify({"user":user.email, "token": access_token })
\ No newline at end of file
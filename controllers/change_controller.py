@@ -0,0 +1,26 @@
+from flask import Blueprint
+from models.departments import Department
+from models.employees import Employee
+from models.assets import Asset
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, table_tag
+from utils.pagination import page_limit, encode_cursor
+from utils.serialization import json_response
+# writes every change of the entity tables to the change log
+from utils.changes import FEED_TABLES, requested_tables, requested_position, last_position, changes_since
+
+changes = Blueprint('changes', __name__, url_prefix="/changes")
+
+# The GET route endpoint - what changed in the entity tables since the since token, for clients keeping a copy
+@changes.route("/", methods=["GET"])
+@conditional(Department, Employee, Asset, Manufacturer, ServiceJob)
+@cached
+def get_changes():
+    cache_tags(*[table_tag(table) for table in FEED_TABLES])
+    position = requested_position()
+    # without a token, only the token of the latest change - take it before downloading everything
+    if position is None:
+        return json_response({"changes": {}, "reset": [], "next": encode_cursor(last_position()), "more": False})
+    return json_response(changes_since(position, requested_tables(), page_limit()))
@@ -1,13 +1,22 @@
 from flask import Blueprint, jsonify, request, abort
 from main import db
 from models.departments import Department
-from models.users import User
+from models.employees import Employee
+from models.assets import Asset
 from werkzeug.exceptions import BadRequest
 from marshmallow import ValidationError
 from sqlalchemy.exc import DataError, IntegrityError
 from schemas.department_schema import department_schema, departments_schema
+from utils.pagination import paginate
+from utils.serialization import json_response
+from utils.lookup import lookup
+from utils.projection import project, column_options
+from utils.includes import include
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, row_tag, children_tag
 from datetime import date
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
+from utils.auth import admin_required
 
 departments = Blueprint('departments', __name__ , url_prefix="/departments")
 
@@ -20,36 +29,66 @@ def handle_validation_error(error):
 
 # The GET route endpoint - get all the departments
 @departments.route("/", methods=["GET"])
+@conditional(Department, includes=Department)
 def get_departments():
-    # get all the departments from the database table
-    departments_list = Department.query.all()
-    # # Convert the departments from the database into a JSON format and store them in result
-    result = departments_schema.dump(departments_list)
+    # get the departments with the ids in the query string instead, e.g. ids=1,2,3
+    if "ids" in request.args:
+        return json_response(lookup(Department.department_id, departments_schema))
+    # get one page of departments from the database table and convert them into a JSON format
+    result = paginate(Department.query, Department.department_id, departments_schema)
+    # add the related rows asked for with the include parameter
+    included = include(result["data"], Department)
+    if included is not None:
+        result["included"] = included
     # return the data in JSON format
     # return jsonify(result)
-    return jsonify(result)
+    return json_response(result)
+
+# The POST route endpoint - get many departments by id, for more ids than fit in a query string
+@departments.route("/lookup", methods=["POST"])
+def lookup_departments():
+    # {"ids": [...]} in the body, answered like the GET with ids=
+    return json_response(lookup(Department.department_id, departments_schema))
 
 # The GET routes endpoint - get details on one department
 @departments.route("/<int:id>/", methods=["GET"])
+@conditional(Department, includes=Department)
+@cached
 def get_department(id):
-    department = Department.query.get(id)
+    cache_tags(row_tag("departments", id))
+    # only read and send the fields asked for with the fields parameter
+    schema = project(department_schema)
+    department = db.session.get(Department, id, options=[column_options(Department, schema)])
     #return an error if the department doesn't exist
     if not department:
         return jsonify({'error': 'Department not found'}), 400
     # Convert the departments from the database into a JSON format and store them in result
-    result = department_schema.dump(department)
+    result = schema.dump(department)
+    # with the include parameter the department comes as data, next to its related rows
+    included = include([result], Department)
+    if included is not None:
+        return json_response({"data": result, "included": included})
     # return the data in JSON format
     return jsonify(result)
 
 # The GET routes endpoint - get all assets in a department
 @departments.route('/assets/<int:department_id>', methods=["GET"])
+@conditional(Department, Employee, Asset)
+@cached
 def employee_assets (department_id):
-    department = Department.query.get(department_id)
+    # the response changes with the department, the employees pointing to it and the assets pointing to them
+    cache_tags(row_tag("departments", department_id), children_tag("departments", department_id, "employees"))
+    # load the department, its employees and their assets with one query per level
+    department = db.session.get(Department, department_id, options=[
+        selectinload(Department.employees).selectinload(Employee.assets)
+    ])
     if not department:
         return jsonify({'error': 'Department not found'}), 400
     assets_dict_list = []
     for employee in department.employees:
+        cache_tags(children_tag("employees", employee.employee_id, "assets"))
         for asset in employee.assets:
+            cache_tags(row_tag("assets", asset.asset_id))
             asset_dict = {'asset_id': asset.asset_id, 'asset_name': asset.asset_name, 'serial_number':asset.serial_number}
             assets_dict_list.append(asset_dict)
     department_dict = {'department_id': department.department_id, 'department_name': department.department_name,'assets': assets_dict_list}
@@ -57,7 +96,7 @@ def employee_assets (department_id):
 
 # The POST route endpoint - add a department
 @departments.route("/", methods=["POST"])
-@jwt_required()
+@admin_required
 def create_department():
     department_fields = department_schema.load(request.json)
 
@@ -87,20 +126,10 @@ def create_department():
         
 # The PUT route endpoint - update department details
 @departments.route("/<int:id>/", methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_department(id):
     # Create a new department
     department_fields = department_schema.load(request.json)
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # # Find it in the db
-    user = User.query.get(user_id)
-    # #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the department
     department = Department.query.filter_by(department_id=id).first()
     #return an error if the department doesn't exist
@@ -129,18 +158,8 @@ def update_department(id):
 
 # The DELETE route endpoint - delete a department
 @departments.route("/<int:id>/", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_department(id):
-    #get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    #Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the department
     department = Department.query.filter_by(department_id=id).first()
     #return an error if the department doesn't exist
@@ -1,16 +1,34 @@
 from flask import Blueprint, jsonify, request, abort
 from main import db
 from models.employees import Employee
-from models.users import User
+from models.assets import Asset
+from models.manufacturer import Manufacturer
 from marshmallow import ValidationError
 from sqlalchemy.exc import IntegrityError, DataError
 from werkzeug.exceptions import BadRequest
 from schemas.employee_schema import employee_schema, employees_schema
+from utils.pagination import paginate
+from utils.serialization import json_response
+from utils.lookup import lookup
+from utils.projection import project, column_options
+from utils.includes import include
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, row_tag, children_tag
+from utils.filters import apply_filters, sort_column
 from datetime import date
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
+from utils.auth import admin_required
+from utils.bulk import batch_items, batch_ids, validate_items, bulk_insert, bulk_update, bulk_delete
 
 employees = Blueprint('employees', __name__, url_prefix="/employees")
 
+# query string filters for the employees collection - parameter: (column, comparison)
+EMPLOYEE_FILTERS = {
+    "department_id": (Employee.department_id, "eq"),
+}
+# columns the employees collection can be sorted by
+EMPLOYEE_SORTS = ("last_name",)
+
 
 # error handler for validation error in marshmallow
 @employees.errorhandler(ValidationError)
@@ -21,31 +39,54 @@ def handle_validation_error(error):
 
 # The GET route endpoint - get all the employees
 @employees.route("/", methods=["GET"])
+@conditional(Employee, includes=Employee)
 def get_employees():
-    # get all the employees from the database table
-    employees_list = Employee.query.all()
-    # Convert the employees from the database into a JSON format and store them in result
-    result = employees_schema.dump(employees_list)
+    # get the employees with the ids in the query string instead, e.g. ids=1,2,3
+    if "ids" in request.args:
+        return json_response(lookup(Employee.employee_id, employees_schema))
+    # only keep the employees matching the filters in the query string
+    query = apply_filters(Employee.query, EMPLOYEE_FILTERS)
+    # get one page of employees from the database table and convert them into a JSON format
+    result = paginate(query, Employee.employee_id, employees_schema, sort=sort_column(Employee, EMPLOYEE_SORTS))
+    # add the related rows asked for with the include parameter
+    included = include(result["data"], Employee)
+    if included is not None:
+        result["included"] = included
     # return the data in JSON format
-    return jsonify(result)
+    return json_response(result)
+
+# The POST route endpoint - get many employees by id, for more ids than fit in a query string
+@employees.route("/lookup", methods=["POST"])
+def lookup_employees():
+    # {"ids": [...]} in the body, answered like the GET with ids=
+    return json_response(lookup(Employee.employee_id, employees_schema))
 
 # The GET routes endpoint - get details on one employee
 @employees.route("/<int:id>/", methods=["GET"])
+@conditional(Employee, includes=Employee)
+@cached
 def get_employee(id):
-    employee = Employee.query.get(id)
+    cache_tags(row_tag("employees", id))
+    # only read and send the fields asked for with the fields parameter
+    schema = project(employee_schema)
+    employee = db.session.get(Employee, id, options=[column_options(Employee, schema)])
     #return an error if the employee doesn't exist
     if not employee:
         return jsonify({'error': 'Employee not found'}), 400
     # Convert the employee from the database into a JSON format and store them in result
-    result = employee_schema.dump(employee)
+    result = schema.dump(employee)
+    # with the include parameter the employee comes as data, next to its related rows
+    included = include([result], Employee)
+    if included is not None:
+        return json_response({"data": result, "included": included})
     # return the data in JSON format
     return jsonify(result)
 
 # The GET routes endpoint - get assets for one employee  
 
 def employee_assets(employee_id):
-    # check if employee exists
-    employee = Employee.query.get(employee_id)
+    # check if employee exists, loading the assets in one extra query
+    employee = db.session.get(Employee, employee_id, options=[selectinload(Employee.assets)])
     # return error if employee doesnt exist
     if not employee:
         return jsonify({'error': 'Employee not found'}), 400
@@ -62,9 +103,15 @@ def employee_assets(employee_id):
 
 # The GET routes endpoint - get manufacturer and assets for a employee  
 @employees.route('/manufacturer/<int:employee_id>', methods=["GET"])
+@conditional(Employee, Asset, Manufacturer)
+@cached
 def employee_manufacturer(employee_id):
-    # check if employee exists
-    employee = Employee.query.get(employee_id)
+    # the response changes with the employee, the assets pointing to them and the manufacturers of those assets
+    cache_tags(row_tag("employees", employee_id), children_tag("employees", employee_id, "assets"))
+    # check if employee exists, loading the assets and their manufacturers with one query per level
+    employee = db.session.get(Employee, employee_id, options=[
+        selectinload(Employee.assets).selectinload(Asset.manufacturer_id)
+    ])
     # return error if employee doesnt exist
     if not employee:
         return jsonify({'error': 'Employee not found'}), 400
@@ -75,6 +122,7 @@ def employee_manufacturer(employee_id):
         asset_dict = {'asset_id': asset.asset_id, 'asset_name': asset.asset_name, 'serial_number':asset.serial_number}
         # add to asset dictionary
         assets_dict_list.append(asset_dict)
+        cache_tags(row_tag("assets", asset.asset_id), children_tag("assets", asset.asset_id, "manufacturers"))
         # check for all manufacturers that belong to asset
         for manufacturer in asset.manufacturer_id:
                 manufacturer_dict = {'manufacturer_id': manufacturer.manufacturer_id, 'manufacturer_name': manufacturer.manufacturer_name, 'manufacturer_contact_number': manufacturer.manufacturer_contact_number,'manufacturer_email': manufacturer.manufacturer_email}
@@ -87,18 +135,8 @@ def employee_manufacturer(employee_id):
 
 # The POST route endpoint - add a new employee
 @employees.route("/", methods=["POST"])
-@jwt_required()
+@admin_required
 def create_employees():
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     try: 
         #Create a new employee
         employee_fields = employee_schema.load(request.json)
@@ -128,20 +166,10 @@ def create_employees():
 
 # The PUT route endpoint - update employee details
 @employees.route("/<int:id>/", methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_employee(id):
     # Create a new employee
     employee_fields = employee_schema.load(request.json)
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the employee
     employee = Employee.query.filter_by(employee_id=id).first()
     #return an error if the employee doesn't exist
@@ -173,18 +201,8 @@ def update_employee(id):
 
 # The DELETE route endpoint - delete an employee
 @employees.route("/<int:id>/", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_employee(id):
-    #get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    #Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the employee
     employee = Employee.query.filter_by(employee_id=id).first()
     #return an error if the employee doesn't exist
@@ -195,4 +213,29 @@ def delete_employee(id):
     db.session.commit()
     #return the employee in the response
     return jsonify("Employee deleted", employee_schema.dump(employee))
-  
\ No newline at end of file
+
+
+# The POST route endpoint - add many employees at once
+@employees.route("/batch", methods=["POST"])
+@admin_required
+def create_employees_batch():
+    # validate every employee in the array, keeping the errors of the bad ones under their index
+    items, errors = validate_items(employees_schema, Employee, batch_items())
+    # insert the good ones in chunks
+    created = bulk_insert(Employee, items, errors)
+    return jsonify({"created": created, "errors": errors})
+
+# The PUT route endpoint - update many employees at once, each item needs its employee_id
+@employees.route("/batch", methods=["PUT"])
+@admin_required
+def update_employees_batch():
+    items, errors = validate_items(employees_schema, Employee, batch_items(), require_key=True)
+    updated = bulk_update(Employee, items, errors)
+    return jsonify({"updated": updated, "errors": errors})
+
+# The DELETE route endpoint - delete many employees at once, sent as {"ids": [...]}
+@employees.route("/batch", methods=["DELETE"])
+@admin_required
+def delete_employees_batch():
+    deleted, missing = bulk_delete(Employee, batch_ids())
+    return jsonify({"deleted": deleted, "missing": missing})
@@ -1,9 +1,14 @@
 from flask import Blueprint, jsonify, request, abort
 from main import db
 from models.manufacturer import Manufacturer
-from models.users import User
 from schemas.manufacturer_schema import manufacturer_schema, manufacturers_schema
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.pagination import paginate
+from utils.serialization import json_response
+from utils.lookup import lookup
+from utils.projection import project, column_options
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, row_tag
+from utils.auth import admin_required
 from sqlalchemy.exc import DataError, IntegrityError
 from marshmallow import ValidationError
 from werkzeug.exceptions import BadRequest
@@ -20,40 +25,43 @@ def handle_validation_error(error):
 
 # The GET route endpoint - get all manufacturers
 @manufacturers.route("/", methods=["GET"])
+@conditional(Manufacturer)
 def get_manufacturers():
-    # get all the manufacturers from the database table
-    manufacturers_list = Manufacturer.query.all()
-    # Convert the manufacturers from the database into a JSON format and store them in result
-    result = manufacturers_schema.dump(manufacturers_list)
+    # get the manufacturers with the ids in the query string instead, e.g. ids=1,2,3
+    if "ids" in request.args:
+        return json_response(lookup(Manufacturer.manufacturer_id, manufacturers_schema))
+    # get one page of manufacturers from the database table and convert them into a JSON format
+    result = paginate(Manufacturer.query, Manufacturer.manufacturer_id, manufacturers_schema)
     # return the data in JSON format
-    return jsonify(result)
+    return json_response(result)
+
+# The POST route endpoint - get many manufacturers by id, for more ids than fit in a query string
+@manufacturers.route("/lookup", methods=["POST"])
+def lookup_manufacturers():
+    # {"ids": [...]} in the body, answered like the GET with ids=
+    return json_response(lookup(Manufacturer.manufacturer_id, manufacturers_schema))
 
 # The GET manufacturer routes endpoint - get details on one manufacturer
 @manufacturers.route("/<int:id>/", methods=["GET"])
+@conditional(Manufacturer)
+@cached
 def get_manufacturer(id):
-    manufacturer = Manufacturer.query.get(id)
+    cache_tags(row_tag("manufacturers", id))
+    # only read and send the fields asked for with the fields parameter
+    schema = project(manufacturer_schema)
+    manufacturer = db.session.get(Manufacturer, id, options=[column_options(Manufacturer, schema)])
     #return an error if the manufacturer doesn't exist
     if not manufacturer:
         return jsonify({'error': 'Manufacturer not found'}), 400
     # Convert the manufacturers from the database into a JSON format and store them in result
-    result = manufacturer_schema.dump(manufacturer)
+    result = schema.dump(manufacturer)
     # return the data in JSON format
     return jsonify(result)
 
 # The POST route endpoint - add a manufacturer
 @manufacturers.route("/", methods=["POST"])
-@jwt_required()
+@admin_required
 def create_manufacturers():
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     try:
         #add a new manufacturer
         manufacturer_fields = manufacturer_schema.load(request.json)
@@ -81,20 +89,10 @@ def create_manufacturers():
 
 # The PUT route endpoint - update manufacturer details
 @manufacturers.route("/<int:id>/", methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_manufacturer(id):
     # Create a new manufacturer
     manufacturer_fields = manufacturer_schema.load(request.json)
-    # get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    # Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the manufacturer
     manufacturer = Manufacturer.query.filter_by(manufacturer_id=id).first()
     #return an error if the manufacturer doesn't exist
@@ -125,18 +123,8 @@ def update_manufacturer(id):
 
 # The DELETE route endpoint - delete a manufacturer
 @manufacturers.route("/<int:id>/", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_asset(id):
-    #get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    #Find it in the db
-    user = User.query.get(user_id)
-    #Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # find the manufacturer
     manufacturer = Manufacturer.query.filter_by(manufacturer_id=id).first()
     #return an error if the manufacturer doesn't exist
@@ -0,0 +1,10 @@
+from flask import Blueprint
+from prometheus_client import CONTENT_TYPE_LATEST
+from utils.metrics import latest
+
+metrics = Blueprint('metrics', __name__)
+
+# The GET route endpoint - request, database pool and bcrypt metrics for Prometheus to scrape
+@metrics.route("/metrics", methods=["GET"])
+def get_metrics():
+    return latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
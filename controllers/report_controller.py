@@ -0,0 +1,122 @@
+from datetime import date
+from flask import Blueprint, jsonify, request, abort
+from sqlalchemy import func, case, distinct
+from main import db
+from models.departments import Department
+from models.employees import Employee
+from models.assets import Asset
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, table_tag
+from utils.filters import apply_filters
+
+reports = Blueprint('reports', __name__, url_prefix="/reports")
+
+# query string filters for the service job report - parameter: (column, comparison)
+SERVICE_JOB_FILTERS = {
+    "service_date_from": (ServiceJob.service_date, "ge"),
+    "service_date_to": (ServiceJob.service_date, "le"),
+}
+# default age bands in years, e.g. 0-1, 1-3, 3-5, 5-10 and 10+
+AGE_BANDS = (1, 3, 5, 10)
+
+
+def years_ago(today, years):
+    # the same day the given number of years ago, the 28th when that February has no 29th
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
+
+
+def age_bands():
+    # get the band limits in years from the bands parameter, e.g. bands=1,3,5,10
+    value = request.args.get("bands")
+    if value is None:
+        return AGE_BANDS
+    try:
+        bands = sorted({int(band) for band in value.split(",")})
+    except ValueError:
+        return abort(400, description="bands must be a comma separated list of years")
+    if not bands or bands[0] < 1:
+        return abort(400, description="bands must be a comma separated list of years")
+    return tuple(bands)
+
+
+# The GET route endpoint - number of assets in each department
+@reports.route("/assets_per_department", methods=["GET"])
+@conditional(Department, Employee, Asset)
+@cached
+def assets_per_department():
+    cache_tags(table_tag("departments"), table_tag("employees"), table_tag("assets"))
+    # one grouped query over the department -> employee -> asset chain, departments without assets count 0
+    rows = db.session.query(
+        Department.department_id, Department.department_name, func.count(Asset.asset_id).label("asset_count"),
+    ).outerjoin(Employee, Employee.department_id == Department.department_id) \
+     .outerjoin(Asset, Asset.employee_id == Employee.employee_id) \
+     .group_by(Department.department_id, Department.department_name) \
+     .order_by(Department.department_id).all()
+    return jsonify({"data": [dict(row._mapping) for row in rows]})
+
+
+# The GET route endpoint - number of assets of each manufacturer
+@reports.route("/assets_per_manufacturer", methods=["GET"])
+@conditional(Manufacturer)
+@cached
+def assets_per_manufacturer():
+    cache_tags(table_tag("manufacturers"))
+    rows = db.session.query(
+        Manufacturer.manufacturer_name, func.count(distinct(Manufacturer.asset_id)).label("asset_count"),
+    ).group_by(Manufacturer.manufacturer_name).order_by(Manufacturer.manufacturer_name).all()
+    return jsonify({"data": [dict(row._mapping) for row in rows]})
+
+
+# The GET route endpoint - number of assets of each type
+@reports.route("/asset_types", methods=["GET"])
+@conditional(Asset)
+@cached
+def asset_types():
+    cache_tags(table_tag("assets"))
+    # read from the (asset_type, date_purchased) index
+    rows = db.session.query(
+        Asset.asset_type, func.count(Asset.asset_id).label("asset_count"),
+    ).group_by(Asset.asset_type).order_by(Asset.asset_type).all()
+    return jsonify({"data": [dict(row._mapping) for row in rows]})
+
+
+# The GET route endpoint - number of assets in each age band, from the date they were bought
+@reports.route("/asset_age", methods=["GET"])
+# the ages are worked out from today's date
+@conditional(Asset, daily=True)
+@cached
+def asset_age():
+    cache_tags(table_tag("assets"))
+    bands = age_bands()
+    today = date.today()
+    # the band names in order, e.g. "0-1", "1-3", ... "10+"
+    names = ["%d-%d" % (low, high) for low, high in zip((0,) + bands, bands)] + ["%d+" % bands[-1]]
+    # the dates are worked out here so the database only compares date_purchased with them
+    band = case(
+        *[(Asset.date_purchased > years_ago(today, years), name) for years, name in zip(bands, names)],
+        else_=names[-1],
+    ).label("age_band")
+    counts = dict(db.session.query(band, func.count(Asset.asset_id)).group_by(band).all())
+    return jsonify({"data": [{"age_band": name, "asset_count": counts.get(name, 0)} for name in names]})
+
+
+# The GET route endpoint - number of service jobs for the assets of each department
+@reports.route("/service_jobs_per_department", methods=["GET"])
+@conditional(Department, Employee, Asset, ServiceJob)
+@cached
+def service_jobs_per_department():
+    cache_tags(table_tag("departments"), table_tag("employees"), table_tag("assets"), table_tag("service_jobs"))
+    query = db.session.query(
+        Department.department_id, Department.department_name, func.count(ServiceJob.service_job_id).label("service_job_count"),
+    ).join(Employee, Employee.department_id == Department.department_id) \
+     .join(Asset, Asset.employee_id == Employee.employee_id) \
+     .join(ServiceJob, ServiceJob.asset_id == Asset.asset_id)
+    # only count the service jobs in the date range, e.g. service_date_from=2022-01-01
+    query = apply_filters(query, SERVICE_JOB_FILTERS)
+    rows = query.group_by(Department.department_id, Department.department_name).order_by(Department.department_id).all()
+    return jsonify({"data": [dict(row._mapping) for row in rows]})
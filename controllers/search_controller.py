@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, request, abort
+from main import db
+from models.assets import Asset
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, table_tag
+from utils.pagination import page_limit
+from utils.search import SOURCES, search
+
+searches = Blueprint('search', __name__, url_prefix="/search")
+
+# The GET route endpoint - find assets, employees and manufacturers by part of a name, serial number or email
+@searches.route("/", methods=["GET"])
+@conditional(Asset, Employee, Manufacturer)
+@cached
+def search_all():
+    cache_tags(table_tag("assets"), table_tag("employees"), table_tag("manufacturers"))
+    text = request.args.get("q", "").strip()
+    if not text:
+        return abort(400, description="q is required")
+    # only search some kinds of results, e.g. type=asset,employee
+    kinds = request.args.get("type")
+    kinds = [kind.strip() for kind in kinds.split(",")] if kinds else list(SOURCES)
+    if any(kind not in SOURCES for kind in kinds):
+        return abort(400, description="type must be one or more of: " + ", ".join(SOURCES))
+    result = search(db.session, text, kinds, page_limit())
+    return jsonify({"data": result, "q": text})
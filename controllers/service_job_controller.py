@@ -1,16 +1,33 @@
 from flask import Blueprint, jsonify, request, abort
 from main import db
 from models.service_job import ServiceJob
-from models.users import User
 from marshmallow import ValidationError
 from werkzeug.exceptions import BadRequest
 from schemas.service_job_schema import service_job_schema, service_jobs_schema
+from utils.pagination import paginate
+from utils.serialization import json_response
+from utils.lookup import lookup
+from utils.projection import project, column_options
+from utils.etag import conditional
+from utils.cache import cached, cache_tags, row_tag
+from utils.filters import apply_filters, sort_column
+from utils.streaming import export_format, stream_export
 from sqlalchemy.exc import DataError, IntegrityError
 from datetime import date
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.auth import admin_required
+from utils.bulk import batch_items, batch_ids, validate_items, bulk_insert, bulk_update, bulk_delete
 
 service_job = Blueprint('service_jobs', __name__, url_prefix="/service_job")
 
+# Query string filters for the service jobs collection - parameter: (column, comparison)
+SERVICE_JOB_FILTERS = {
+    "asset_id": (ServiceJob.asset_id, "eq"),
+    "service_date_from": (ServiceJob.service_date, "ge"),
+    "service_date_to": (ServiceJob.service_date, "le"),
+}
+# Columns the service jobs collection can be sorted by
+SERVICE_JOB_SORTS = ("service_date",)
+
 # error handler for validation error in marshmallow
 @service_job.errorhandler(ValidationError)
 def handle_validation_error(error):
@@ -20,40 +37,49 @@ def handle_validation_error(error):
 
 # The GET route endpoint - get all the service_jobs
 @service_job.route("/", methods=["GET"])
+@conditional(ServiceJob)
 def get_all_service_jobs():
-    # Get all the service_job from the database table
-    service_job_list = ServiceJob.query.all()
-    # Convert the service_job from the database into a JSON format and store them in result
-    result = service_jobs_schema.dump(service_job_list)
+    # get the service jobs with the ids in the query string instead, e.g. ids=1,2,3
+    if "ids" in request.args:
+        return json_response(lookup(ServiceJob.service_job_id, service_jobs_schema))
+    # Only keep the service jobs matching the filters in the query string
+    query = apply_filters(ServiceJob.query, SERVICE_JOB_FILTERS)
+    # Stream the whole table instead when an export is asked for
+    export = export_format()
+    if export:
+        return stream_export(query, ServiceJob.service_job_id, service_job_schema, export)
+    # Get one page of service_job from the database table and convert them into a JSON format
+    result = paginate(query, ServiceJob.service_job_id, service_jobs_schema, sort=sort_column(ServiceJob, SERVICE_JOB_SORTS))
     # Return the data in JSON format
-    return jsonify(result)
+    return json_response(result)
+
+# The POST route endpoint - get many service jobs by id, for more ids than fit in a query string
+@service_job.route("/lookup", methods=["POST"])
+def lookup_service_jobs():
+    # {"ids": [...]} in the body, answered like the GET with ids=
+    return json_response(lookup(ServiceJob.service_job_id, service_jobs_schema))
 
 # The GET routes endpoint - get details on one service_job
 @service_job.route("/<int:id>/", methods=["GET"])
+@conditional(ServiceJob)
+@cached
 def get_service_jobs(id):
-    service_job = ServiceJob.query.get(id)
+    cache_tags(row_tag("service_jobs", id))
+    # only read and send the fields asked for with the fields parameter
+    schema = project(service_job_schema)
+    service_job = db.session.get(ServiceJob, id, options=[column_options(ServiceJob, schema)])
     # Return an error if the service_job doesn't exist
     if not service_job:
         return jsonify({'error': 'Service job not found'}), 400
     # Convert the service_job from the database into a JSON format and store them in result
-    result = service_job_schema.dump(service_job)
+    result = schema.dump(service_job)
     # Return the data in JSON format
     return jsonify(result)
 
 # The POST route endpoint - add a service_job
 @service_job.route("/", methods=["POST"])
-@jwt_required ()
+@admin_required
 def create_service_job():
-    # Get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    # Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     try:
         # Create a new service job
         service_fields = service_job_schema.load(request.json)
@@ -79,18 +105,8 @@ def create_service_job():
         
 # The PUT route endpoint - update service job
 @service_job.route("/<int:id>/", methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_service_job(id):
-    # Get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    # Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # Find the asset_type
     service_job = ServiceJob.query.filter_by(service_job_id=id).first()
     # Return an error if the asset_type doesn't exist
@@ -120,18 +136,8 @@ def update_service_job(id):
 
 # The DELETE route endpoint - delete a service job
 @service_job.route("/<int:id>/", methods=["DELETE"])
-@jwt_required ()
+@admin_required
 def delete_service_job(id):
-    # Get the user id invoking get_jwt_identity
-    user_id = get_jwt_identity()
-    # Find it in the db
-    user = User.query.get(user_id)
-    # Make sure it is in the database
-    if not user:
-        return jsonify({'error': 'Invalid user'}),401
-    # Stop the request if the user is not an admin
-    if not user.admin:
-        return jsonify({'error': 'Unauthorised user'}),401
     # Find the card
     service_job = ServiceJob.query.filter_by(service_job_id=id).first()
     # Return an error if the service job doesn't exist
@@ -142,4 +148,29 @@ def delete_service_job(id):
     db.session.commit()
     # Return the service job in the response
     return jsonify("Service job deleted", service_job_schema.dump(service_job))
-   
\ No newline at end of file
+
+
+# The POST route endpoint - add many service jobs at once
+@service_job.route("/batch", methods=["POST"])
+@admin_required
+def create_service_jobs_batch():
+    # validate every service job in the array, keeping the errors of the bad ones under their index
+    items, errors = validate_items(service_jobs_schema, ServiceJob, batch_items())
+    # insert the good ones in chunks
+    created = bulk_insert(ServiceJob, items, errors)
+    return jsonify({"created": created, "errors": errors})
+
+# The PUT route endpoint - update many service jobs at once, each item needs its service_job_id
+@service_job.route("/batch", methods=["PUT"])
+@admin_required
+def update_service_jobs_batch():
+    items, errors = validate_items(service_jobs_schema, ServiceJob, batch_items(), require_key=True)
+    updated = bulk_update(ServiceJob, items, errors)
+    return jsonify({"updated": updated, "errors": errors})
+
+# The DELETE route endpoint - delete many service jobs at once, sent as {"ids": [...]}
+@service_job.route("/batch", methods=["DELETE"])
+@admin_required
+def delete_service_jobs_batch():
+    deleted, missing = bulk_delete(ServiceJob, batch_ids())
+    return jsonify({"deleted": deleted, "missing": missing})
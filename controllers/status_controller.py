@@ -0,0 +1,27 @@
+from flask import Blueprint, jsonify
+from main import db
+from utils.auth import admin_required
+from utils import replicas
+
+status = Blueprint('status', __name__, url_prefix="/status")
+
+# The GET route endpoint - connection pool usage of this worker
+@status.route("/pool", methods=["GET"])
+@admin_required
+def pool_stats():
+    pool = db.engine.pool
+    # not every pool type keeps counts (e.g. the NullPool), only report the ones it has
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return jsonify(stats)
+
+
+# The GET route endpoint - health of the read replicas as this worker last saw it
+@status.route("/replicas", methods=["GET"])
+@admin_required
+def replica_stats():
+    if replicas.replicas is None:
+        return jsonify({"replicas": []})
+    return jsonify({"replicas": replicas.replicas.status()})
@@ -3,8 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from utils.replicas import RoutingSession
 
-db = SQLAlchemy()
+# the session sends the reads of GET requests to the read replicas, when there are any
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 ma = Marshmallow()
 bcrypt = Bcrypt()
 jwt = JWTManager()
@@ -29,6 +31,22 @@ def create_app():
     bcrypt.init_app(app)
     jwt.init_app(app)
 
+    # creating the read cache for the single item endpoints
+    from utils.cache import init_cache
+    init_cache(app)
+
+    # send GET requests to the read replicas
+    from utils.replicas import init_replicas
+    init_replicas(app)
+
+    # timing of the queries and serialization of each request, when turned on
+    from utils.instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    # request, database pool and bcrypt metrics, read at /metrics
+    from utils.metrics import init_metrics
+    init_metrics(app)
+
     from commands import db_commands
     app.register_blueprint(db_commands)
 
@@ -0,0 +1,24 @@
+from main import db
+
+class AssetSummary(db.Model):
+    # define the table name for the db as asset_summaries
+    __tablename__ = "asset_summaries"
+    # one row per asset with its owner, department, manufacturers and service history already joined,
+    # kept up to date by utils.summary whenever one of the tables it is made from changes
+    __table_args__ = (
+        db.Index("ix_asset_summaries_department_id", "department_id", "asset_id"),
+        db.Index("ix_asset_summaries_last_service_date", "last_service_date", "asset_id"),
+    )
+    asset_id = db.Column(db.Integer, primary_key=True)
+    asset_name = db.Column(db.String(), nullable=False)
+    serial_number = db.Column(db.String(), nullable=False)
+    asset_type = db.Column(db.String())
+    date_purchased = db.Column(db.Date(), nullable=False)
+    employee_id = db.Column(db.Integer, nullable=False)
+    employee_name = db.Column(db.String(), nullable=False)
+    department_id = db.Column(db.Integer, nullable=False)
+    department_name = db.Column(db.String(), nullable=False)
+    # the names of all the asset's manufacturers, separated by ", "
+    manufacturer_names = db.Column(db.String())
+    last_service_date = db.Column(db.Date())
+    service_count = db.Column(db.Integer, nullable=False, default=0)
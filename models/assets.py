@@ -1,8 +1,18 @@
 from main import db
+from models.versioned import Versioned
 
-class Asset(db.Model):
+class Asset(Versioned, db.Model):
     # define the table name for the db as assets
     __tablename__= "assets"
+    # indexes for the filters and sorts of the assets collection endpoint,
+    # the primary key is the last column so keyset pages can be read straight from the index
+    __table_args__ = (
+        db.Index("ix_assets_date_purchased", "date_purchased", "asset_id"),
+        db.Index("ix_assets_asset_type_date_purchased", "asset_type", "date_purchased"),
+        # trigram indexes for /search on PostgreSQL (see utils.search)
+        db.Index("ix_assets_asset_name_trgm", "asset_name", postgresql_using="gin", postgresql_ops={"asset_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        db.Index("ix_assets_serial_number_trgm", "serial_number", postgresql_using="gin", postgresql_ops={"serial_number": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     # Set the primary key
     asset_id = db.Column(db.Integer,primary_key=True)
     # the rest of the attributes/columns
@@ -14,5 +24,5 @@ class Asset(db.Model):
      # link to asset_type
     manufacturer_id = db.relationship("Manufacturer", backref = "asset", cascade= "all, delete")
     # link to employees 
-    employee_id = db.Column(db.Integer, db.ForeignKey("employees.employee_id"), nullable =False)
+    employee_id = db.Column(db.Integer, db.ForeignKey("employees.employee_id"), nullable =False, index=True)
    
@@ -0,0 +1,14 @@
+from main import db
+
+class ChangeLogEntry(db.Model):
+    # define the table name for the db as change_log
+    __tablename__ = "change_log"
+    # one row per row written, in the order the transactions commit (see utils.changes). The change_id is the
+    # position /changes hands out as its token
+    change_id = db.Column(db.BigInteger().with_variant(db.Integer(), "sqlite"), primary_key=True)
+    table_name = db.Column(db.String(), nullable=False)
+    # the primary key of the row, None when a bulk statement changed rows that can't be named
+    row_id = db.Column(db.Integer())
+    # insert, update or delete
+    operation = db.Column(db.String(), nullable=False)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
@@ -1,6 +1,7 @@
 from main import db
+from models.versioned import Versioned
 
-class Department(db.Model):
+class Department(Versioned, db.Model):
     # define the table name for the db as departments
     __tablename__= "departments"
     # Set the primary key
@@ -1,8 +1,17 @@
 from main import db
+from models.versioned import Versioned
 
-class Employee(db.Model):
+class Employee(Versioned, db.Model):
     # define the table name for the db as employees
     __tablename__= "employees"
+    # index for sorting the employees collection endpoint by last name
+    __table_args__ = (
+        db.Index("ix_employees_last_name", "last_name", "employee_id"),
+        # trigram indexes for /search on PostgreSQL (see utils.search)
+        db.Index("ix_employees_first_name_trgm", "first_name", postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        db.Index("ix_employees_last_name_trgm", "last_name", postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        db.Index("ix_employees_email_address_trgm", "email_address", postgresql_using="gin", postgresql_ops={"email_address": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     # Set the primary key
     employee_id = db.Column(db.Integer,primary_key=True)
     # rest of the attributes/columns
@@ -13,6 +22,6 @@ class Employee(db.Model):
     room_number = db.Column(db.Integer(), nullable = False)
     position = db.Column(db.String(), nullable=False)
     # There can be many employees in a department - foreign key to link to departments
-    department_id = db.Column(db.Integer, db.ForeignKey("departments.department_id"), nullable =False)
+    department_id = db.Column(db.Integer, db.ForeignKey("departments.department_id"), nullable =False, index=True)
     # an employee can have many assets - foreign key to link to assets
     assets = db.relationship("Asset", backref = "employees", cascade="all, delete")
\ No newline at end of file
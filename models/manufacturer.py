@@ -1,8 +1,15 @@
 from main import db
+from models.versioned import Versioned
 
-class Manufacturer(db.Model):
+class Manufacturer(Versioned, db.Model):
     # define the table name for the db as asset_manufacturers
     __tablename__= "manufacturers"
+    # the assets per manufacturer report is read straight from this index
+    __table_args__ = (
+        db.Index("ix_manufacturers_manufacturer_name_asset_id", "manufacturer_name", "asset_id"),
+        # trigram index for /search on PostgreSQL (see utils.search)
+        db.Index("ix_manufacturers_manufacturer_name_trgm", "manufacturer_name", postgresql_using="gin", postgresql_ops={"manufacturer_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     # Set the primary key
     manufacturer_id = db.Column(db.Integer,primary_key=True)
     # the rest of the attributes/columns
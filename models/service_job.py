@@ -1,8 +1,14 @@
 from main import db
+from models.versioned import Versioned
 
-class ServiceJob(db.Model):
+class ServiceJob(Versioned, db.Model):
     # define the table name for the db as assets
     __tablename__= "service_jobs"
+    # indexes for the filters and sorts of the service jobs collection endpoint
+    __table_args__ = (
+        db.Index("ix_service_jobs_asset_id_service_date", "asset_id", "service_date"),
+        db.Index("ix_service_jobs_service_date", "service_date", "service_job_id"),
+    )
     # Set the primary key
     service_job_id = db.Column(db.Integer,primary_key=True)
     # the rest of the attributes/columns
@@ -0,0 +1,8 @@
+from main import db
+
+class TableVersion(db.Model):
+    # define the table name for the db as table_versions
+    __tablename__ = "table_versions"
+    # one row per table, the version goes up by one in every transaction that changes the table
+    table_name = db.Column(db.String(), primary_key=True)
+    version = db.Column(db.Integer(), nullable=False, default=0)
@@ -0,0 +1,10 @@
+from main import db
+
+class Versioned(object):
+    # when a row was last written and how many times, for clients syncing through /changes.
+    # Both are set by the database, the server defaults also cover rows written with COPY,
+    # and the version goes up by one in every UPDATE of the row including the bulk ones
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+    version = db.Column(db.Integer(), nullable=False, server_default=db.text("1"), onupdate=db.literal_column("version") + 1)
+    # read the new values back in the same statement where the database can, instead of on the next access
+    __mapper_args__ = {"eager_defaults": True}
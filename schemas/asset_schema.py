@@ -1,10 +1,15 @@
 from main import ma
+from schemas.versioned_schema import VersionedSchema
 
-class AssetSchema(ma.Schema):
+class AssetSchema(VersionedSchema):
     class Meta:
         ordered = True
         # fields to expose
-        fields = ("asset_id","asset_name","serial_number", "date_purchased", "employee_id")
+        fields = ("asset_id","asset_name","serial_number", "date_purchased", "employee_id", "updated_at", "version")
+        # set by the database, dropped when loading a request (see VersionedSchema)
+        dump_only = ("updated_at", "version")
+    # loaded as a date, so a bad date is a validation error instead of a database error
+    date_purchased = ma.Date()
 
 # single asset schema
 asset_schema = AssetSchema()
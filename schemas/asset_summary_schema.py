@@ -0,0 +1,15 @@
+from main import ma
+
+class AssetSummarySchema(ma.Schema):
+    class Meta:
+        ordered = True
+        # fields to expose
+        fields = ("asset_id", "asset_name", "serial_number", "asset_type", "date_purchased", "employee_id", "employee_name",
+                  "department_id", "department_name", "manufacturer_names", "last_service_date", "service_count")
+    date_purchased = ma.Date()
+    last_service_date = ma.Date()
+
+# single asset summary schema
+asset_summary_schema = AssetSummarySchema()
+# multiple asset summaries schema
+asset_summaries_schema = AssetSummarySchema(many=True)
@@ -1,10 +1,12 @@
-from main import ma
+from schemas.versioned_schema import VersionedSchema
 
-class DepartmentSchema(ma.Schema):
+class DepartmentSchema(VersionedSchema):
     class Meta:
         ordered = True
         # fields to expose
-        fields = ("department_id", "department_name", "building_number", "address") 
+        fields = ("department_id", "department_name", "building_number", "address", "updated_at", "version")
+        # set by the database, dropped when loading a request (see VersionedSchema)
+        dump_only = ("updated_at", "version")
 
 # single department schema
 department_schema = DepartmentSchema()
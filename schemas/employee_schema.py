@@ -1,10 +1,12 @@
-from main import ma
+from schemas.versioned_schema import VersionedSchema
 
-class EmployeeSchema(ma.Schema):
+class EmployeeSchema(VersionedSchema):
     class Meta:
         ordered = True
         # fields to expose
-        fields = ("employee_id", "first_name", "last_name", "email_address", "contact_number", "room_number", "position", "department_id")
+        fields = ("employee_id", "first_name", "last_name", "email_address", "contact_number", "room_number", "position", "department_id", "updated_at", "version")
+        # set by the database, dropped when loading a request (see VersionedSchema)
+        dump_only = ("updated_at", "version")
 
 # single employee schema
 employee_schema = EmployeeSchema()
@@ -1,10 +1,12 @@
-from main import ma
+from schemas.versioned_schema import VersionedSchema
 
-class ManufacturerSchema(ma.Schema):
+class ManufacturerSchema(VersionedSchema):
     class Meta:
         ordered = True
         # fields to expose
-        fields = ("manufacturer_id", "manufacturer_name", "manufacturer_contact_number", "manufacturer_email", "manufacturer_address", "asset_id") 
+        fields = ("manufacturer_id", "manufacturer_name", "manufacturer_contact_number", "manufacturer_email", "manufacturer_address", "asset_id", "updated_at", "version")
+        # set by the database, dropped when loading a request (see VersionedSchema)
+        dump_only = ("updated_at", "version")
 
 
 # single asset manufacturer schema
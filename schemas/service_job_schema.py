@@ -1,10 +1,15 @@
 from main import ma
+from schemas.versioned_schema import VersionedSchema
 
-class ServiceJobSchema(ma.Schema):
+class ServiceJobSchema(VersionedSchema):
     class Meta:
         ordered = True
         # fields to expose
-        fields = ("service_job_id", "service_description", "service_date", "asset_id")
+        fields = ("service_job_id", "service_description", "service_date", "asset_id", "updated_at", "version")
+        # set by the database, dropped when loading a request (see VersionedSchema)
+        dump_only = ("updated_at", "version")
+    # loaded as a date, so a bad date is a validation error instead of a database error
+    service_date = ma.Date()
 
 # single asset schema
 service_job_schema = ServiceJobSchema()
@@ -0,0 +1,11 @@
+from marshmallow import pre_load
+from main import ma
+
+class VersionedSchema(ma.Schema):
+    # schema of a Versioned model - updated_at and version are set by the database, so they are dropped from
+    # the data loaded, e.g. when a client PUTs back what its GET returned
+    @pre_load
+    def drop_dump_only(self, data, **kwargs):
+        if not isinstance(data, dict):
+            return data
+        return {key: value for key, value in data.items() if not (key in self.fields and self.fields[key].dump_only)}
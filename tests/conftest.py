@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the settings are read when config is imported, so they are set before anything from the app is
+os.environ["FLASK_ENV"] = "testing"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-test-secret-key-test-secret")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+import config
+from main import create_app, db
+
+ADMIN = {"email": "admin@email.com", "password": "password123"}
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    # an app on freshly made and seeded tables, with any settings changed from TestingConfig
+    def make(**settings):
+        for name, value in settings.items():
+            monkeypatch.setattr(config.app_config, name, value, raising=False)
+        app = create_app()
+        # only the primary's tables, a replica bind an earlier app had is still known to db but not configured
+        with app.app_context():
+            db.drop_all(bind_key=None)
+            db.create_all(bind_key=None)
+        result = app.test_cli_runner().invoke(args=["db", "seed"])
+        assert result.exit_code == 0, result.output
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(client):
+    token = client.post("/auth/login", json=ADMIN).get_json()["token"]
+    return {"Authorization": "Bearer " + token}
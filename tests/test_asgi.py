@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import event
+
+from utils.asgi import async_url, create_asgi_app
+
+
+def call(asgi, method, path, query="", headers=(), body=b""):
+    # send one http request to the ASGI app, returns the status, the headers and every body message
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(), "http_version": "1.1",
+             "headers": [(name.encode(), value.encode()) for name, value in headers]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi(scope, receive, send))
+    start, chunks = sent[0], [message["body"] for message in sent[1:]]
+    return start["status"], dict((name.decode(), value.decode()) for name, value in start["headers"]), chunks
+
+
+@pytest.fixture
+def asgi(app):
+    return create_asgi_app(app)
+
+
+def async_statements(asgi):
+    statements = []
+    event.listen(asgi.engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_async_url_swaps_the_driver():
+    assert str(async_url("postgresql://user@host/db")) == "postgresql+asyncpg://user@host/db"
+    assert str(async_url("sqlite:////tmp/app.db")) == "sqlite+aiosqlite:////tmp/app.db"
+
+
+def test_reads_run_on_the_async_engine(asgi, client):
+    statements = async_statements(asgi)
+    status, headers, chunks = call(asgi, "GET", "/assets/1/")
+    assert status == 200
+    assert json.loads(b"".join(chunks)) == client.get("/assets/1/").get_json()
+    assert headers["etag"] == client.get("/assets/1/").headers["ETag"]
+    assert statements
+
+
+def test_writes_and_exports_run_on_the_threads(asgi, admin_headers):
+    statements = async_statements(asgi)
+    body = json.dumps({"department_name": "D", "building_number": "9", "address": "12 Glen drive"}).encode()
+    headers = [("content-type", "application/json")] + list(admin_headers.items())
+    status, _, chunks = call(asgi, "POST", "/departments/", headers=headers, body=body)
+    assert status == 200, chunks
+    status, _, chunks = call(asgi, "GET", "/service_job/", query="export=ndjson")
+    assert status == 200
+    assert len(b"".join(chunks).splitlines()) == 31
+    assert statements == []
+
+
+def test_missing_route_is_answered_by_flask(asgi):
+    status, _, _ = call(asgi, "GET", "/nothing/here")
+    assert status == 404
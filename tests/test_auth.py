@@ -0,0 +1,89 @@
+import pytest
+
+from flask_jwt_extended import decode_token
+
+from conftest import ADMIN
+from main import db
+from models.users import User
+from utils import auth, tracking
+
+USER = {"email": "user1@email.com", "password": "123456"}
+DEPARTMENT = {"department_name": "D", "building_number": "9", "address": "12 Glen drive, Melbourne, VIC"}
+
+
+def token_headers(client, login):
+    token = client.post("/auth/login", json=login).get_json()["token"]
+    return {"Authorization": "Bearer " + token}
+
+
+@pytest.mark.parametrize("login, admin", [(ADMIN, True), (USER, False)])
+def test_token_carries_the_admin_flag(app, client, login, admin):
+    token = client.post("/auth/login", json=login).get_json()["token"]
+    with app.app_context():
+        assert decode_token(token)["admin"] is admin
+
+
+def test_register_gives_a_non_admin_token(app, client):
+    body = client.post("/auth/register", json={"email": "new@email.com", "password": "abcdef"}).get_json()
+    with app.app_context():
+        assert decode_token(body["token"])["admin"] is False
+
+
+def test_admin_can_write(client):
+    response = client.post("/departments/", json=DEPARTMENT, headers=token_headers(client, ADMIN))
+    assert response.status_code == 200
+    assert response.get_json()[1]["department_name"] == "D"
+
+
+@pytest.mark.parametrize("method, path", [
+    ("post", "/departments/"),
+    ("put", "/departments/1/"),
+    ("delete", "/departments/1/"),
+    ("delete", "/assets/1/"),
+    ("delete", "/employees/1/"),
+    ("delete", "/service_job/1/"),
+    ("delete", "/manufacturers/1/"),
+])
+def test_writes_need_an_admin(client, method, path):
+    assert getattr(client, method)(path, json=DEPARTMENT).status_code == 401
+    response = getattr(client, method)(path, json=DEPARTMENT, headers=token_headers(client, USER))
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Unauthorised user"}
+    assert client.get("/departments/1/").get_json()["department_name"] == "A"
+
+
+def set_admin(app, email, admin):
+    with app.app_context():
+        db.session.scalars(db.select(User).filter_by(email=email)).one().admin = admin
+        db.session.commit()
+
+
+def test_demoted_admin_is_refused_before_the_token_expires(app, client, monkeypatch):
+    monkeypatch.setattr(auth, "_admin_flags", {})
+    headers = token_headers(client, ADMIN)
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 200
+    set_admin(app, ADMIN["email"], False)
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 401
+
+
+def test_deleted_admin_is_refused(app, client, monkeypatch):
+    monkeypatch.setattr(auth, "_admin_flags", {})
+    headers = token_headers(client, ADMIN)
+    with app.app_context():
+        db.session.execute(db.delete(User).filter_by(email=ADMIN["email"]))
+        db.session.commit()
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 401
+
+
+def test_admin_flag_changed_by_another_worker_is_read_again(make_app, monkeypatch):
+    monkeypatch.setattr(auth, "_admin_flags", {})
+    app = make_app(ADMIN_CHECK_SECONDS=3600)
+    client = app.test_client()
+    headers = token_headers(client, ADMIN)
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 200
+    # another worker's commit doesn't run this worker's commit handlers, the flag it read is kept for a while
+    monkeypatch.setattr(tracking, "commit_handlers", [])
+    set_admin(app, ADMIN["email"], False)
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 200
+    monkeypatch.setitem(app.config, "ADMIN_CHECK_SECONDS", 0)
+    assert client.post("/departments/", json=DEPARTMENT, headers=headers).status_code == 401
@@ -0,0 +1,102 @@
+from main import db
+from models.assets import Asset
+from models.manufacturer import Manufacturer
+from utils.bulk import bulk_insert
+
+
+def new_assets(*numbers):
+    return [{"asset_name": "Batch %d" % number, "serial_number": "batch%d" % number,
+             "date_purchased": "2020-01-%02d" % number, "employee_id": 1} for number in numbers]
+
+
+def test_batch_insert_reports_bad_items_by_index(app, client, admin_headers):
+    items = new_assets(1, 2, 3)
+    items[1]["date_purchased"] = "not a date"
+    del items[2]["serial_number"]
+    response = client.post("/assets/batch", json=items, headers=admin_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["created"]) == 1
+    assert sorted(body["errors"]) == ["1", "2"]
+    assert "date_purchased" in body["errors"]["1"]
+    assert "serial_number" in body["errors"]["2"]
+    with app.app_context():
+        asset = db.session.get(Asset, body["created"][0])
+        assert asset.serial_number == "batch1"
+
+
+def test_batch_update_reports_missing_rows(client, admin_headers):
+    items = [{"asset_id": 1, "asset_name": "Renamed"}, {"asset_id": 999, "asset_name": "Nothing"}]
+    body = client.put("/assets/batch", json=items, headers=admin_headers).get_json()
+    assert body["updated"] == [1]
+    assert body["errors"] == {"1": "Asset does not exist"}
+    assert client.get("/assets/1/").get_json()["asset_name"] == "Renamed"
+
+
+def test_batch_delete_takes_only_integer_ids(client, admin_headers):
+    # true is not the id 1
+    for ids in ([True], ["1"], [1.5]):
+        assert client.delete("/assets/batch", json={"ids": ids}, headers=admin_headers).status_code == 400
+    assert client.get("/assets/1/").status_code == 200
+
+
+def test_batch_delete_follows_the_cascades(app, client, admin_headers):
+    body = client.delete("/employees/batch", json={"ids": [1, 999]}, headers=admin_headers).get_json()
+    assert body["deleted"] == [1]
+    assert body["missing"] == [999]
+    with app.app_context():
+        assert db.session.scalars(db.select(Asset).where(Asset.employee_id == 1)).all() == []
+
+
+def test_batch_needs_an_array(client, admin_headers):
+    assert client.post("/assets/batch", json={"asset_name": "Batch"}, headers=admin_headers).status_code == 400
+
+
+def test_batch_insert_fills_versioned_columns(app, client, admin_headers):
+    body = client.post("/assets/batch", json=new_assets(1, 2), headers=admin_headers).get_json()
+    assert body["errors"] == {}
+    assert len(body["created"]) == 2
+    with app.app_context():
+        assets = db.session.scalars(db.select(Asset).where(Asset.asset_id.in_(body["created"]))).all()
+        assert [asset.version for asset in assets] == [1, 1]
+        assert all(asset.updated_at is not None for asset in assets)
+
+
+def test_batch_update_bumps_version(client, admin_headers):
+    response = client.put("/assets/batch", json=[{"asset_id": 1, "asset_name": "Renamed"}], headers=admin_headers)
+    assert response.get_json() == {"updated": [1], "errors": {}}
+    assert client.get("/assets/1/").get_json()["version"] == 2
+
+
+def test_batch_insert_ignores_versioned_fields(app, client, admin_headers):
+    items = [dict(new_assets(1)[0], version=5, updated_at="2000-01-01T00:00:00")]
+    body = client.post("/assets/batch", json=items, headers=admin_headers).get_json()
+    assert body["errors"] == {}
+    with app.app_context():
+        asset = db.session.get(Asset, body["created"][0])
+        assert asset.version == 1
+        assert asset.updated_at.year != 2000
+
+
+def test_batch_insert_refuses_client_keys(app, client, admin_headers):
+    items = new_assets(1, 2)
+    items[1]["asset_id"] = 999
+    body = client.post("/assets/batch", json=items, headers=admin_headers).get_json()
+    assert len(body["created"]) == 1
+    assert "asset_id" in body["errors"]["1"]
+    with app.app_context():
+        assert db.session.get(Asset, 999) is None
+
+
+def test_batch_insert_keeps_the_fields_of_every_item(app):
+    # items leaving out different nullable columns, each with the columns it has
+    items = [
+        (0, {"manufacturer_contact_number": 1, "manufacturer_email": "a@m.com", "asset_id": 1}),
+        (1, {"manufacturer_contact_number": 2, "manufacturer_email": "b@m.com", "asset_id": 1, "manufacturer_address": "2 Road"}),
+        (2, {"manufacturer_contact_number": 3, "manufacturer_email": "c@m.com", "asset_id": 1, "manufacturer_name": "C"}),
+    ]
+    with app.test_request_context():
+        created = bulk_insert(Manufacturer, items, {})
+        rows = [db.session.get(Manufacturer, key) for key in created]
+        assert [(row.manufacturer_email, row.manufacturer_name, row.manufacturer_address) for row in rows] == [
+            ("a@m.com", None, None), ("b@m.com", None, "2 Road"), ("c@m.com", "C", None)]
@@ -0,0 +1,53 @@
+from main import create_app
+from test_query_counts import count_queries
+from utils import cache
+
+ASSET = {"asset_name": "Renamed", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 1}
+
+
+def test_repeated_read_is_served_from_the_cache(make_app):
+    app = make_app(CACHE_BACKEND="simple")
+    client = app.test_client()
+    first = client.get("/assets/1/")
+    with count_queries(app) as statements:
+        second = client.get("/assets/1/")
+    # only the table versions of the ETag are read
+    assert len(statements) == 1, statements
+    assert second.get_data() == first.get_data()
+
+
+def test_write_drops_the_entries_of_its_rows(make_app, admin_headers):
+    app = make_app(CACHE_BACKEND="simple")
+    client = app.test_client()
+    assert client.get("/assets/1/").get_json()["asset_name"] == "Vanquish"
+    jobs = client.get("/assets/service_job/1").get_json()["service_history"]
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    assert client.get("/assets/1/").get_json()["asset_name"] == "Renamed"
+
+    # deleting a service job drops the nested entry of the asset it belonged to
+    job = jobs[0]["service_job_id"]
+    assert client.delete("/service_job/%d/" % job, headers=admin_headers).status_code == 200
+    remaining = client.get("/assets/service_job/1").get_json()["service_history"]
+    assert [row["service_job_id"] for row in remaining] == [row["service_job_id"] for row in jobs[1:]]
+
+
+def test_write_from_another_worker_is_not_served_from_cache(make_app, admin_headers):
+    # two apps on one database, each with its own in-process cache like two gunicorn workers
+    worker = make_app(CACHE_BACKEND="simple").test_client()
+    other = create_app().test_client()
+    worker_cache = cache.SimpleCache(100, 60)
+    other_cache = cache.SimpleCache(100, 60)
+
+    cache.read_cache = worker_cache
+    first = worker.get("/assets/1/")
+    assert first.get_json()["asset_name"] == "Vanquish"
+    assert worker.get("/assets/1/").get_data() == first.get_data()
+
+    # the other worker's commit only drops the entries of its own cache
+    cache.read_cache = other_cache
+    assert other.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+
+    cache.read_cache = worker_cache
+    second = worker.get("/assets/1/")
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["asset_name"] == "Renamed"
@@ -0,0 +1,108 @@
+import pytest
+
+from main import db
+from models.assets import Asset
+from models.change_log import ChangeLogEntry
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from utils.pagination import encode_cursor
+
+ASSET = {"asset_name": "Renamed", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 1}
+
+
+def token(client):
+    body = client.get("/changes/").get_json()
+    assert body["changes"] == {} and body["more"] is False
+    return body["next"]
+
+
+def test_updated_rows_come_as_they_are_now(client, admin_headers):
+    since = token(client)
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    assert client.put("/assets/1/", json=dict(ASSET, asset_name="Again"), headers=admin_headers).status_code == 200
+    body = client.get("/changes/", query_string={"since": since}).get_json()
+    assert list(body["changes"]) == ["assets"]
+    [asset] = body["changes"]["assets"]["upserted"]
+    assert (asset["asset_id"], asset["asset_name"], asset["version"]) == (1, "Again", 3)
+    assert body["changes"]["assets"]["deleted"] == []
+    # nothing more after the token it hands out
+    after = client.get("/changes/", query_string={"since": body["next"]}).get_json()
+    assert after["changes"] == {} and after["next"] == body["next"]
+
+
+def test_cascaded_deletes_leave_tombstones(app, client, admin_headers):
+    with app.app_context():
+        employees = [employee.employee_id for employee in Employee.query.filter_by(department_id=1)]
+        assets = [asset.asset_id for asset in Asset.query.filter(Asset.employee_id.in_(employees))]
+        manufacturers = [row.manufacturer_id for row in Manufacturer.query.filter(Manufacturer.asset_id.in_(assets))]
+        jobs = [job.service_job_id for job in ServiceJob.query.filter(ServiceJob.asset_id.in_(assets))]
+    since = token(client)
+    assert client.delete("/departments/1/", headers=admin_headers).status_code == 200
+    changes = client.get("/changes/", query_string={"since": since}).get_json()["changes"]
+    assert {table: (change["upserted"], change["deleted"]) for table, change in changes.items()} == {
+        "departments": ([], [1]),
+        "employees": ([], sorted(employees)),
+        "assets": ([], sorted(assets)),
+        "manufacturers": ([], sorted(manufacturers)),
+        "service_jobs": ([], sorted(jobs)),
+    }
+
+
+def test_pages_and_types(client, admin_headers):
+    since = token(client)
+    for id in (1, 2, 3):
+        assert client.put("/assets/%d/" % id, json=dict(ASSET, serial_number="s%d" % id), headers=admin_headers).status_code == 200
+    seen = []
+    while True:
+        body = client.get("/changes/", query_string={"since": since, "limit": 2, "type": "assets"}).get_json()
+        seen.extend(asset["asset_id"] for asset in body["changes"].get("assets", {}).get("upserted", []))
+        since = body["next"]
+        if not body["more"]:
+            break
+    assert sorted(seen) == [1, 2, 3]
+    body = client.get("/changes/", query_string={"since": token(client), "type": "employees"}).get_json()
+    assert body["changes"] == {}
+
+
+def test_changes_are_logged_at_commit(app, client):
+    since = token(client)
+    with app.app_context():
+        logged = db.select(db.func.count()).select_from(ChangeLogEntry)
+        before = db.session.scalar(logged)
+        db.session.get(Asset, 1).asset_name = "Flushed"
+        db.session.flush()
+        # nothing is added to the log before the commit, and a savepoint rolled back keeps the changes made before it
+        assert db.session.scalar(logged) == before
+        try:
+            with db.session.begin_nested():
+                db.session.get(Asset, 2).asset_name = "Rolled back"
+                db.session.flush()
+                raise ValueError
+        except ValueError:
+            pass
+        db.session.get(Asset, 3).asset_name = "Autoflushed at commit"
+        db.session.commit()
+    changes = client.get("/changes/", query_string={"since": since}).get_json()["changes"]
+    names = {asset["asset_id"]: asset["asset_name"] for asset in changes["assets"]["upserted"]}
+    assert (names[1], names[3]) == ("Flushed", "Autoflushed at commit")
+
+
+def test_bad_requests(client):
+    assert client.get("/changes/", query_string={"since": "not base64!"}).status_code == 400
+    assert client.get("/changes/", query_string={"since": encode_cursor(-1)}).status_code == 400
+    assert client.get("/changes/", query_string={"since": encode_cursor(0), "type": "users"}).status_code == 400
+    # a token from a log that had more changes than this one
+    assert client.get("/changes/", query_string={"since": encode_cursor(10 ** 9)}).status_code == 410
+
+
+@pytest.mark.parametrize("path", ["/assets/1/", "/departments/1/", "/employees/1/", "/manufacturers/1/",
+                                  "/service_job/1/"])
+def test_get_put_round_trip(client, admin_headers, path):
+    # what a GET returns can be sent back, the fields the database sets are left as they are
+    item = client.get(path).get_json()
+    response = client.put(path, json=item, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    after = client.get(path).get_json()
+    assert {key: value for key, value in after.items() if key not in ("updated_at", "version")} == \
+        {key: value for key, value in item.items() if key not in ("updated_at", "version")}
@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+# the tests below name their ETags etag
+from utils import etag as etags
+
+ASSET = {"asset_name": "Renamed", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 1}
+
+
+def test_unchanged_response_is_not_modified(client):
+    first = client.get("/assets/1/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    second = client.get("/assets/1/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.get_data() == b""
+
+
+def test_write_changes_the_etag(client, admin_headers):
+    etag = client.get("/assets/1/").headers["ETag"]
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    response = client.get("/assets/1/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["asset_name"] == "Renamed"
+
+
+def test_write_to_another_table_keeps_the_etag(client, admin_headers):
+    etag = client.get("/service_job/1/").headers["ETag"]
+    department = {"department_name": "A2", "building_number": "6", "address": "10 Glen drive, Melbourne, VIC"}
+    assert client.put("/departments/1/", json=department, headers=admin_headers).status_code == 200
+    assert client.get("/service_job/1/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_batch_write_changes_the_etag(client, admin_headers):
+    # the bulk statements are tracked like the ORM writes
+    etag = client.get("/assets/2/").headers["ETag"]
+    body = client.put("/assets/batch", json=[{"asset_id": 2, "asset_name": "Renamed"}], headers=admin_headers).get_json()
+    assert body["updated"] == [2]
+    assert client.get("/assets/2/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_etag_depends_on_the_request(client):
+    etags = {client.get(path).headers["ETag"] for path in ("/assets/", "/assets/?limit=2", "/employees/")}
+    assert len(etags) == 3
+
+
+class Tomorrow(date):
+    @classmethod
+    def today(cls):
+        return date.fromordinal(date.today().toordinal() + 1)
+
+
+@pytest.mark.parametrize("url", ["/assets/service_due", "/reports/asset_age"])
+def test_etag_of_date_dependent_response_changes_with_the_day(client, monkeypatch, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    monkeypatch.setattr(etags, "date", Tomorrow)
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_etag_of_table_response_does_not_change_with_the_day(client, monkeypatch):
+    first = client.get("/assets/1/")
+    monkeypatch.setattr(etags, "date", Tomorrow)
+    assert client.get("/assets/1/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
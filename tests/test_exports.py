@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("path, key, count", [("/assets/", "asset_id", 13), ("/service_job/", "service_job_id", 31)])
+def test_json_export_has_every_row(make_app, path, key, count):
+    # chunks smaller than the table, so the rows are written out over several chunks
+    client = make_app(EXPORT_CHUNK_SIZE=4).test_client()
+    response = client.get(path, query_string={"export": "json"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    rows = json.loads(response.get_data())
+    assert [row[key] for row in rows] == list(range(1, count + 1))
+
+
+@pytest.mark.parametrize("path, key, count", [("/assets/", "asset_id", 13), ("/service_job/", "service_job_id", 31)])
+def test_ndjson_export_has_one_row_a_line(make_app, path, key, count):
+    client = make_app(EXPORT_CHUNK_SIZE=4).test_client()
+    response = client.get(path, query_string={"export": "ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)[key] for line in lines] == list(range(1, count + 1))
+    # the paginated response sends the same rows
+    assert json.loads(lines[0]) == client.get(path).get_json()["data"][0]
+
+
+def test_unknown_export_format_is_a_bad_request(client):
+    assert client.get("/assets/", query_string={"export": "csv"}).status_code == 400
@@ -0,0 +1,37 @@
+from datetime import date
+
+import pytest
+
+from main import db
+from models.assets import Asset
+from models.employees import Employee
+from models.service_job import ServiceJob
+from test_pagination import all_pages
+
+
+def test_filters_select_the_matching_rows(app, client):
+    rows = all_pages(client, "/assets/", employee_id=1, date_purchased_from="2010-01-01", limit=2)
+    with app.app_context():
+        expected = db.session.scalars(db.select(Asset.asset_id).where(
+            Asset.employee_id == 1, Asset.date_purchased >= date(2010, 1, 1)).order_by(Asset.asset_id)).all()
+    assert expected
+    assert [row["asset_id"] for row in rows] == expected
+
+
+@pytest.mark.parametrize("path, model, column, key", [
+    ("/assets/", Asset, "date_purchased", "asset_id"),
+    ("/service_job/", ServiceJob, "service_date", "service_job_id"),
+    ("/employees/", Employee, "last_name", "employee_id"),
+])
+@pytest.mark.parametrize("descending", [False, True])
+def test_sorted_pages_cover_every_row_in_order(app, client, path, model, column, key, descending):
+    rows = all_pages(client, path, sort=("-" if descending else "") + column, limit=3)
+    with app.app_context():
+        order = getattr(model, column).desc() if descending else getattr(model, column)
+        expected = db.session.scalars(db.select(getattr(model, key)).order_by(order, getattr(model, key))).all()
+    assert [row[key] for row in rows] == expected
+
+
+@pytest.mark.parametrize("params", [{"sort": "asset_name"}, {"date_purchased_from": "yesterday"}, {"employee_id": "one"}])
+def test_bad_filter_or_sort_is_a_bad_request(client, params):
+    assert client.get("/assets/", query_string=params).status_code == 400
@@ -0,0 +1,53 @@
+from models.assets import Asset
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+
+
+def ids(rows, key):
+    return sorted(row[key] for row in rows)
+
+
+def test_included_rows_are_the_related_rows(app, client):
+    body = client.get("/assets/?limit=5&include=employee.department,manufacturers,service_jobs").get_json()
+    asset_ids = [asset["asset_id"] for asset in body["data"]]
+    with app.app_context():
+        employees = Employee.query.join(Asset, Asset.employee_id == Employee.employee_id) \
+            .filter(Asset.asset_id.in_(asset_ids)).distinct().all()
+        manufacturers = Manufacturer.query.filter(Manufacturer.asset_id.in_(asset_ids)).all()
+        jobs = ServiceJob.query.filter(ServiceJob.asset_id.in_(asset_ids)).all()
+        expected = {
+            "employees": sorted(employee.employee_id for employee in employees),
+            "departments": sorted({employee.department_id for employee in employees}),
+            "manufacturers": sorted(manufacturer.manufacturer_id for manufacturer in manufacturers),
+            "service_jobs": sorted(job.service_job_id for job in jobs),
+        }
+    included = body["included"]
+    assert {
+        "employees": ids(included["employees"], "employee_id"),
+        "departments": ids(included["departments"], "department_id"),
+        "manufacturers": ids(included["manufacturers"], "manufacturer_id"),
+        "service_jobs": ids(included["service_jobs"], "service_job_id"),
+    } == expected
+
+
+def test_a_single_item_comes_as_data(client):
+    plain = client.get("/employees/1/").get_json()
+    body = client.get("/employees/1/?include=assets").get_json()
+    assert body["data"] == plain
+    assert all(asset["employee_id"] == 1 for asset in body["included"]["assets"])
+
+
+def test_nothing_to_include_keeps_the_response(client):
+    assert "included" not in client.get("/departments/").get_json()
+
+
+def test_bad_includes_are_rejected(client):
+    for path in [
+        "/assets/?include=department",
+        "/employees/?include=assets.owner",
+        "/departments/?include=employees.assets.service_jobs.asset",
+        "/assets/?include=employee&fields=asset_id,asset_name",
+    ]:
+        response = client.get(path)
+        assert response.status_code == 400, path
@@ -0,0 +1,30 @@
+import json
+import logging
+
+
+def test_server_timing_counts_the_queries(make_app):
+    client = make_app(INSTRUMENTATION=True).test_client()
+    response = client.get("/departments/assets/1")
+    timing = response.headers.getlist("Server-Timing")
+    assert [entry.split(";")[0] for entry in timing] == ["db", "serialize", "app", "total"]
+    # the same statements tests/test_query_counts.py counts
+    assert 'desc="4 queries"' in timing[0]
+
+
+def test_request_over_the_budget_is_a_warning(make_app, caplog):
+    client = make_app(INSTRUMENTATION=True, QUERY_BUDGET=2).test_client()
+    with caplog.at_level(logging.INFO):
+        client.get("/departments/assets/1")
+        client.get("/departments/1/")
+    records = [(record.levelno, json.loads(record.getMessage())) for record in caplog.records
+               if record.getMessage().startswith("{")]
+    (over_level, over), (under_level, under) = records
+    assert over_level == logging.WARNING
+    assert over["over_query_budget"] and over["queries"] == 4
+    assert over["slowest_statement"].startswith("SELECT")
+    assert under_level == logging.INFO
+    assert not under["over_query_budget"] and "slowest_statement" not in under
+
+
+def test_off_by_default(client):
+    assert "Server-Timing" not in client.get("/departments/assets/1").headers
@@ -0,0 +1,43 @@
+from test_query_counts import count_queries
+
+ENDPOINTS = {
+    "assets": "asset_id",
+    "employees": "employee_id",
+    "departments": "department_id",
+    "service_job": "service_job_id",
+    "manufacturers": "manufacturer_id",
+}
+
+
+def test_rows_come_in_the_order_asked_for(client):
+    for name, key in ENDPOINTS.items():
+        body = client.get("/%s/?ids=3,1,999,3" % name).get_json()
+        assert [row[key] for row in body["data"]] == [3, 1], name
+        assert body["missing"] == [999]
+        # a POST gets the same
+        assert client.post("/%s/lookup" % name, json={"ids": [3, 1, 999, 3]}).get_json() == body
+
+
+def test_rows_are_read_with_one_query(app):
+    client = app.test_client()
+    with count_queries(app) as statements:
+        response = client.post("/assets/lookup", json={"ids": list(range(1, 11))})
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]) == 10
+    assert len(statements) == 1
+
+
+def test_fields_and_include_apply(client):
+    body = client.get("/employees/?ids=2,1&fields=employee_id,first_name").get_json()
+    assert [sorted(row) for row in body["data"]] == [["employee_id", "first_name"]] * 2
+    body = client.get("/employees/?ids=2,1&include=department").get_json()
+    assert {row["department_id"] for row in body["included"]["departments"]} == \
+        {row["department_id"] for row in body["data"]}
+
+
+def test_bad_ids_are_rejected(make_app):
+    client = make_app(BATCH_MAX_ITEMS=3).test_client()
+    assert client.get("/assets/?ids=1,x").status_code == 400
+    assert client.get("/assets/?ids=1,2,3,4").status_code == 400
+    assert client.post("/assets/lookup", json={"ids": "1,2"}).status_code == 400
+    assert client.post("/assets/lookup", json=[1, 2]).status_code == 400
@@ -0,0 +1,27 @@
+from prometheus_client import REGISTRY
+
+from conftest import ADMIN
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_counted_by_route(client):
+    labels = {"method": "GET", "route": "/assets/<int:id>/", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    client.get("/assets/1/")
+    client.get("/assets/2/")
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    # nothing is left in progress once the requests are answered
+    assert sample("http_requests_in_progress", blueprint="assets") == 0
+
+
+def test_metrics_are_served_in_the_text_format(client):
+    client.post("/auth/login", json=ADMIN)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    text = response.get_data(as_text=True)
+    assert 'bcrypt_duration_seconds_count{operation="check"}' in text
+    assert 'db_pool_connections{state="open"}' in text
@@ -0,0 +1,68 @@
+import pytest
+
+from utils.pagination import encode_cursor
+
+
+def all_pages(client, path, **params):
+    # follow the next cursors from the first page to the last
+    rows = []
+    after = None
+    while True:
+        query = dict(params, **({"after": after} if after else {}))
+        body = client.get(path, query_string=query).get_json()
+        rows.extend(body["data"])
+        after = body["next"]
+        if after is None:
+            return rows
+
+
+@pytest.mark.parametrize("path, key, count", [
+    ("/assets/", "asset_id", 13),
+    ("/employees/", "employee_id", 5),
+    ("/departments/", "department_id", 3),
+    ("/service_job/", "service_job_id", 31),
+    ("/manufacturers/", "manufacturer_id", 13),
+])
+def test_pages_cover_every_row_once(client, path, key, count):
+    ids = [row[key] for row in all_pages(client, path, limit=4)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == count
+
+
+def test_limit_is_capped(make_app):
+    client = make_app(MAX_PAGE_SIZE=3).test_client()
+    body = client.get("/assets/", query_string={"limit": 100}).get_json()
+    assert len(body["data"]) == 3
+    assert body["next"] is not None
+
+
+@pytest.mark.parametrize("after", ["not base64!", encode_cursor("asset"), "%%%", encode_cursor(True)])
+def test_bad_cursor_is_a_bad_request(client, after):
+    assert client.get("/assets/", query_string={"after": after}).status_code == 400
+
+
+@pytest.mark.parametrize("after", [encode_cursor(["2020-01-01", False]), encode_cursor(["2020-01-01"]),
+                                   encode_cursor("2020-01-01")])
+def test_bad_sorted_cursor_is_a_bad_request(client, after):
+    response = client.get("/assets/", query_string={"sort": "date_purchased", "after": after})
+    assert response.status_code == 400
+
+
+def test_bad_limit_is_a_bad_request(client):
+    assert client.get("/assets/", query_string={"limit": 0}).status_code == 400
+
+
+@pytest.mark.parametrize("sort", ["last_service_date", "-last_service_date"])
+def test_summary_pages_include_never_serviced_assets(client, admin_headers, sort):
+    new_asset = {"asset_name": "Unserviced", "serial_number": "u1", "date_purchased": "2020-01-01", "employee_id": 1}
+    assert client.post("/assets/", json=new_asset, headers=admin_headers).status_code == 200
+    everything = client.get("/assets/summary?limit=500").get_json()["data"]
+    assert any(row["last_service_date"] is None for row in everything)
+
+    rows = all_pages(client, "/assets/summary", limit=2, sort=sort)
+    assert sorted(row["asset_id"] for row in rows) == sorted(row["asset_id"] for row in everything)
+    dates = [row["last_service_date"] for row in rows]
+    # the never serviced assets come last either way
+    serviced = [value for value in dates if value is not None]
+    assert dates == serviced + [None] * (len(dates) - len(serviced))
+    assert serviced == sorted(serviced, reverse=sort.startswith("-"))
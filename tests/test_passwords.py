@@ -0,0 +1,44 @@
+import threading
+
+import config
+from main import create_app, db
+from models.users import User
+from utils import passwords
+
+from conftest import ADMIN
+
+
+def stored_hash(app):
+    with app.app_context():
+        return db.session.scalar(db.select(User.password).where(User.email == ADMIN["email"]))
+
+
+def test_login_rehashes_at_the_configured_cost(app, monkeypatch):
+    assert stored_hash(app).startswith("$2b$04$")
+    # the cost is raised after the users were added
+    monkeypatch.setattr(config.app_config, "BCRYPT_LOG_ROUNDS", 5)
+    app = create_app()
+    client = app.test_client()
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+    assert stored_hash(app).startswith("$2b$05$")
+    # the new hash still checks
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+    assert client.post("/auth/login", json=dict(ADMIN, password="wrong-password")).status_code == 401
+
+
+def test_bcrypt_runs_in_the_process_pool(make_app, monkeypatch):
+    monkeypatch.setattr(passwords, "_pool", None)
+    client = make_app(BCRYPT_POOL_SIZE=1).test_client()
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+    assert passwords._pool is not None
+    passwords._pool.shutdown()
+
+
+def test_full_queue_is_turned_away(make_app, monkeypatch):
+    client = make_app(BCRYPT_POOL_SIZE=1, BCRYPT_QUEUE_TIMEOUT=0.01).test_client()
+    # every place in the queue is taken
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(passwords, "_pool", object())
+    monkeypatch.setattr(passwords, "_slots", slots)
+    assert client.post("/auth/login", json=ADMIN).status_code == 503
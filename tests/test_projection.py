@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from test_pagination import all_pages
+from test_query_counts import count_queries
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_fields_narrow_the_page_and_the_select(make_app, fast):
+    app = make_app(FAST_SERIALIZATION=fast)
+    client = app.test_client()
+    with count_queries(app) as statements:
+        body = client.get("/assets/", query_string={"fields": "asset_name,asset_id", "limit": 3}).get_json()
+    # in the schema's order, whatever order they were asked for in
+    assert [list(row) for row in body["data"]] == [["asset_id", "asset_name"]] * 3
+    select = statements[-1].split(" FROM ")[0]
+    assert "serial_number" not in select and "date_purchased" not in select
+
+
+def test_pages_follow_the_cursor_without_sending_the_key(client):
+    rows = all_pages(client, "/assets/", fields="asset_name", sort="date_purchased", limit=4)
+    assert len(rows) == 13
+    assert all(list(row) == ["asset_name"] for row in rows)
+
+
+@pytest.mark.parametrize("path", ["/assets/1/", "/employees/2/"])
+def test_single_items_are_narrowed(client, path):
+    assert list(client.get(path, query_string={"fields": "employee_id"}).get_json()) == ["employee_id"]
+
+
+def test_exports_are_narrowed(client):
+    lines = client.get("/assets/", query_string={"export": "ndjson", "fields": "serial_number"}).get_data(as_text=True)
+    rows = [json.loads(line) for line in lines.splitlines()]
+    assert len(rows) == 13
+    assert all(list(row) == ["serial_number"] for row in rows)
+
+
+@pytest.mark.parametrize("fields", ["password", "asset_id,nope", ",", ""])
+def test_unknown_fields_are_a_bad_request(client, fields):
+    response = client.get("/assets/", query_string={"fields": fields})
+    assert response.status_code == 400
+    assert b"asset_id" in response.get_data()
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from main import db
+from models.assets import Asset
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from datetime import date
+
+# the nested endpoints and the statements each one runs: the table versions for the ETag, then one query
+# per level of the relationships it follows, however many rows there are
+NESTED_ENDPOINTS = {
+    "/departments/assets/1": 4,
+    "/employees/manufacturer/1": 4,
+    "/assets/manufacturer/1": 3,
+    "/assets/service_job/1": 3,
+}
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_rows(app):
+    # more employees in department 1, more assets for employee 1 and more children for asset 1
+    with app.app_context():
+        for number in range(20):
+            employee = Employee(first_name="Extra", last_name="Employee", email_address="extra%d@email.com" % number,
+                                contact_number=1800000000 + number, room_number=1, position="Analyst", department_id=1)
+            db.session.add(employee)
+            db.session.flush()
+            for copy in range(3):
+                db.session.add(Asset(asset_name="Extra", serial_number="x%d-%d" % (number, copy),
+                                     date_purchased=date(2020, 1, 1), employee_id=employee.employee_id))
+        for number in range(20):
+            asset = Asset(asset_name="Extra", serial_number="e%d" % number, date_purchased=date(2020, 1, 1), employee_id=1)
+            db.session.add(asset)
+            db.session.flush()
+            db.session.add(Manufacturer(manufacturer_name="Extra", manufacturer_contact_number=1,
+                                        manufacturer_email="extra@email.com", asset_id=asset.asset_id))
+            db.session.add(Manufacturer(manufacturer_name="Extra", manufacturer_contact_number=1,
+                                        manufacturer_email="extra@email.com", asset_id=1))
+            db.session.add(ServiceJob(service_description="PM", service_date=date(2021, 1, 1), asset_id=1))
+        db.session.commit()
+
+
+@pytest.mark.parametrize("url", sorted(NESTED_ENDPOINTS))
+def test_nested_endpoint_query_count_is_fixed(app, client, url):
+    with count_queries(app) as statements:
+        assert client.get(url).status_code == 200
+    assert len(statements) == NESTED_ENDPOINTS[url], statements
+
+    add_rows(app)
+    with count_queries(app) as statements:
+        response = client.get(url)
+        assert response.status_code == 200
+    assert len(statements) == NESTED_ENDPOINTS[url], statements
@@ -0,0 +1,78 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from main import create_app
+from utils import replicas
+
+ASSET = {"asset_name": "Renamed", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 1}
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    # the replica is a copy of the seeded database that never gets the writes, like one that's far behind
+    replica = tmp_path / "replica.db"
+    app = make_app(REPLICA_URLS=["sqlite:///" + str(replica)], REPLICA_STICKY_SECONDS=60)
+    shutil.copy(os.environ["DATABASE_URL"][len("sqlite:///"):], replica)
+    return app
+
+
+def test_reads_go_to_the_replica(replica_app, admin_headers):
+    client = replica_app.test_client()
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    # someone else than the writer reads the replica, which doesn't have the write
+    assert replica_app.test_client().get("/assets/1/").get_json()["asset_name"] == "Vanquish"
+
+
+def test_writer_reads_the_primary(replica_app, admin_headers):
+    client = replica_app.test_client()
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    assert client.get("/assets/1/", headers=admin_headers).get_json()["asset_name"] == "Renamed"
+
+
+def test_reads_fall_back_to_the_primary_when_the_replicas_are_down(make_app, admin_headers, tmp_path):
+    app = make_app(REPLICA_URLS=["sqlite:///" + str(tmp_path / "missing" / "replica.db")])
+    client = app.test_client()
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    assert app.test_client().get("/assets/1/").get_json()["asset_name"] == "Renamed"
+    replicas = client.get("/status/replicas", headers=admin_headers).get_json()["replicas"]
+    assert [(replica["name"], replica["healthy"]) for replica in replicas] == [("replica_0", False)]
+
+
+def test_client_reads_its_own_write_on_any_worker(replica_app, admin_headers):
+    worker = replica_app.test_client()
+    response = worker.put("/assets/1/", json=ASSET, headers=admin_headers)
+    assert response.status_code == 200
+    cookie = response.headers["Set-Cookie"]
+    assert cookie.startswith(replicas.WRITE_COOKIE + "=")
+
+    # the writer is sent to the primary, also by a worker that didn't see the write
+    other = create_app().test_client()
+    other.set_cookie("localhost", replicas.WRITE_COOKIE, cookie.split(";")[0].split("=", 1)[1])
+    assert other.get("/assets/1/").get_json()["asset_name"] == "Renamed"
+    # everyone else reads from the replica
+    reader = create_app().test_client()
+    assert reader.get("/assets/1/").get_json()["asset_name"] == "Vanquish"
+
+
+def test_token_client_without_cookies_reads_its_own_write(replica_app, admin_headers):
+    client = replica_app.test_client(use_cookies=False)
+    assert client.put("/assets/1/", json=ASSET, headers=admin_headers).status_code == 200
+    # no cookie comes back, the token's user is found in the writes store
+    assert client.get("/assets/1/", headers=admin_headers).get_json()["asset_name"] == "Renamed"
+    assert client.get("/assets/1/").get_json()["asset_name"] == "Vanquish"
+
+
+def test_replica_coming_back_is_found_by_the_checker_thread(make_app, admin_headers, tmp_path):
+    replica = tmp_path / "later" / "replica.db"
+    app = make_app(REPLICA_URLS=["sqlite:///" + str(replica)], REPLICA_HEALTH_INTERVAL=0.05)
+    assert app.test_client().get("/assets/1/").status_code == 200
+    assert replicas.replicas.status()[0]["healthy"] is False
+    replica.parent.mkdir()
+    shutil.copy(os.environ["DATABASE_URL"][len("sqlite:///"):], replica)
+    deadline = time.monotonic() + 5
+    while not replicas.replicas.status()[0]["healthy"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert replicas.replicas.status()[0]["healthy"] is True
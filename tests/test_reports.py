@@ -0,0 +1,77 @@
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from main import db
+from models.assets import Asset
+from models.departments import Department
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+
+
+def department_of_assets(app):
+    # the department of every asset, worked out in python
+    with app.app_context():
+        employees = {employee.employee_id: employee.department_id for employee in db.session.scalars(db.select(Employee))}
+        return {asset.asset_id: employees[asset.employee_id] for asset in db.session.scalars(db.select(Asset))}
+
+
+def test_assets_per_department(app, client):
+    counts = Counter(department_of_assets(app).values())
+    with app.app_context():
+        departments = db.session.scalars(db.select(Department).order_by(Department.department_id)).all()
+        expected = [{"department_id": department.department_id, "department_name": department.department_name,
+                     "asset_count": counts[department.department_id]} for department in departments]
+    assert client.get("/reports/assets_per_department").get_json()["data"] == expected
+
+
+def test_assets_per_manufacturer_and_type(app, client):
+    with app.app_context():
+        by_name = {}
+        for manufacturer in db.session.scalars(db.select(Manufacturer)):
+            by_name.setdefault(manufacturer.manufacturer_name, set()).add(manufacturer.asset_id)
+        types = Counter(db.session.scalars(db.select(Asset.asset_type)))
+    assert client.get("/reports/assets_per_manufacturer").get_json()["data"] == [
+        {"manufacturer_name": name, "asset_count": len(by_name[name])} for name in sorted(by_name)]
+    data = client.get("/reports/asset_types").get_json()["data"]
+    assert {row["asset_type"]: row["asset_count"] for row in data} == dict(types)
+
+
+@pytest.mark.parametrize("bands", [None, "5,20", "2"])
+def test_asset_age_bands_add_up(app, client, bands):
+    query = {"bands": bands} if bands else {}
+    data = client.get("/reports/asset_age", query_string=query).get_json()["data"]
+    limits = [int(band) for band in bands.split(",")] if bands else [1, 3, 5, 10]
+    assert [row["age_band"] for row in data][-1] == "%d+" % limits[-1]
+    assert sum(row["asset_count"] for row in data) == 13
+    # the oldest band holds the assets bought more than that many years ago
+    today = date.today()
+    with app.app_context():
+        old = sum(1 for bought in db.session.scalars(db.select(Asset.date_purchased))
+                  if bought <= today.replace(year=today.year - limits[-1]))
+    assert data[-1]["asset_count"] == old
+
+
+def test_service_jobs_per_department_in_a_date_range(app, client):
+    departments = department_of_assets(app)
+    with app.app_context():
+        jobs = db.session.scalars(db.select(ServiceJob).where(ServiceJob.service_date >= date(2015, 1, 1))).all()
+    counts = Counter(departments[job.asset_id] for job in jobs)
+    data = client.get("/reports/service_jobs_per_department", query_string={"service_date_from": "2015-01-01"}).get_json()["data"]
+    assert {row["department_id"]: row["service_job_count"] for row in data} == dict(counts)
+
+
+@pytest.mark.parametrize("bands", ["0,5", "one", ","])
+def test_bad_bands_are_a_bad_request(client, bands):
+    assert client.get("/reports/asset_age", query_string={"bands": bands}).status_code == 400
+
+
+def test_cached_report_changes_with_its_tables(make_app, admin_headers):
+    client = make_app(CACHE_BACKEND="simple").test_client()
+    before = client.get("/reports/asset_types").get_json()["data"]
+    assert client.delete("/assets/1/", headers=admin_headers).status_code == 200
+    after = client.get("/reports/asset_types").get_json()["data"]
+    assert sum(row["asset_count"] for row in before) == 13
+    assert sum(row["asset_count"] for row in after) == 12
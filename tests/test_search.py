@@ -0,0 +1,59 @@
+import pytest
+
+from utils import search, tracking
+
+
+@pytest.fixture
+def memory_search(app, monkeypatch):
+    # a fresh in-process index, as a worker has before its first search
+    monkeypatch.setitem(app.config, "SEARCH_BACKEND", "memory")
+    monkeypatch.setattr(search, "memory_index", search.MemoryIndex())
+
+
+def names(client, text, **params):
+    response = client.get("/search/", query_string=dict(params, q=text))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [(item["type"], item["id"]) for item in response.get_json()["data"]]
+
+
+def test_best_match_comes_first(client, memory_search):
+    data = client.get("/search/", query_string={"q": "vanquish"}).get_json()["data"]
+    assert data[0]["type"] == "asset" and data[0]["asset_name"] == "Vanquish"
+    scores = [item["score"] for item in data]
+    assert scores == sorted(scores, reverse=True)
+    # the seeded serial numbers and employee emails are searched too
+    assert ("asset", 1) in names(client, "a3546")
+    assert names(client, "tucker", type="employee") == [("employee", 2)]
+
+
+def test_type_and_limit(client, memory_search):
+    results = names(client, "thermo", type="manufacturer", limit=1)
+    assert len(results) == 1 and results[0][0] == "manufacturer"
+
+
+@pytest.mark.parametrize("params", [{}, {"q": "ab"}, {"q": "vanquish", "type": "department"}])
+def test_bad_search_is_a_bad_request(client, memory_search, params):
+    assert client.get("/search/", query_string=params).status_code == 400
+
+
+def test_memory_index_sees_writes_of_other_workers(app, client, admin_headers, memory_search, monkeypatch):
+    assert ("asset", 1) in names(client, "vanquish")
+    assert names(client, "zyxwvut") == []
+    assert ("employee", 2) in names(client, "tucker")
+
+    # another worker's commit doesn't run this worker's commit handlers, only the database knows about it
+    monkeypatch.setattr(tracking, "commit_handlers", [])
+    body = {"asset_name": "Zyxwvut", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 1}
+    assert client.put("/assets/1/", json=body, headers=admin_headers).status_code == 200
+    assert client.delete("/employees/2/", headers=admin_headers).status_code == 200
+
+    assert names(client, "zyxwvut") == [("asset", 1)]
+    assert ("asset", 1) not in names(client, "vanquish")
+    assert ("employee", 2) not in names(client, "tucker")
+
+
+def test_memory_index_refuses_too_many_rows(app, client, memory_search, monkeypatch):
+    monkeypatch.setitem(app.config, "SEARCH_MEMORY_MAX_ROWS", 10)
+    response = client.get("/search/", query_string={"q": "vanquish"})
+    assert response.status_code == 503
+    assert "SEARCH_MEMORY_MAX_ROWS" in response.get_data(as_text=True)
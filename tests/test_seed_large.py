@@ -0,0 +1,51 @@
+from sqlalchemy import func, select
+
+from main import db
+from models.assets import Asset
+from models.employees import Employee
+from models.service_job import ServiceJob
+
+from conftest import ADMIN
+
+ARGS = ["db", "seed-large", "--departments", "3", "--employees", "20", "--assets", "50", "--service-jobs", "120",
+        "--manufacturers", "15", "--users", "4", "--chunk-size", "7"]
+
+
+def table_rows(app):
+    with app.app_context():
+        assets = db.session.execute(select(Asset.asset_id, Asset.serial_number, Asset.employee_id, Asset.date_purchased)
+                                    .order_by(Asset.asset_id)).all()
+        jobs = db.session.execute(select(ServiceJob.service_job_id, ServiceJob.asset_id, ServiceJob.service_date)
+                                  .order_by(ServiceJob.service_job_id)).all()
+        return assets, jobs
+
+
+def test_seed_large_adds_consistent_rows_after_the_existing_ones(app):
+    result = app.test_cli_runner().invoke(args=ARGS)
+    assert result.exit_code == 0, result.output
+    assert "assets: 50 rows" in result.output
+    assets, jobs = table_rows(app)
+    # the 13 seeded assets and the 50 new ones after them
+    assert [row.asset_id for row in assets] == list(range(1, 64))
+    assert len(jobs) == 31 + 120
+    purchased = {row.asset_id: row.date_purchased for row in assets}
+    for job in jobs[31:]:
+        assert job.service_date >= purchased[job.asset_id]
+    with app.app_context():
+        employees = set(db.session.scalars(select(Employee.employee_id)))
+        assert {row.employee_id for row in assets} <= employees
+        assert db.session.scalar(select(func.count(func.distinct(Employee.contact_number)))) == len(employees)
+    # the seeded rows are still there, and the app still works on the new ones
+    client = app.test_client()
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+    assert client.post("/auth/login", json={"email": "user3@email.com", "password": "password123"}).status_code == 200
+    assert client.get("/assets/63/").get_json()["asset_id"] == 63
+
+
+def test_same_seed_makes_the_same_data(make_app):
+    first = make_app()
+    assert first.test_cli_runner().invoke(args=ARGS).exit_code == 0
+    rows = table_rows(first)
+    second = make_app()
+    assert second.test_cli_runner().invoke(args=ARGS).exit_code == 0
+    assert table_rows(second) == rows
@@ -0,0 +1,31 @@
+from main import db
+from models.employees import Employee
+
+LISTS = ["/assets/?limit=5", "/employees/", "/departments/", "/service_job/?sort=-service_date", "/manufacturers/",
+         "/assets/?export=json", "/service_job/?export=ndjson"]
+
+
+def bodies(app, paths):
+    # the same requests answered with the plain column path and with the ORM objects and marshmallow, by one app
+    # so the rows and their updated_at are the same
+    client = app.test_client()
+    result = []
+    for fast in (True, False):
+        app.config["FAST_SERIALIZATION"] = fast
+        result.append([client.get(path).get_data() for path in paths])
+    return result
+
+
+def test_plain_rows_give_the_same_bytes(app):
+    fast, slow = bodies(app, LISTS)
+    assert fast == slow
+
+
+def test_non_ascii_text_gives_the_same_bytes(app):
+    # the standard encoder escapes it, so orjson's output can't be used
+    with app.app_context():
+        db.session.get(Employee, 1).first_name = "Zo\u00eb"
+        db.session.commit()
+    fast, slow = bodies(app, ["/employees/"])
+    assert b"Zo\\u00eb" in fast[0]
+    assert fast == slow
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import pytest
+
+from main import db
+from models.assets import Asset
+from models.service_job import ServiceJob
+from test_pagination import all_pages
+from test_query_counts import count_queries
+
+
+def expected_rows(app, interval_days):
+    # the forecast worked out in python from every asset and service job
+    with app.app_context():
+        assets = db.session.scalars(db.select(Asset).order_by(Asset.asset_id)).all()
+        jobs = db.session.scalars(db.select(ServiceJob)).all()
+        rows = []
+        for asset in assets:
+            dates = [job.service_date for job in jobs if job.asset_id == asset.asset_id]
+            last = max(dates) if dates else None
+            next_due = (last or asset.date_purchased) + timedelta(days=interval_days)
+            rows.append({"asset_id": asset.asset_id, "asset_name": asset.asset_name,
+                         "serial_number": asset.serial_number,
+                         "last_service_date": last.isoformat() if last else None, "service_count": len(dates),
+                         "next_due_date": next_due.isoformat(), "overdue": next_due < date.today()})
+        return rows
+
+
+@pytest.mark.parametrize("interval_days", [30, 365, 5000])
+def test_pages_match_the_service_history(app, client, interval_days):
+    rows = all_pages(client, "/assets/service_due", interval_days=interval_days, limit=4)
+    assert rows == expected_rows(app, interval_days)
+
+
+def test_never_serviced_asset_is_due_after_its_purchase(app, client, admin_headers):
+    body = {"asset_name": "New", "serial_number": "n1", "date_purchased": "2020-01-01", "employee_id": 1}
+    asset_id = client.post("/assets/batch", json=[body], headers=admin_headers).get_json()["created"][0]
+    rows = all_pages(client, "/assets/service_due", interval_days=10)
+    row = next(row for row in rows if row["asset_id"] == asset_id)
+    assert row["last_service_date"] is None and row["service_count"] == 0
+    assert row["next_due_date"] == "2020-01-11"
+
+
+def test_due_before_keeps_the_assets_due_by_then(app, client):
+    forecast = expected_rows(app, 365)
+    # half way through the due dates
+    due_before = sorted(row["next_due_date"] for row in forecast)[len(forecast) // 2]
+    rows = all_pages(client, "/assets/service_due", due_before=due_before, interval_days=365, limit=3)
+    assert rows == [row for row in forecast if row["next_due_date"] <= due_before]
+    assert 0 < len(rows) < len(forecast)
+
+
+@pytest.mark.parametrize("params", [{"interval_days": 0}, {"due_before": "soon"}])
+def test_bad_parameters_are_a_bad_request(client, params):
+    assert client.get("/assets/service_due", query_string=params).status_code == 400
+
+
+def test_only_the_service_jobs_of_the_page_are_read(app, client):
+    after = client.get("/assets/service_due", query_string={"limit": 4}).get_json()["next"]
+    with count_queries(app) as statements:
+        body = client.get("/assets/service_due", query_string={"limit": 4, "after": after}).get_json()
+    jobs = [statement for statement in statements if "FROM service_jobs" in statement]
+    # one grouped query, for the 4 assets of the page
+    assert len(jobs) == 1
+    assert "IN (?, ?, ?, ?)" in jobs[0]
+    assert len(body["data"]) == 4
@@ -0,0 +1,9 @@
+def test_pool_stats_need_an_admin(client):
+    assert client.get("/status/pool").status_code == 401
+
+
+def test_pool_stats_report_the_pool_of_this_worker(client, admin_headers):
+    body = client.get("/status/pool", headers=admin_headers).get_json()
+    # SQLite files get a QueuePool, which keeps every count
+    assert body["pool"] == "QueuePool"
+    assert {"size", "checkedin", "checkedout", "overflow", "status"} <= set(body)
@@ -0,0 +1,55 @@
+from datetime import date
+
+from main import db
+from models.asset_summary import AssetSummary
+from models.service_job import ServiceJob
+from utils import summary
+from test_pagination import all_pages
+
+
+def summary_rows(app, rebuild=False):
+    # every row of the summary table, or of a summary made again from scratch
+    with app.app_context():
+        if rebuild:
+            summary.rebuild_summaries(db.session)
+        rows = db.session.scalars(db.select(AssetSummary).order_by(AssetSummary.asset_id)).all()
+        result = [{column.key: getattr(row, column.key) for column in AssetSummary.__table__.columns} for row in rows]
+        db.session.rollback()
+        return result
+
+
+def test_summary_is_made_with_the_seeded_rows(app, client):
+    rows = summary_rows(app)
+    assert len(rows) == 13
+    assert rows == summary_rows(app, rebuild=True)
+    assert len(all_pages(client, "/assets/summary", limit=5)) == 13
+
+
+def test_writes_keep_the_summary_up_to_date(app, client, admin_headers):
+    department = {"department_name": "Renamed", "building_number": "6", "address": "10 Glen drive, Melbourne, VIC"}
+    assert client.put("/departments/1/", json=department, headers=admin_headers).status_code == 200
+    asset = {"asset_name": "Renamed", "serial_number": "a3546", "date_purchased": "2009-03-15", "employee_id": 2}
+    assert client.put("/assets/1/", json=asset, headers=admin_headers).status_code == 200
+    assert client.put("/assets/batch", json=[{"asset_id": 2, "employee_id": 3}], headers=admin_headers).status_code == 200
+    assert client.delete("/manufacturers/1/", headers=admin_headers).status_code == 200
+    with app.app_context():
+        db.session.add(ServiceJob(service_description="Repair", service_date=date(2030, 1, 1), asset_id=3))
+        db.session.commit()
+    assert client.delete("/employees/4/", headers=admin_headers).status_code == 200
+
+    rows = summary_rows(app)
+    assert rows == summary_rows(app, rebuild=True)
+    by_id = {row["asset_id"]: row for row in rows}
+    assert by_id[1]["asset_name"] == "Renamed" and by_id[1]["employee_id"] == 2
+    assert by_id[2]["employee_id"] == 3
+    assert by_id[3]["last_service_date"] == date(2030, 1, 1)
+    assert "Renamed" in {row["department_name"] for row in rows}
+
+
+def test_rebuild_summary_command(app):
+    with app.app_context():
+        db.session.execute(db.delete(AssetSummary))
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=["db", "rebuild-summary"])
+    assert result.exit_code == 0, result.output
+    assert len(summary_rows(app)) == 13
@@ -0,0 +1,194 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from flask import request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from main import db
+
+# the asyncio driver used for each database
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+# blueprints whose GET requests run on the async engine. /search stays on the threads, its in-process
+# index holds a lock while it reads from the database which would stop the event loop
+ASYNC_BLUEPRINTS = {"departments", "employees", "assets", "service_jobs", "manufacturers", "reports", "changes"}
+# where the WSGI environ carries the session of a request served on the async engine
+SESSION_KEY = "sqlalchemy.async_session"
+
+
+def async_url(url):
+    # the database url with the sync driver swapped for the asyncio one, e.g. postgresql+asyncpg://
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError("No asyncio driver for %s, set ASYNC_DATABASE_URL" % url.get_backend_name())
+    return url.set(drivername="%s+%s" % (url.get_backend_name(), driver))
+
+
+def make_environ(scope, body):
+    # the WSGI environ of an ASGI http request
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope["http_version"],
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        # repeated headers are joined as one, like a WSGI server does
+        environ[key] = environ[key] + "," + value if key in environ else value
+    # the whole body has been read, also when it came chunked without a length
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def start_message(status, headers):
+    return {
+        "type": "http.response.start",
+        "status": int(status.split(" ", 1)[0]),
+        "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+    }
+
+
+def buffered(app, environ):
+    # run the WSGI app and read the whole response, returns the start message and the body
+    started = []
+    iterable = app(environ, lambda status, headers, exc_info=None: started.append(start_message(status, headers)))
+    try:
+        body = b"".join(iterable)
+    finally:
+        # the app context, and with it the session, is torn down when the response is closed
+        if hasattr(iterable, "close"):
+            iterable.close()
+    return started[-1], body
+
+
+def streamed(app, environ, send, loop):
+    # run the WSGI app in this thread and hand each chunk to the event loop as it is made, waiting for
+    # every send so a slow client holds back a big export instead of it piling up in memory
+    def send_now(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    started = []
+    iterable = app(environ, lambda status, headers, exc_info=None: started.append(start_message(status, headers)))
+    try:
+        sent_start = False
+        for chunk in iterable:
+            if not chunk:
+                continue
+            if not sent_start:
+                send_now(started[-1])
+                sent_start = True
+            send_now({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not sent_start:
+            send_now(started[-1])
+        send_now({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+def use_async_session():
+    # make db.session the session of the async engine for a request served on it, so the views, models
+    # and schemas run unchanged. It's closed by Flask-SQLAlchemy when the app context ends as usual
+    session = request.environ.get(SESSION_KEY)
+    if session is not None:
+        db.session.registry.set(session)
+
+
+class AsyncApp(object):
+    # ASGI application serving the GET requests of ASYNC_BLUEPRINTS on an asyncio engine and every other
+    # request on a pool of threads with the usual engine
+    def __init__(self, app, engine, threads):
+        self.app = app
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def runs_async(self, environ):
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            return False
+        # exports stream from a database cursor as they are sent, which the threads do
+        if "export" in parse_qs(environ["QUERY_STRING"]):
+            return False
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except (HTTPException, RequestRedirect):
+            # 404s, 405s and redirects are answered by Flask on the threads
+            return False
+        return endpoint.rpartition(".")[0] in ASYNC_BLUEPRINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        body = []
+        while True:
+            message = await receive()
+            body.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        environ = make_environ(scope, b"".join(body))
+        if self.runs_async(environ):
+            # the whole Flask request runs in SQLAlchemy's greenlet, its queries wait on the event loop
+            # instead of blocking it
+            async with AsyncSession(self.engine) as session:
+                start, body = await session.run_sync(self.dispatch, environ)
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, streamed, self.app.wsgi_app, environ, send, loop)
+
+    def dispatch(self, session, environ):
+        environ[SESSION_KEY] = session
+        return buffered(self.app.wsgi_app, environ)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(app):
+    # wrap the Flask app for an ASGI server, with its own asyncio engine for the read requests
+    url = make_url(app.config.get("ASYNC_DATABASE_URL") or async_url(app.config["SQLALCHEMY_DATABASE_URI"]))
+    options = dict(app.config.get("ASYNC_ENGINE_OPTIONS", {}))
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # keep SQLite connections open too, aiosqlite starts a thread for every new one
+        options.setdefault("poolclass", AsyncAdaptedQueuePool)
+    engine = create_async_engine(url, **options)
+    app.before_request_funcs.setdefault(None, []).insert(0, use_async_session)
+    from utils.metrics import watch_pool
+    watch_pool(engine.sync_engine)
+    return AsyncApp(app, engine, app.config["ASGI_THREADS"])
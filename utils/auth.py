@@ -0,0 +1,52 @@
+import time
+from functools import wraps
+from flask import jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from main import db
+from models.users import User
+from utils import tracking
+
+# user id -> (admin flag, time.monotonic() it was read), so a run of writes by one admin reads the users table once
+_admin_flags = {}
+
+
+def admin_claims(user):
+    # the admin flag is carried in the token, so the tokens of other users are refused without a query
+    return {"admin": bool(user.admin)}
+
+
+def forget_admin_flags(changes):
+    # a user written in this worker is read again on their next write, other workers read them again once
+    # their flag is ADMIN_CHECK_SECONDS old
+    for change in changes:
+        if change.table == User.__tablename__:
+            if change.key is None:
+                _admin_flags.clear()
+            else:
+                _admin_flags.pop(str(change.key), None)
+
+tracking.commit_handlers.append(forget_admin_flags)
+
+
+def is_admin(identity):
+    # whether the user is (still) an admin in the database, not only when their token was issued
+    entry = _admin_flags.get(identity)
+    now = time.monotonic()
+    if entry is None or now - entry[1] >= current_app.config["ADMIN_CHECK_SECONDS"]:
+        user = db.session.get(User, int(identity))
+        entry = _admin_flags[identity] = (bool(user is not None and user.admin), now)
+    return entry[0]
+
+
+def admin_required(fn):
+    # only let the request through with a valid token issued to a user who is an admin
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request()
+        # tokens issued before the claim existed have no admin flag and are treated as not admin.
+        # A token with the flag is checked against the users table, so a user who was demoted or deleted
+        # loses access before their token expires
+        if not get_jwt().get("admin", False) or not is_admin(get_jwt_identity()):
+            return jsonify({'error': 'Unauthorised user'}),401
+        return fn(*args, **kwargs)
+    return wrapper
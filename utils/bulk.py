@@ -0,0 +1,200 @@
+from flask import current_app, request, abort
+from sqlalchemy import inspect, insert, update, delete, select
+from sqlalchemy.exc import DataError, IntegrityError
+from main import db
+from utils import tracking
+from utils.pagination import is_key
+
+# the message reported for an item the database refused, like the single item endpoints
+DB_ERRORS = {
+    IntegrityError: "Item could not be saved, please check details again",
+    DataError: "Please check that correct type of data has been entered",
+}
+
+
+# the statements below record their own changes with exact keys (see record_changes),
+# so the session tracker doesn't record them again as unknown rows
+RECORDED = {"changes_recorded": True}
+
+
+def chunks(items, size):
+    # split a list into consecutive lists of at most size items
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def same_fields(items):
+    # the items split by the fields they have, in the order of the request - an executemany takes its columns
+    # from the first item, so items with other fields have to go in a statement of their own
+    groups = {}
+    for index, fields in items:
+        groups.setdefault(frozenset(fields), []).append((index, fields))
+    return list(groups.values())
+
+
+def primary_key(model):
+    return inspect(model).primary_key[0]
+
+
+def foreign_keys(model):
+    return list(model.__table__.foreign_keys)
+
+
+def references(model, values):
+    # the (table, primary key) of the rows a row's foreign keys point to, from a dict or row of its values
+    return frozenset((foreign_key.column.table.name, values[foreign_key.parent.key])
+                     for foreign_key in foreign_keys(model) if values.get(foreign_key.parent.key) is not None)
+
+
+def record_changes(model, op, rows):
+    # tell the table versions, read cache and other trackers exactly which rows changed,
+    # rows are (primary key, references) pairs
+    tracking.record(db.session, [tracking.Change(model.__tablename__, key, op, refs) for key, refs in rows])
+
+
+def batch_items():
+    # get the array of items from the request body, never more than the configured maximum
+    items = request.json
+    if not isinstance(items, list):
+        return abort(400, description="Expected a JSON array")
+    if len(items) > current_app.config["BATCH_MAX_ITEMS"]:
+        return abort(400, description="No more than %d items can be sent at once" % current_app.config["BATCH_MAX_ITEMS"])
+    return items
+
+
+def batch_ids():
+    # get the list of ids to delete from the request body
+    body = request.json
+    ids = body.get("ids") if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(is_key(id) for id in ids):
+        return abort(400, description="Expected {\"ids\": [...]} with a list of integer ids")
+    if len(ids) > current_app.config["BATCH_MAX_ITEMS"]:
+        return abort(400, description="No more than %d ids can be sent at once" % current_app.config["BATCH_MAX_ITEMS"])
+    return ids
+
+
+def validate_items(schema, model, items, require_key=False):
+    # validate the whole array at once with the many=True schema, then keep (index, fields) for every good item
+    # and the error messages of every bad item under its index in the request
+    errors = schema.validate(items)
+    pk = primary_key(model)
+    required = [column.key for column in model.__table__.columns
+                if not column.nullable and not column.primary_key and column.default is None
+                and column.server_default is None]
+    valid = []
+    for index, item in enumerate(items):
+        if index in errors:
+            continue
+        # the database numbers new rows, a key sent with one would be left out or clash with another row
+        if not require_key and pk.key in item:
+            errors[index] = {pk.key: ["Set by the database, leave it out when creating."]}
+            continue
+        # an update only needs the primary key, a new row needs every column that can't be null
+        required_fields = [pk.key] if require_key else required
+        missing = [field for field in required_fields if field not in item]
+        if missing:
+            errors[index] = {field: ["Missing data for required field."] for field in missing}
+            continue
+        valid.append((index, item))
+    loaded = schema.load([item for _, item in valid]) if valid else []
+    return [(index, fields) for (index, _), fields in zip(valid, loaded)], errors
+
+
+def bulk_insert(model, items, errors):
+    # insert the items one chunk at a time, each chunk in its own transaction with one executemany per set of
+    # fields the items have. If the database refuses a chunk it is retried row by row so only the bad rows are reported
+    pk = primary_key(model)
+    statement = insert(model.__table__).returning(pk)
+    created = []
+    for chunk in chunks(items, current_app.config["BATCH_CHUNK_SIZE"]):
+        try:
+            keys = {}
+            for group in same_fields(chunk):
+                rows = db.session.scalars(statement, [fields for _, fields in group], execution_options=RECORDED).all()
+                keys.update(zip([index for index, _ in group], rows))
+            record_changes(model, "insert", [(keys[index], references(model, fields)) for index, fields in chunk])
+            db.session.commit()
+            created.extend(keys[index] for index, _ in chunk)
+            continue
+        except (IntegrityError, DataError):
+            db.session.rollback()
+        for index, fields in chunk:
+            try:
+                with db.session.begin_nested():
+                    key = db.session.scalar(statement, [fields], execution_options=RECORDED)
+                record_changes(model, "insert", [(key, references(model, fields))])
+                created.append(key)
+            except (IntegrityError, DataError) as e:
+                errors[index] = DB_ERRORS[type(e)]
+        db.session.commit()
+    return created
+
+
+def bulk_update(model, items, errors):
+    # update the items by primary key one chunk at a time, in the same way as bulk_insert
+    pk = primary_key(model)
+    updated = []
+    for chunk in chunks(items, current_app.config["BATCH_CHUNK_SIZE"]):
+        # report the items that don't exist instead of silently skipping them,
+        # and keep the rows the existing ones point to before the update
+        existing = {row[0]: references(model, row._mapping) for row in db.session.execute(
+            select(pk, *[foreign_key.parent for foreign_key in foreign_keys(model)])
+            .where(pk.in_([fields[pk.key] for _, fields in chunk]))
+        )}
+        rows = []
+        for index, fields in chunk:
+            if fields[pk.key] in existing:
+                rows.append((index, fields))
+            else:
+                errors[index] = "%s does not exist" % model.__name__
+        if not rows:
+            continue
+        try:
+            db.session.execute(update(model), [fields for _, fields in rows], execution_options=RECORDED)
+            record_changes(model, "update", [(fields[pk.key], existing[fields[pk.key]] | references(model, fields)) for _, fields in rows])
+            db.session.commit()
+            updated.extend(fields[pk.key] for _, fields in rows)
+            continue
+        except (IntegrityError, DataError):
+            db.session.rollback()
+        for index, fields in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(update(model), [fields], execution_options=RECORDED)
+                record_changes(model, "update", [(fields[pk.key], existing[fields[pk.key]] | references(model, fields))])
+                updated.append(fields[pk.key])
+            except (IntegrityError, DataError) as e:
+                errors[index] = DB_ERRORS[type(e)]
+        db.session.commit()
+    return updated
+
+
+def cascade_delete(model, condition):
+    # delete the rows matching the condition, first following every relationship declared with a delete cascade
+    # so the same rows go as when the ORM deletes one object at a time. Returns the primary keys deleted
+    pk = primary_key(model)
+    rows = db.session.execute(select(pk, *[foreign_key.parent for foreign_key in foreign_keys(model)]).where(condition)).all()
+    if not rows:
+        return []
+    ids = [row[0] for row in rows]
+    for relationship in inspect(model).relationships:
+        if not relationship.cascade.delete:
+            continue
+        foreign_key = next(iter(relationship.remote_side))
+        cascade_delete(relationship.mapper.class_, foreign_key.in_(ids))
+    db.session.execute(delete(model).where(pk.in_(ids)), execution_options=dict(RECORDED, synchronize_session=False))
+    record_changes(model, "delete", [(row[0], references(model, row._mapping)) for row in rows])
+    return ids
+
+
+def bulk_delete(model, ids):
+    # delete the ids one chunk at a time, each chunk in its own transaction, and report the ones that don't exist
+    pk = primary_key(model)
+    deleted = []
+    for chunk in chunks(ids, current_app.config["BATCH_CHUNK_SIZE"]):
+        existing = cascade_delete(model, pk.in_(chunk))
+        if existing:
+            db.session.commit()
+        deleted.extend(existing)
+    missing = sorted(set(ids) - set(deleted))
+    return deleted, missing
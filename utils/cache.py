@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, g
+from utils import tracking
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class NullCache(object):
+    # used when caching is turned off, nothing is ever stored
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class SimpleCache(object):
+    # in-process least recently used cache with a time to live, every entry is filed under its tags
+    # so writes can drop exactly the entries they affect
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                for key in self.tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCache(object):
+    # cache shared by every worker, entries expire on their own and each tag is a set of the keys filed under it
+    def __init__(self, url, ttl, prefix="read-cache:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND is redis but the redis package is not installed, pip install -r requirements.txt")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, tags):
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, value, ex=self.ttl)
+        for tag in tags:
+            pipeline.sadd(self.prefix + "tag:" + tag, key)
+            pipeline.expire(self.prefix + "tag:" + tag, self.ttl)
+        pipeline.execute()
+
+    def invalidate(self, tags):
+        tag_keys = [self.prefix + "tag:" + tag for tag in tags]
+        if not tag_keys:
+            return
+        pipeline = self.client.pipeline()
+        for tag_key in tag_keys:
+            pipeline.smembers(tag_key)
+        keys = set()
+        for members in pipeline.execute():
+            keys.update(self.prefix + member.decode("utf-8") for member in members)
+        self.client.delete(*(keys | set(tag_keys)))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+# the cache used by the endpoints, replaced by init_cache when the app is created
+read_cache = NullCache()
+
+
+def init_cache(app):
+    # pick the cache backend from the config: "simple" (in-process), "redis" or "null" (off)
+    global read_cache
+    backend = app.config["CACHE_BACKEND"]
+    if backend == "simple":
+        read_cache = SimpleCache(app.config["CACHE_MAX_ENTRIES"], app.config["CACHE_TTL"])
+    elif backend == "redis":
+        read_cache = RedisCache(app.config["CACHE_REDIS_URL"], app.config["CACHE_TTL"])
+    elif backend == "null":
+        read_cache = NullCache()
+    else:
+        raise ValueError("Unknown CACHE_BACKEND: %s" % backend)
+
+
+def table_tag(table):
+    # tag for every row of a table, e.g. "assets" - for responses built from a whole table like the reports
+    return table
+
+
+def row_tag(table, key):
+    # tag for one row, e.g. "assets:4"
+    return "%s:%s" % (table, key)
+
+
+def children_tag(table, key, child_table):
+    # tag for the rows of child_table that point to one row, e.g. "assets:4/service_jobs"
+    return "%s:%s/%s" % (table, key, child_table)
+
+
+def cache_tags(*tags):
+    # file the response being built under these tags, called from inside a cached endpoint
+    g.setdefault("cache_tags", set()).update(tags)
+
+
+def cached(fn):
+    # keep the JSON body of a successful response in the read cache, keyed by the request path and query string
+    # and the ETag utils.etag.conditional made from the table versions - it has to be put above this decorator.
+    # The versions are in the database, so a write made by any worker moves the key and the old entry is never
+    # read again, even from a cache kept in this worker. The endpoint names the rows the response is built from
+    # with cache_tags, and a write to any of them committed here drops it straight away
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.full_path + "#" + g.get("etag", "")
+        body = read_cache.get(key)
+        if body is not None:
+            return current_app.response_class(body, mimetype="application/json")
+        response = current_app.make_response(fn(*args, **kwargs))
+        tags = g.pop("cache_tags", None)
+        # a response read from a replica that's behind is filed under the older table versions it read there
+        if response.status_code == 200 and tags:
+            read_cache.set(key, response.get_data(), tags)
+        return response
+    return wrapper
+
+
+def invalidate_changes(changes):
+    # drop the entries built from the rows changed by a committed transaction
+    tags = set()
+    for change in changes:
+        if change.key is None:
+            # a bulk statement changed rows we can't name, so nothing cached can be trusted
+            read_cache.clear()
+            return
+        tags.add(table_tag(change.table))
+        tags.add(row_tag(change.table, change.key))
+        for table, key in change.references:
+            tags.add(children_tag(table, key, change.table))
+    read_cache.invalidate(tags)
+
+tracking.commit_handlers.append(invalidate_changes)
@@ -0,0 +1,148 @@
+from flask import request, abort
+from sqlalchemy import event, select, insert, func, text
+from sqlalchemy.orm import Session
+from main import db
+from models.change_log import ChangeLogEntry
+from models.departments import Department
+from models.employees import Employee
+from models.assets import Asset
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from schemas.department_schema import department_schema
+from schemas.employee_schema import employee_schema
+from schemas.asset_schema import asset_schema
+from schemas.manufacturer_schema import manufacturer_schema
+from schemas.service_job_schema import service_job_schema
+from utils import tracking
+from utils.includes import Relation, load_related
+from utils.pagination import encode_cursor, decode_cursor
+
+# the tables whose changes are logged and sent by /changes, with the schema their rows are sent with
+FEED_TABLES = {
+    "departments": (Department, department_schema),
+    "employees": (Employee, employee_schema),
+    "assets": (Asset, asset_schema),
+    "manufacturers": (Manufacturer, manufacturer_schema),
+    "service_jobs": (ServiceJob, service_job_schema),
+}
+# the PostgreSQL advisory lock the writers of the change log take turns with, any number will do
+# as long as nothing else locks it
+LOG_LOCK = 7305001
+
+# the log rows are written by the handlers below and aren't changes of their own
+tracking.ignored_tables.add(ChangeLogEntry.__tablename__)
+
+
+def collect_changes(session, changes):
+    # keep the changes of the flush for log_changes, with the connection the flush wrote them on - the primary,
+    # also in a request whose reads go to a replica
+    entries = [{"table_name": change.table, "row_id": change.key, "operation": change.op}
+               for change in changes if change.table in FEED_TABLES]
+    if entries:
+        log = session.info.setdefault("change_log", {"connection": session.connection(), "entries": []})
+        log["entries"].extend(entries)
+
+tracking.flush_handlers.append(collect_changes)
+
+
+@event.listens_for(Session, "before_commit")
+def log_changes(session):
+    # add the changes of the transaction to the change log right before it commits, in the same transaction so
+    # they are only seen once it commits. Rows deleted by the ORM cascades are changes like any other, so they
+    # get their tombstone too. On PostgreSQL the rows are added under a lock held until the commit, so a
+    # change_id is never committed after a bigger one a client may already have read past. Taking it here
+    # rather than at the first write means writers only wait for each other's insert and commit, so the log
+    # takes about one commit round trip per writing transaction at a time
+    if session.in_nested_transaction():
+        return
+    # what commit would flush next is flushed first, so its changes are logged too
+    session.flush()
+    log = session.info.pop("change_log", None)
+    if log is None:
+        return
+    connection = log["connection"]
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock)"), {"lock": LOG_LOCK})
+    connection.execute(insert(ChangeLogEntry.__table__), log["entries"])
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changes(session):
+    # a savepoint rolled back keeps the changes of the transaction around it, like utils.bulk's retries need
+    if not session.in_nested_transaction():
+        session.info.pop("change_log", None)
+
+
+def requested_tables():
+    # get the tables asked for with the type parameter, e.g. type=assets,service_jobs, all of them without it
+    value = request.args.get("type")
+    if not value:
+        return list(FEED_TABLES)
+    tables = [name.strip() for name in value.split(",") if name.strip()]
+    if any(name not in FEED_TABLES for name in tables):
+        return abort(400, description="type must be one or more of: " + ", ".join(FEED_TABLES))
+    return tables
+
+
+def requested_position():
+    # get the change_id the since token stands for, None without one
+    since = request.args.get("since")
+    if not since:
+        return None
+    position = decode_cursor(since)
+    if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+        return abort(400, description="Invalid since token")
+    return position
+
+
+def last_position():
+    return db.session.scalar(select(func.max(ChangeLogEntry.change_id))) or 0
+
+
+def changed_rows(table, written, deleted):
+    # the rows as they are now of the written keys, and the keys that are deleted - including the written rows
+    # that are gone already, whose delete comes later in the log
+    model, schema = FEED_TABLES[table]
+    key = model.__mapper__.primary_key[0]
+    rows = load_related(Relation(model, schema, key, key.key), written) if written else []
+    found = {row[key.key] for row in rows}
+    return rows, sorted(deleted | {id for id in written if id not in found})
+
+
+def changes_since(position, tables, limit):
+    # the delta after the position - limit log entries read in order, only the last change of each row kept,
+    # and the current rows read with one query per table. next is the token of the last entry read and more
+    # says whether there are entries after it. Has to be sent with utils.serialization.json_response
+    entries = db.session.execute(
+        select(ChangeLogEntry.change_id, ChangeLogEntry.table_name, ChangeLogEntry.row_id, ChangeLogEntry.operation)
+        .where(ChangeLogEntry.change_id > position, ChangeLogEntry.table_name.in_(tables))
+        .order_by(ChangeLogEntry.change_id)
+        .limit(limit + 1)
+    ).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries and position > last_position():
+        # the token is from another change log, e.g. before the database was made again
+        return abort(410, description="The since token is no longer valid, download everything again")
+    operations = {}
+    reset = set()
+    for entry in entries:
+        if entry.row_id is None:
+            reset.add(entry.table_name)
+        else:
+            operations[(entry.table_name, entry.row_id)] = entry.operation
+    changes = {}
+    for table in tables:
+        written = {id for (name, id), operation in operations.items() if name == table and operation != "delete"}
+        deleted = {id for (name, id), operation in operations.items() if name == table and operation == "delete"}
+        if not written and not deleted:
+            continue
+        rows, deleted = changed_rows(table, written, deleted)
+        changes[table] = {"upserted": rows, "deleted": deleted}
+    return {
+        "changes": changes,
+        # tables a bulk statement changed without naming the rows, to be downloaded again in full
+        "reset": [table for table in tables if table in reset],
+        "next": encode_cursor(entries[-1].change_id if entries else position),
+        "more": more,
+    }
@@ -0,0 +1,61 @@
+import hashlib
+from datetime import date
+from functools import wraps
+from flask import current_app, request, make_response, g
+from sqlalchemy import event, select, update, insert
+from main import db
+from models.table_version import TableVersion
+from utils import tracking
+from utils.includes import included_models
+
+
+def bump_versions(session, changes):
+    # add one to the version of every table changed in this flush, as part of the same transaction
+    connection = session.connection()
+    versions = TableVersion.__table__
+    for table in sorted({change.table for change in changes}):
+        result = connection.execute(
+            update(versions).where(versions.c.table_name == table).values(version=versions.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(versions).values(table_name=table, version=1))
+
+tracking.flush_handlers.append(bump_versions)
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def add_version_rows(target, connection, **kw):
+    # start every table at version 0 when the tables are created
+    tables = [name for name in target.metadata.tables if name != target.name]
+    connection.execute(insert(target), [{"table_name": name, "version": 0} for name in tables])
+
+
+def conditional(*models, includes=None, daily=False):
+    # give the GET endpoint a strong ETag made from the request and the versions of the tables its response is
+    # built from, and answer 304 Not Modified without running the endpoint when the client already has it.
+    # includes is the model whose related rows the include parameter can add to the response (see utils.includes),
+    # daily is for responses worked out from today's date, whose ETag has to change when the day does
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            built_from = set(models) | (included_models(includes) if includes is not None else set())
+            tables = sorted(model.__tablename__ for model in built_from)
+            versions = dict(db.session.execute(
+                select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+            ).all())
+            state = request.full_path + "|" + ",".join("%s=%d" % (table, versions.get(table, 0)) for table in tables)
+            if daily:
+                state += "|" + date.today().isoformat()
+            etag = hashlib.sha1(state.encode("utf-8")).hexdigest()
+            # the read cache files the response under it too, see utils.cache.cached
+            g.etag = etag
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
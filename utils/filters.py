@@ -0,0 +1,44 @@
+import operator
+from datetime import date
+from flask import request, abort
+
+# the comparison used for each kind of filter
+OPERATORS = {
+    "eq": operator.eq,
+    "ge": operator.ge,
+    "le": operator.le,
+}
+
+
+def parse_value(column, value, name):
+    # convert a value from the query string (or a cursor) to the python type of the column
+    try:
+        if column.type.python_type is date:
+            return value if isinstance(value, date) else date.fromisoformat(value)
+        return column.type.python_type(value)
+    except (TypeError, ValueError):
+        return abort(400, description="Invalid value for " + name)
+
+
+def apply_filters(query, filters):
+    # filters maps a query string parameter to the (column, operator) it filters on,
+    # e.g. {"date_purchased_from": (Asset.date_purchased, "ge")}
+    for name, (column, op) in filters.items():
+        value = request.args.get(name)
+        if value is None:
+            continue
+        query = query.filter(OPERATORS[op](column, parse_value(column, value, name)))
+    return query
+
+
+def sort_column(model, sortable):
+    # get the (column, descending) to sort by from the sort parameter, e.g. sort=-date_purchased.
+    # None means the default order by primary key
+    sort = request.args.get("sort")
+    if not sort:
+        return None
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in sortable:
+        return abort(400, description="sort must be one of: " + ", ".join(sortable))
+    return getattr(model, name), descending
@@ -0,0 +1,118 @@
+from collections import namedtuple
+from flask import request, abort
+from models.departments import Department
+from models.employees import Employee
+from models.assets import Asset
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from schemas.department_schema import department_schema
+from schemas.employee_schema import employee_schema
+from schemas.asset_schema import asset_schema
+from schemas.manufacturer_schema import manufacturer_schema
+from schemas.service_job_schema import service_job_schema
+from utils.serialization import column_fields, column_query, row_dicts
+from utils.cache import cache_tags, table_tag
+
+# rows related to another row that can be included with it - the model and schema of the related rows, the
+# column of theirs matched against the field named source of the rows they are included from
+Relation = namedtuple("Relation", ["model", "schema", "match", "source"])
+
+# what can be included from the rows of each model, by name
+RELATIONS = {
+    Department: {
+        "employees": Relation(Employee, employee_schema, Employee.department_id, "department_id"),
+    },
+    Employee: {
+        "department": Relation(Department, department_schema, Department.department_id, "department_id"),
+        "assets": Relation(Asset, asset_schema, Asset.employee_id, "employee_id"),
+    },
+    Asset: {
+        "employee": Relation(Employee, employee_schema, Employee.employee_id, "employee_id"),
+        "manufacturers": Relation(Manufacturer, manufacturer_schema, Manufacturer.asset_id, "asset_id"),
+        "service_jobs": Relation(ServiceJob, service_job_schema, ServiceJob.asset_id, "asset_id"),
+    },
+}
+# most relations in one include path, e.g. employee.department is 2
+MAX_INCLUDE_DEPTH = 3
+# values in the IN list of one query loading related rows
+INCLUDE_CHUNK_SIZE = 1000
+
+
+def requested_includes(model):
+    # get the include paths asked for with the include parameter, e.g. include=employee,employee.department,
+    # each as a tuple of relation names and together with the paths leading to it, shortest first
+    value = request.args.get("include")
+    if value is None:
+        return []
+    paths = set()
+    for name in value.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        current = model
+        path = ()
+        for part in name.split("."):
+            relations = RELATIONS.get(current, {})
+            if len(path) == MAX_INCLUDE_DEPTH:
+                return abort(400, description="include paths can have at most %d parts" % MAX_INCLUDE_DEPTH)
+            if part not in relations:
+                return abort(400, description="%s can't be included, include one of: %s" % (
+                    name, ", ".join(".".join(path + (known,)) for known in relations)))
+            path += (part,)
+            paths.add(path)
+            current = relations[part].model
+    return sorted(paths, key=lambda path: (len(path), path))
+
+
+def relation_at(model, path):
+    # the relation reached by following the path from the model
+    relation = None
+    for part in path:
+        relation = RELATIONS[model][part]
+        model = relation.model
+    return relation
+
+
+def included_models(model):
+    # the models whose rows the include parameter adds, for the ETag of the response
+    return {relation_at(model, path).model for path in requested_includes(model)}
+
+
+def load_related(relation, values):
+    # the rows matching any of the values, as the dicts the relation's schema makes
+    schema = relation.schema
+    names = column_fields(schema, relation.model)
+    values = sorted(values)
+    rows = []
+    for start in range(0, len(values), INCLUDE_CHUNK_SIZE):
+        query = relation.model.query.filter(relation.match.in_(values[start:start + INCLUDE_CHUNK_SIZE]))
+        if names is not None:
+            rows.extend(row_dicts(column_query(query, relation.model, names).all(), names))
+        else:
+            rows.extend(schema.dump(query.all(), many=True))
+    return rows
+
+
+def include(rows, model):
+    # the rows of every relation asked for with the include parameter, by table and each row only once however
+    # many rows point to it - one query per relation in the paths (per INCLUDE_CHUNK_SIZE values).
+    # None when nothing is to be included. The response has to be sent with utils.serialization.json_response
+    paths = requested_includes(model)
+    if not paths:
+        return None
+    reached = {(): rows}
+    included = {}
+    for path in paths:
+        relation = relation_at(model, path)
+        sources = reached[path[:-1]]
+        if any(relation.source not in row for row in sources):
+            return abort(400, description="include=%s needs the %s field" % (".".join(path), relation.source))
+        values = {row[relation.source] for row in sources if row[relation.source] is not None}
+        reached[path] = load_related(relation, values) if values else []
+        key = relation.model.__mapper__.primary_key[0].key
+        table = included.setdefault(relation.model.__tablename__, {})
+        for row in reached[path]:
+            table[row[key]] = row
+    # a cached response changes with any row of the included tables
+    cache_tags(*[table_tag(name) for name in included])
+    return {name: [table[key] for key in sorted(table)] for name, table in included.items()}
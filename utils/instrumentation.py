@@ -0,0 +1,115 @@
+import json
+import logging
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class TimedJSONProvider(object):
+    # wraps the app's JSON provider and adds the time spent turning responses into JSON to the request timings
+    def __init__(self, provider):
+        self.provider = provider
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.provider.dumps(obj, **kwargs)
+        finally:
+            add_serialize_time(time.perf_counter() - started)
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.provider.response(*args, **kwargs)
+        finally:
+            add_serialize_time(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        # everything else (loads, dump, load, the settings) comes from the real provider
+        return getattr(self.provider, name)
+
+
+def timings():
+    # the counters of the request being handled, None outside a request or when it isn't instrumented
+    if not has_request_context():
+        return None
+    return g.get("timings")
+
+
+def add_serialize_time(seconds):
+    current = timings()
+    if current is not None:
+        current["serialize"] += seconds
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if timings() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = timings()
+    if current is None or not conn.info.get("query_started"):
+        return
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    current["queries"] += 1
+    current["db"] += elapsed
+    if elapsed > current["slowest"]:
+        current["slowest"] = elapsed
+        current["slowest_statement"] = statement
+
+
+def start_timings():
+    g.timings = {"started": time.perf_counter(), "queries": 0, "db": 0.0, "serialize": 0.0,
+                 "slowest": 0.0, "slowest_statement": None}
+
+
+def init_instrumentation(app):
+    # opt-in (INSTRUMENTATION=true) counting and timing of the SQL queries and the JSON serialization of every request.
+    # The numbers are sent back in a Server-Timing header and logged as one JSON line per request
+    if not app.config["INSTRUMENTATION"]:
+        return
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    app.json = TimedJSONProvider(app.json)
+    # the per request lines are logged at INFO, which the app logger drops unless it was told otherwise
+    if app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+    budget = app.config["QUERY_BUDGET"]
+
+    app.before_request(start_timings)
+
+    @app.after_request
+    def report_timings(response):
+        current = g.pop("timings", None)
+        if current is None:
+            return response
+        total = time.perf_counter() - current["started"]
+        # time not spent in the database or serializing - the view code, marshmallow, auth and so on
+        other = max(total - current["db"] - current["serialize"], 0)
+        response.headers.add("Server-Timing", 'db;dur=%.2f;desc="%d queries"' % (current["db"] * 1000, current["queries"]))
+        response.headers.add("Server-Timing", "serialize;dur=%.2f" % (current["serialize"] * 1000))
+        response.headers.add("Server-Timing", "app;dur=%.2f" % (other * 1000))
+        response.headers.add("Server-Timing", "total;dur=%.2f" % (total * 1000))
+        over_budget = current["queries"] > budget
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "queries": current["queries"],
+            "db_ms": round(current["db"] * 1000, 2),
+            "serialize_ms": round(current["serialize"] * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "slowest_query_ms": round(current["slowest"] * 1000, 2),
+            "over_query_budget": over_budget,
+        }
+        if over_budget:
+            # name the slowest statement so the endpoint is easy to look into
+            record["slowest_statement"] = current["slowest_statement"]
+            app.logger.warning(json.dumps(record))
+        else:
+            app.logger.info(json.dumps(record))
+        return response
@@ -0,0 +1,59 @@
+from flask import current_app, request, abort
+from sqlalchemy import any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from main import db
+from utils.bulk import batch_ids
+from utils.serialization import column_fields, column_query, row_dicts
+from utils.projection import project, load_columns
+from utils.includes import RELATIONS, include
+
+
+def requested_ids():
+    # get the ids asked for - {"ids": [...]} in the body of a POST, or ids=1,2,3 in the query string of a GET
+    if request.method == "POST":
+        return batch_ids()
+    try:
+        ids = [int(value) for value in request.args.get("ids", "").split(",") if value.strip()]
+    except ValueError:
+        return abort(400, description="ids must be a comma separated list of integer ids")
+    if len(ids) > current_app.config["BATCH_MAX_ITEMS"]:
+        return abort(400, description="No more than %d ids can be sent at once" % current_app.config["BATCH_MAX_ITEMS"])
+    return ids
+
+
+def key_in(key, ids):
+    # the condition for rows with any of the ids - one array parameter on PostgreSQL, so the statement is the
+    # same however many ids there are, and an IN list anywhere else
+    if db.session.get_bind().dialect.name == "postgresql":
+        return key == any_(bindparam("ids", ids, type_=ARRAY(key.type)))
+    return key.in_(ids)
+
+
+def fetch_by_ids(query, key, schema, ids):
+    # the rows with the given primary keys read with one query, in the order of the ids (each once), and the ids
+    # no row has. Only the fields asked for with the fields parameter are read and sent, like paginate
+    schema = project(schema)
+    model = key.class_
+    wanted = list(dict.fromkeys(ids))
+    names = column_fields(schema, model)
+    if names is not None:
+        # the primary key comes after the sent columns so row_dicts leaves it out when it isn't asked for
+        query = column_query(query, model, names + ([key.key] if key.key not in names else []))
+    else:
+        query = load_columns(query, model, schema)
+    found = {getattr(row, key.key): row for row in query.filter(key_in(key, wanted))} if wanted else {}
+    rows = [found[id] for id in wanted if id in found]
+    data = row_dicts(rows, names) if names is not None else schema.dump(rows)
+    return {"data": data, "missing": [id for id in wanted if id not in found]}
+
+
+def lookup(key, schema):
+    # the response of a fetch by ids, with the related rows asked for with the include parameter. It has to be
+    # sent with utils.serialization.json_response
+    model = key.class_
+    result = fetch_by_ids(model.query, key, schema, requested_ids())
+    if model in RELATIONS:
+        included = include(result["data"], model)
+        if included is not None:
+            result["included"] = included
+    return result
@@ -0,0 +1,85 @@
+import os
+import time
+from flask import g, request
+from sqlalchemy import event
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from main import db
+
+# With PROMETHEUS_MULTIPROC_DIR set (it must be set before the workers start) every worker writes its values
+# to files in that directory and /metrics adds up the files of all the workers, otherwise each process
+# reports only its own values
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time taken to answer a request",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being answered right now",
+    ["blueprint"], multiprocess_mode="livesum",
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Database connections of the pool, by state",
+    ["state"], multiprocess_mode="livesum",
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds", "Time taken to hash or check a password, including the wait for the bcrypt pool",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+BCRYPT_REJECTED = Counter("bcrypt_rejected_total", "Password requests turned away because the bcrypt pool was busy")
+
+
+def watch_pool(engine):
+    # follow the connections of this worker's pool through its events, so the gauges are right without asking the pool
+    checked_out = POOL_CONNECTIONS.labels("checked_out")
+    opened = POOL_CONNECTIONS.labels("open")
+    event.listen(engine, "connect", lambda *args: opened.inc())
+    event.listen(engine, "close", lambda *args: opened.dec())
+    event.listen(engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine, "checkin", lambda *args: checked_out.dec())
+
+
+def start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_blueprint = request.blueprint or ""
+    REQUESTS_IN_PROGRESS.labels(g.metrics_blueprint).inc()
+
+
+def init_metrics(app):
+    # time every request by route and status, and keep count of the requests in progress and the pool's connections
+    app.before_request(start_request)
+    with app.app_context():
+        watch_pool(db.engine)
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            # the rule rather than the path, so /assets/1/ and /assets/2/ are the same route
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_DURATION.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request(error):
+        # runs even when the request failed, so the gauge never drifts upwards
+        blueprint = g.pop("metrics_blueprint", None)
+        if blueprint is not None:
+            REQUESTS_IN_PROGRESS.labels(blueprint).dec()
+
+
+def latest():
+    # the metrics of this worker, or of every worker in multiprocess mode, in the text exposition format
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def worker_exit(pid):
+    # drop the live gauges of a worker that has stopped, called from the gunicorn child_exit hook
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,102 @@
+import base64
+import binascii
+import json
+from flask import current_app, request, abort
+from sqlalchemy import and_, or_
+from utils.filters import parse_value
+from utils.serialization import column_fields, column_query, row_dicts
+from utils.projection import project, load_columns
+
+
+def encode_cursor(value):
+    # turn the position of the last row of a page into an opaque token for the client
+    data = json.dumps(value, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    # turn the token back into the position it was made from
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + padding).decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return abort(400, description="Invalid cursor")
+
+
+def is_key(value):
+    # whether a value decoded from a cursor is a primary key - json gives true and false as bools, which are ints
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def page_limit():
+    # get the page size from the request, never going over the configured maximum
+    limit = request.args.get("limit", current_app.config["PAGE_SIZE"], type=int)
+    if limit < 1:
+        return abort(400, description="limit must be a positive number")
+    return min(limit, current_app.config["MAX_PAGE_SIZE"])
+
+
+def after_position(query, key, sort, after):
+    # only keep the rows that come after the cursor in the page order
+    position = decode_cursor(after)
+    if sort is None:
+        if not is_key(position):
+            return abort(400, description="Invalid cursor")
+        return query.filter(key > position)
+    # with a sort the cursor holds the sort value and the primary key of the last row, the primary key breaks ties
+    if not isinstance(position, list) or len(position) != 2 or not is_key(position[1]):
+        return abort(400, description="Invalid cursor")
+    column, descending = sort
+    if position[0] is None:
+        # the rows without a value come last in either direction (see sort_order), ordered by primary key
+        return query.filter(column.is_(None), key > position[1])
+    value = parse_value(column, position[0], "after")
+    past = column < value if descending else column > value
+    after = or_(past, and_(column == value, key > position[1]))
+    if column.nullable:
+        after = or_(after, column.is_(None))
+    return query.filter(after)
+
+
+def sort_order(sort):
+    # the ORDER BY of the sort before the primary key - nullable columns put their NULLs last both ways, so
+    # every database pages them in the same place as after_position expects
+    column, descending = sort
+    order = column.desc() if descending else column.asc()
+    return order.nulls_last() if column.nullable else order
+
+
+def paginate(query, key, schema, sort=None):
+    # keyset pagination - only the rows after the cursor are read, ordered by the sort column
+    # (see utils.filters.sort_column) and then the primary key.
+    # When the schema only dumps plain columns they are read as rows, skipping the ORM objects and marshmallow,
+    # and the page has to be sent with utils.serialization.json_response.
+    # Only the fields asked for with the fields parameter are read and sent (see utils.projection)
+    schema = project(schema)
+    model = key.class_
+    sort_key = sort[0] if sort else None
+    names = column_fields(schema, model)
+    if names is not None:
+        # the primary key and sort column are read for the cursor even when they aren't sent,
+        # they come after the sent columns so row_dicts leaves them out
+        extra = [column.key for column in (key, sort_key) if column is not None and column.key not in names]
+        query = column_query(query, model, names + extra)
+    else:
+        query = load_columns(query, model, schema, sort_key)
+    limit = page_limit()
+    after = request.args.get("after")
+    if after:
+        query = after_position(query, key, sort, after)
+    if sort is None:
+        query = query.order_by(key)
+    else:
+        query = query.order_by(sort_order(sort), key)
+    # read one extra row to know if there is another page
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = getattr(rows[-1], key.key)
+        next_cursor = encode_cursor(last if sort is None else [getattr(rows[-1], sort[0].key), last])
+    data = row_dicts(rows, names) if names is not None else schema.dump(rows)
+    return {"data": data, "next": next_cursor}
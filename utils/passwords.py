@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt as bcrypt_lib
+from flask import current_app, abort
+from utils.metrics import BCRYPT_DURATION, BCRYPT_REJECTED
+
+# the pool of processes doing the bcrypt work and the number of requests allowed to wait for it,
+# both made the first time a password is hashed in this worker
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _hash(password, rounds, prefix):
+    return bcrypt_lib.hashpw(password, bcrypt_lib.gensalt(rounds, prefix)).decode("utf-8")
+
+
+def _check(password_hash, password):
+    return bcrypt_lib.checkpw(password, password_hash)
+
+
+def _run(operation, fn, *args):
+    # run the bcrypt function and record how long it took, waiting for the pool included
+    started = time.perf_counter()
+    try:
+        return _submit(fn, *args)
+    finally:
+        BCRYPT_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+def _submit(fn, *args):
+    # run the bcrypt function in the process pool so it can't hold the CPU this worker needs for other requests.
+    # With BCRYPT_POOL_SIZE = 0 it runs in the request thread instead
+    global _pool, _slots
+    size = current_app.config["BCRYPT_POOL_SIZE"]
+    if not size:
+        return fn(*args)
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=size)
+            _slots = threading.BoundedSemaphore(current_app.config["BCRYPT_MAX_PENDING"])
+    # don't let a burst of logins queue up without limit, turn them away once the queue is full
+    if not _slots.acquire(timeout=current_app.config["BCRYPT_QUEUE_TIMEOUT"]):
+        BCRYPT_REJECTED.inc()
+        return abort(503, description="Server busy, please try again")
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    # hash a password at the configured cost, the same format as flask_bcrypt
+    rounds = current_app.config["BCRYPT_LOG_ROUNDS"]
+    prefix = current_app.config.get("BCRYPT_HASH_PREFIX", "2b").encode("utf-8")
+    return _run("hash", _hash, password.encode("utf-8"), rounds, prefix)
+
+
+def check_password(password_hash, password):
+    return _run("check", _check, password_hash.encode("utf-8"), password.encode("utf-8"))
+
+
+def needs_rehash(password_hash):
+    # the cost is stored in the hash itself, e.g. $2b$12$...
+    return int(password_hash.split("$")[2]) != current_app.config["BCRYPT_LOG_ROUNDS"]
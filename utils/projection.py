@@ -0,0 +1,45 @@
+from flask import request, abort
+from sqlalchemy.orm import load_only
+
+# the narrowed copies of the schemas, one per schema class, set of fields and many
+_projections = {}
+
+
+def requested_fields(schema):
+    # get the fields asked for with the fields parameter, e.g. fields=asset_id,asset_name, checked against
+    # the fields the schema exposes. None means every field
+    value = request.args.get("fields")
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    exposed = schema.opts.fields
+    unknown = [name for name in names if name not in exposed]
+    if not names or unknown:
+        return abort(400, description="fields must be a comma separated list of: " + ", ".join(exposed))
+    # in the schema's order, without repeats, so the same fields always give the same schema
+    return tuple(name for name in exposed if name in names)
+
+
+def project(schema):
+    # the schema narrowed to the requested fields with only=, or the schema itself when all of them are wanted
+    fields = requested_fields(schema)
+    if fields is None:
+        return schema
+    key = (type(schema), fields, schema.many)
+    projection = _projections.get(key)
+    if projection is None:
+        projection = _projections[key] = type(schema)(only=fields, many=schema.many)
+    return projection
+
+
+def column_options(model, schema, *extra):
+    # the loader option reading only the columns the schema dumps, plus any extra columns the caller needs
+    # (the primary key always is), e.g. for db.session.get(model, id, options=[...])
+    columns = [getattr(model, name) for name in schema.dump_fields if name in model.__table__.columns]
+    columns.extend(column for column in extra if column is not None)
+    return load_only(*columns)
+
+
+def load_columns(query, model, schema, *extra):
+    # only load the columns the schema dumps, plus any extra columns the caller needs
+    return query.options(column_options(model, schema, *extra))
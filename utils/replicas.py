@@ -0,0 +1,227 @@
+import itertools
+import math
+import os
+import threading
+import time
+from flask import request, g, has_request_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_sqlalchemy.session import Session
+from jwt.exceptions import PyJWTError
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from utils import tracking
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# the bind key of each replica in SQLALCHEMY_BINDS is this followed by its number, e.g. replica_0
+REPLICA_PREFIX = "replica_"
+
+
+class RoutingSession(Session):
+    # db.session: the statements of a request routed to a replica go there, flushes always go to the primary
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if bind is None and replica is not None and not self._flushing:
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replicas(object):
+    # the replica engines handed out round robin, skipping the ones that are down. Each process checks the
+    # replicas with SELECT 1 every interval seconds in a thread of its own, so a request never waits on a check,
+    # and a replica is marked down as soon as a connection to it fails
+    def __init__(self, engines, interval):
+        self.engines = engines
+        self.names = sorted(engines)
+        self.interval = interval
+        self.healthy = {name: False for name in self.names}
+        self.checked = {name: 0.0 for name in self.names}
+        self.turn = itertools.count()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.pid = None
+        for name, engine in engines.items():
+            event.listen(engine, "handle_error", self.on_error(name))
+
+    def on_error(self, name):
+        def handle_error(context):
+            # connect failures have no connection yet, dropped connections are disconnects
+            if context.is_disconnect or context.connection is None:
+                self.healthy[name] = False
+                self.checked[name] = time.monotonic()
+        return handle_error
+
+    def check(self, name):
+        try:
+            with self.engines[name].connect() as connection:
+                connection.execute(text("SELECT 1"))
+            self.healthy[name] = True
+        except SQLAlchemyError:
+            self.healthy[name] = False
+        self.checked[name] = time.monotonic()
+
+    def check_all(self):
+        for name in self.names:
+            self.check(name)
+
+    def start(self):
+        # the checker thread of this process, started on first use so every worker forked from a preloaded app
+        # runs its own (threads don't survive a fork)
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self.run, name="replica-health", daemon=True).start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.check_all()
+
+    def stop(self):
+        self.stopped.set()
+
+    def pick(self):
+        # the next healthy replica, None when they are all down
+        self.start()
+        for _ in self.names:
+            name = self.names[next(self.turn) % len(self.names)]
+            if self.healthy[name]:
+                return name
+        return None
+
+    def status(self):
+        now = time.monotonic()
+        return [{"name": name, "healthy": self.healthy[name], "checked_seconds_ago": round(now - self.checked[name], 1)
+                 if self.checked[name] else None} for name in self.names]
+
+
+class LocalWrites(object):
+    # when each user last wrote, known only to this worker - a request on another worker goes by the cookie
+    def __init__(self):
+        self.times = {}
+
+    def wrote(self, identity, at):
+        self.times[identity] = at
+
+    def last_write(self, identity):
+        return self.times.get(identity)
+
+
+class RedisWrites(object):
+    # when each user last wrote, shared by every worker, an entry expires once it's out of the sticky window
+    def __init__(self, url, seconds, prefix="recent-write:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND is redis but the redis package is not installed, pip install -r requirements.txt")
+        self.client = redis.Redis.from_url(url)
+        self.seconds = max(1, math.ceil(seconds))
+        self.prefix = prefix
+
+    # Redis being down leaves the cookie to keep the client on the primary, rather than failing the request
+    def wrote(self, identity, at):
+        try:
+            self.client.set(self.prefix + identity, repr(at), ex=self.seconds)
+        except redis.RedisError:
+            pass
+
+    def last_write(self, identity):
+        try:
+            value = self.client.get(self.prefix + identity)
+        except redis.RedisError:
+            return None
+        return float(value) if value is not None else None
+
+
+# set up by init_replicas when the app has replicas
+replicas = None
+
+# the cookie holding the time of the client's last write, sent back while it is within the sticky window
+WRITE_COOKIE = "recent_write"
+
+
+def log_writes(changes):
+    # note the time of a write committed by a request, remember_write records it when the response goes out
+    if replicas is None or not has_request_context():
+        return
+    g.wrote_at = time.time()
+
+tracking.commit_handlers.append(log_writes)
+
+
+def request_identity():
+    # the user of the request's token, None without a valid one
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    identity = get_jwt_identity()
+    return str(identity) if identity is not None else None
+
+
+def recently_wrote(seconds, writes):
+    # whether the client wrote in the last seconds, whichever worker the write went to - by its cookie, or for
+    # a client that doesn't keep cookies by the user of its token in the writes store
+    try:
+        if time.time() - float(request.cookies.get(WRITE_COOKIE, "")) < seconds:
+            return True
+    except ValueError:
+        pass
+    identity = request_identity()
+    wrote_at = writes.last_write(identity) if identity is not None else None
+    return wrote_at is not None and time.time() - wrote_at < seconds
+
+
+def init_replicas(app):
+    # send the GET requests to the replicas in REPLICA_URLS, except for a client that wrote in the last
+    # REPLICA_STICKY_SECONDS so it reads its own writes
+    global replicas
+    from main import db
+    if replicas is not None:
+        replicas.stop()
+        replicas = None
+    with app.app_context():
+        engines = {key: engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_PREFIX)}
+    if not engines:
+        return
+    pool = replicas = Replicas(engines, app.config["REPLICA_HEALTH_INTERVAL"])
+    # the first check is made while the app starts, the checker thread keeps it up to date after that
+    pool.check_all()
+    seconds = app.config["REPLICA_STICKY_SECONDS"]
+    # the last writes of the users share the read cache's Redis when it has one
+    if app.config["CACHE_BACKEND"] == "redis":
+        writes = RedisWrites(app.config["CACHE_REDIS_URL"], seconds)
+    else:
+        writes = LocalWrites()
+
+    @app.before_request
+    def route_reads():
+        if request.method not in ("GET", "HEAD"):
+            return
+        session = db.session()
+        # requests served on the async engine of ASGI mode keep to it
+        if not isinstance(session, RoutingSession):
+            return
+        if recently_wrote(seconds, writes):
+            return
+        name = pool.pick()
+        if name is None:
+            return
+        session.info["replica"] = name
+        g.read_replica = name
+
+    @app.after_request
+    def remember_write(response):
+        # the user's next reads stay on the primary, found by the token's identity on every worker sharing the
+        # store and by the cookie that goes with the client
+        wrote_at = g.pop("wrote_at", None)
+        if wrote_at is not None:
+            identity = request_identity()
+            if identity is not None:
+                writes.wrote(identity, wrote_at)
+            response.set_cookie(WRITE_COOKIE, repr(wrote_at), max_age=math.ceil(seconds), httponly=True,
+                                samesite="Lax")
+        return response
@@ -0,0 +1,260 @@
+import bisect
+import heapq
+import re
+import threading
+from array import array
+from functools import lru_cache
+from itertools import repeat
+from flask import current_app, abort
+from sqlalchemy import DDL, event, func, select, or_
+from main import db
+from models.assets import Asset
+from models.employees import Employee
+from models.manufacturer import Manufacturer
+from models.table_version import TableVersion
+from models.change_log import ChangeLogEntry
+# writes the change log the index is brought up to date from
+from utils import changes
+
+# what can be searched - kind: (primary key, columns searched, other columns sent back)
+SOURCES = {
+    "asset": (Asset.asset_id, (Asset.asset_name, Asset.serial_number), ()),
+    "employee": (Employee.employee_id, (Employee.first_name, Employee.last_name, Employee.email_address), ()),
+    "manufacturer": (Manufacturer.manufacturer_id, (Manufacturer.manufacturer_name,), (Manufacturer.asset_id,)),
+}
+# the kind of result each table's rows are
+TABLE_KINDS = {key.table.name: kind for kind, (key, _, _) in SOURCES.items()}
+# rows read from the database at a time while building the in-process index
+LOAD_CHUNK_SIZE = 10000
+
+# the trigram indexes on the searched columns (see the models) need the pg_trgm extension
+event.listen(db.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+
+def words(text):
+    return re.findall(r"[^\W_]+", text.lower())
+
+
+@lru_cache(maxsize=100000)
+def trigrams(text):
+    # the trigrams pg_trgm makes of a text: every word padded with two spaces in front and one behind.
+    # Names repeat a lot (every asset of a manufacturer has the same one) so the sets are kept
+    grams = set()
+    for word in words(text):
+        padded = "  " + word + " "
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def inner_trigrams(text):
+    # the trigrams found in any text containing this one - the ones inside its words, without the padding
+    grams = set()
+    for word in words(text):
+        grams.update(word[index:index + 3] for index in range(len(word) - 2))
+    return grams
+
+
+def similarity(grams, text):
+    # the pg_trgm similarity of two texts - the trigrams they share out of all of theirs
+    other = trigrams(text)
+    union = len(grams | other)
+    return len(grams & other) / union if union else 0.0
+
+
+class MemoryIndex(object):
+    # in-process trigram index of the searched columns, for databases without trigram indexes (SQLite).
+    # It is built from the database on the first search. Before every search the versions of the searched
+    # tables are compared with the ones it was last brought up to date with, and when any worker has changed
+    # them since, the rows named in the change log after its last position are read again
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stale = True
+        self.versions = None
+        self.position = 0
+
+    def clear(self):
+        # every different text of the searched columns of each kind is a value: value number -> (kind, text),
+        # and the primary keys of the rows having it - one int, or a sorted array when several rows share it
+        self.values = []
+        self.keys = []
+        # (kind, text) -> value number
+        self.numbers = {}
+        # trigram -> number of trigrams of a value -> numbers of the values of that size containing it,
+        # as a compact array. The sizes bound the similarity of a value before its trigrams are made
+        self.postings = {}
+        # (kind, primary key) -> column values of the row
+        self.documents = {}
+
+    def add(self, kind, key, values, searched):
+        self.documents[(kind, key)] = values
+        for text in set(values[:searched]):
+            if not text:
+                continue
+            number = self.numbers.get((kind, text))
+            if number is None:
+                number = self.numbers[(kind, text)] = len(self.values)
+                self.values.append((kind, text))
+                self.keys.append(key)
+                grams = trigrams(text)
+                for gram in grams:
+                    posting = self.postings.setdefault(gram, {}).get(len(grams))
+                    if posting is None:
+                        posting = self.postings[gram][len(grams)] = array("I")
+                    posting.append(number)
+                continue
+            keys = self.keys[number]
+            if keys is None:
+                self.keys[number] = key
+            elif isinstance(keys, int):
+                self.keys[number] = array("I", sorted((keys, key)))
+            elif not keys or keys[-1] < key:
+                # the rows are loaded in primary key order, so this is nearly always an append
+                keys.append(key)
+            else:
+                keys.insert(bisect.bisect_left(keys, key), key)
+
+    def remove(self, kind, key):
+        # leave the value in the postings, the search skips values without rows
+        values = self.documents.pop((kind, key), None)
+        if values is None:
+            return
+        for text in set(values[:len(SOURCES[kind][1])]):
+            number = self.numbers.get((kind, text))
+            if number is None:
+                continue
+            keys = self.keys[number]
+            if not isinstance(keys, array):
+                self.keys[number] = None
+                continue
+            index = bisect.bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                del keys[index]
+
+    def load(self, session, kind, keys=None):
+        key, searched, others = SOURCES[kind]
+        statement = select(key, *searched, *others).order_by(key)
+        if keys is not None:
+            statement = statement.where(key.in_(keys))
+        for row in session.execute(statement.execution_options(yield_per=LOAD_CHUNK_SIZE)):
+            self.add(kind, row[0], tuple(row[1:]), len(searched))
+
+    def refresh(self, session):
+        # build the index, or read the rows changed since the last search again. The versions and the log
+        # position are taken before the rows are read, so a write committed meanwhile is read (again) next time
+        versions = dict(session.execute(
+            select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(TABLE_KINDS))
+        ).all())
+        if not self.stale and versions == self.versions:
+            return
+        entries = session.execute(
+            select(ChangeLogEntry.change_id, ChangeLogEntry.table_name, ChangeLogEntry.row_id)
+            .where(ChangeLogEntry.change_id > self.position, ChangeLogEntry.table_name.in_(TABLE_KINDS))
+            .order_by(ChangeLogEntry.change_id)
+        ).all() if not self.stale else []
+        position = entries[-1].change_id if entries else self.position
+        # a bulk statement changed rows that can't be named, start again
+        if self.stale or any(entry.row_id is None for entry in entries):
+            # past some rows the index takes too long and too much memory in every worker to build
+            rows = sum(session.scalar(select(func.count()).select_from(key.table)) for key, _, _ in SOURCES.values())
+            if rows > current_app.config["SEARCH_MEMORY_MAX_ROWS"]:
+                return abort(503, description="%d rows are too many for SEARCH_BACKEND=memory (SEARCH_MEMORY_MAX_ROWS "
+                                              "is %d), use postgres" % (rows, current_app.config["SEARCH_MEMORY_MAX_ROWS"]))
+            position = session.scalar(select(func.max(ChangeLogEntry.change_id))) or 0
+            self.clear()
+            for kind in SOURCES:
+                self.load(session, kind)
+        else:
+            for kind in SOURCES:
+                keys = sorted({entry.row_id for entry in entries if TABLE_KINDS[entry.table_name] == kind})
+                for key in keys:
+                    self.remove(kind, key)
+                for start in range(0, len(keys), LOAD_CHUNK_SIZE):
+                    self.load(session, kind, keys[start:start + LOAD_CHUNK_SIZE])
+        self.stale = False
+        self.versions = versions
+        self.position = position
+
+    def search(self, session, text, kinds, limit):
+        with self.lock:
+            self.refresh(session)
+            postings = [self.postings.get(gram, {}) for gram in inner_trigrams(text)]
+            # every match has all the trigrams of the text, so only the values of the rarest one are checked,
+            # each once however many rows share it
+            candidates = min(postings, key=lambda posting: sum(len(numbers) for numbers in posting.values()))
+            needle = text.lower()
+            grams = trigrams(text)
+            # a value shares at most all the trigrams of the smaller of the two texts, so its similarity can't
+            # be more than the smaller size over the bigger one. The sizes are checked best bound first, until
+            # the bound of the next one is below the score of a full page of results
+            def bound(size):
+                return min(size, len(grams)) / max(size, len(grams)) if size else 0.0
+            levels = {}
+            results = []
+            for size in sorted(candidates, key=bound, reverse=True):
+                if len(results) == limit and bound(size) < results[-1][0]:
+                    break
+                for number in candidates[size]:
+                    kind, value = self.values[number]
+                    keys = self.keys[number]
+                    if kind in kinds and keys is not None and needle in value.lower():
+                        levels.setdefault(similarity(grams, value), []).append((kind, [keys] if isinstance(keys, int) else keys))
+                results = self.page(levels, limit)
+            return results
+
+    def page(self, levels, limit):
+        # best score first and then lowest primary key, a row matching in two columns has the score of the
+        # better one - the sorted keys of each score are merged until the page is full
+        results = []
+        seen = set()
+        for score in sorted(levels, reverse=True):
+            for key, kind in heapq.merge(*[zip(keys, repeat(kind)) for kind, keys in levels[score]]):
+                if (kind, key) in seen:
+                    continue
+                seen.add((kind, key))
+                results.append((score, kind, key, self.documents[(kind, key)]))
+                if len(results) == limit:
+                    return results
+        return results
+
+
+# the index used when searching without PostgreSQL
+memory_index = MemoryIndex()
+
+
+
+def postgres_search(session, text, kinds, limit):
+    # one query per kind, each filtered with ILIKE and ranked by similarity with the pg_trgm indexes
+    pattern = "%" + text.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+    results = []
+    for kind in kinds:
+        key, searched, others = SOURCES[kind]
+        score = func.greatest(*[func.similarity(column, text) for column in searched]) if len(searched) > 1 else func.similarity(searched[0], text)
+        rows = session.execute(
+            select(score.label("score"), key, *searched, *others)
+            .where(or_(*[column.ilike(pattern, escape="!") for column in searched]))
+            .order_by(score.desc(), key).limit(limit)
+        )
+        results.extend((row[0], kind, row[1], tuple(row[2:])) for row in rows)
+    return heapq.nlargest(limit, results, key=lambda result: (result[0], -result[2]))
+
+
+def search(session, text, kinds, limit):
+    # the best matches of the text in the searched columns of the given kinds, as dicts with their score
+    backend = current_app.config["SEARCH_BACKEND"]
+    if backend == "auto":
+        backend = "postgres" if session.get_bind().dialect.name == "postgresql" else "memory"
+    if not inner_trigrams(text):
+        return abort(400, description="q must have a word of at least 3 letters or digits")
+    if backend == "postgres":
+        results = postgres_search(session, text, kinds, limit)
+    elif backend == "memory":
+        results = memory_index.search(session, text, kinds, limit)
+    else:
+        raise ValueError("Unknown SEARCH_BACKEND: %s" % backend)
+    data = []
+    for score, kind, key, values in results:
+        _, searched, others = SOURCES[kind]
+        item = {"type": kind, "id": key, "score": round(score, 4)}
+        item.update(zip([column.key for column in searched + others], values))
+        data.append(item)
+    return data
@@ -0,0 +1,78 @@
+import json
+import time
+from datetime import date
+from flask import current_app
+from marshmallow import fields as ma_fields
+from utils.instrumentation import add_serialize_time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# schema field types that dump a column value unchanged (dates as ISO strings, which the encoders below do too)
+PLAIN_FIELDS = (ma_fields.Inferred, ma_fields.Date)
+
+
+def column_fields(schema, model):
+    # the names of the fields the schema dumps, when every one of them is a plain column of the model,
+    # so rows can be read as tuples and turned into the same dicts the schema makes. None otherwise
+    if not current_app.config["FAST_SERIALIZATION"]:
+        return None
+    columns = model.__table__.columns
+    names = []
+    for name, field in schema.dump_fields.items():
+        if type(field) not in PLAIN_FIELDS or field.attribute or (field.data_key or name) != name:
+            return None
+        if isinstance(field, ma_fields.Date) and field.format not in (None, "iso"):
+            return None
+        if name not in columns:
+            return None
+        names.append(name)
+    return names
+
+
+def column_query(query, model, names):
+    # select only the columns of the fields, as plain rows without making ORM objects
+    return query.with_entities(*[getattr(model, name) for name in names])
+
+
+def row_dicts(rows, names):
+    return [dict(zip(names, row)) for row in rows]
+
+
+def iso_date(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def compact(provider):
+    # the same choice Flask's JSON provider makes for jsonify: indented in debug mode, compact otherwise
+    return not (provider.compact is False or (provider.compact is None and current_app.debug))
+
+
+def dumps(obj, **kwargs):
+    # encode like the app's JSON provider, with dates written as ISO strings instead of HTTP dates
+    provider = current_app.json
+    return json.dumps(obj, default=iso_date, ensure_ascii=provider.ensure_ascii, sort_keys=provider.sort_keys, **kwargs)
+
+
+def json_response(obj):
+    # the response jsonify would make for obj, byte for byte, using orjson when it gives the same bytes:
+    # compact output, sorted keys and only ASCII characters (the standard encoder escapes anything else)
+    provider = current_app.json
+    started = time.perf_counter()
+    body = None
+    if orjson is not None and compact(provider) and provider.sort_keys and provider.ensure_ascii:
+        try:
+            body = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            body = None
+        if body is not None and not body.isascii():
+            body = None
+    if body is None:
+        layout = {"separators": (",", ":")} if compact(provider) else {"indent": 2}
+        body = dumps(obj, **layout) + "\n"
+    add_serialize_time(time.perf_counter() - started)
+    return current_app.response_class(body, mimetype=provider.mimetype)
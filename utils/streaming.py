@@ -0,0 +1,60 @@
+from flask import current_app, request, abort, stream_with_context
+from utils import serialization
+from utils.projection import project, load_columns
+
+# the supported export formats and the content type sent for each
+EXPORT_MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_format():
+    # get the export format from the request, None means a normal paginated response
+    export = request.args.get("export")
+    if export and export not in EXPORT_MIMETYPES:
+        return abort(400, description="export must be one of: " + ", ".join(EXPORT_MIMETYPES))
+    return export
+
+
+def stream_export(query, key, schema, export):
+    # read the rows from a server side cursor in chunks and write each chunk out as soon as it is ready,
+    # so the whole table is never held in memory
+    chunk_size = current_app.config["EXPORT_CHUNK_SIZE"]
+    # read plain column rows instead of ORM objects when the schema allows it, see utils.serialization,
+    # and only the fields asked for with the fields parameter
+    schema = project(schema)
+    model = key.class_
+    names = serialization.column_fields(schema, model)
+    if names is not None:
+        query = serialization.column_query(query, model, names)
+        dumps = serialization.dumps
+        dump = lambda row: dict(zip(names, row))
+    else:
+        query = load_columns(query, model, schema)
+        dumps = current_app.json.dumps
+        dump = schema.dump
+    rows = query.order_by(key).yield_per(chunk_size)
+
+    def generate():
+        separator = "," if export == "json" else "\n"
+        if export == "json":
+            yield "["
+        chunk = []
+        written = False
+        for row in rows:
+            chunk.append(dumps(dump(row)))
+            if len(chunk) == chunk_size:
+                yield (separator if written else "") + separator.join(chunk)
+                written = True
+                chunk = []
+        if chunk:
+            yield (separator if written else "") + separator.join(chunk)
+            written = True
+        # close the array, or end the last line of the NDJSON output
+        if export == "json":
+            yield "]\n"
+        elif written:
+            yield "\n"
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=EXPORT_MIMETYPES[export])
@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+from sqlalchemy import select, delete, insert, func, true, String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from models.assets import Asset
+from models.employees import Employee
+from models.departments import Department
+from models.manufacturer import Manufacturer
+from models.service_job import ServiceJob
+from models.asset_summary import AssetSummary
+from utils import tracking
+
+# the tables the summary rows are made from
+SOURCE_TABLES = {"assets", "employees", "departments", "manufacturers", "service_jobs"}
+# assets refreshed per statement, to keep the IN lists short
+REFRESH_CHUNK_SIZE = 500
+
+# the summary rows are written by the handler below and aren't changes of their own
+tracking.ignored_tables.add(AssetSummary.__tablename__)
+
+
+class join_names(FunctionElement):
+    # the names of a group joined with ", " - string_agg on PostgreSQL, group_concat on SQLite
+    type = String()
+    inherit_cache = True
+
+
+@compiles(join_names)
+def compile_join_names(element, compiler, **kw):
+    return "string_agg(%s, ', ')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(join_names, "sqlite")
+def compile_join_names_sqlite(element, compiler, **kw):
+    return "group_concat(%s, ', ')" % compiler.process(element.clauses, **kw)
+
+
+def summary_select(asset_ids=None):
+    # the summary rows of the given assets (all of them for None), made with one five table join
+    def only(column):
+        return column.in_(asset_ids) if asset_ids is not None else true()
+    services = select(
+        ServiceJob.asset_id,
+        func.max(ServiceJob.service_date).label("last_service_date"),
+        func.count().label("service_count"),
+    ).where(only(ServiceJob.asset_id)).group_by(ServiceJob.asset_id).subquery()
+    makers = select(
+        Manufacturer.asset_id,
+        join_names(Manufacturer.manufacturer_name).label("manufacturer_names"),
+    ).where(only(Manufacturer.asset_id)).group_by(Manufacturer.asset_id).subquery()
+    return select(
+        Asset.asset_id, Asset.asset_name, Asset.serial_number, Asset.asset_type, Asset.date_purchased, Asset.employee_id,
+        (Employee.first_name + " " + Employee.last_name).label("employee_name"),
+        Employee.department_id, Department.department_name,
+        makers.c.manufacturer_names, services.c.last_service_date, func.coalesce(services.c.service_count, 0),
+    ).join(Employee, Employee.employee_id == Asset.employee_id) \
+     .join(Department, Department.department_id == Employee.department_id) \
+     .outerjoin(makers, makers.c.asset_id == Asset.asset_id) \
+     .outerjoin(services, services.c.asset_id == Asset.asset_id) \
+     .where(only(Asset.asset_id))
+
+
+def write_summaries(connection, asset_ids=None):
+    # replace the summary rows of the given assets (all of them for None) with freshly made ones
+    table = AssetSummary.__table__
+    columns = [column.name for column in table.columns]
+    if asset_ids is None:
+        connection.execute(delete(table))
+        connection.execute(insert(table).from_select(columns, summary_select()))
+        return
+    asset_ids = sorted(asset_ids)
+    for start in range(0, len(asset_ids), REFRESH_CHUNK_SIZE):
+        chunk = asset_ids[start:start + REFRESH_CHUNK_SIZE]
+        connection.execute(delete(table).where(table.c.asset_id.in_(chunk)))
+        connection.execute(insert(table).from_select(columns, summary_select(chunk)))
+
+
+def affected_assets(connection, changes):
+    # the ids of the assets whose summary rows the changes touch, None when they can't be known
+    # (a bulk statement changed an unknown set of rows) and every row has to be made again
+    asset_ids = set()
+    employee_ids = set()
+    department_ids = set()
+    for change in changes:
+        if change.table not in SOURCE_TABLES:
+            continue
+        if change.key is None:
+            return None
+        if change.table == "assets":
+            asset_ids.add(change.key)
+        elif change.table == "employees":
+            employee_ids.add(change.key)
+        elif change.table == "departments":
+            department_ids.add(change.key)
+        else:
+            # service jobs and manufacturers change the summary of the assets they point to, before and after
+            asset_ids.update(key for table, key in change.references if table == "assets")
+    # a changed name is copied into the summary of every asset of the employee or department
+    if employee_ids:
+        asset_ids.update(connection.scalars(select(Asset.asset_id).where(Asset.employee_id.in_(employee_ids))))
+    if department_ids:
+        asset_ids.update(connection.scalars(
+            select(Asset.asset_id).join(Employee, Employee.employee_id == Asset.employee_id)
+            .where(Employee.department_id.in_(department_ids))
+        ))
+    return asset_ids
+
+
+def refresh_summaries(session, changes):
+    # bring the summary rows of the changed assets up to date, as part of the same transaction
+    if session.info.get("summary_deferred"):
+        return
+    connection = session.connection()
+    asset_ids = affected_assets(connection, changes)
+    if asset_ids is None or asset_ids:
+        write_summaries(connection, asset_ids)
+
+tracking.flush_handlers.append(refresh_summaries)
+
+
+def rebuild_summaries(session):
+    # make every summary row again from the source tables, returns the number of rows
+    connection = session.connection()
+    write_summaries(connection)
+    return connection.scalar(select(func.count()).select_from(AssetSummary.__table__))
+
+
+@contextmanager
+def deferred(session):
+    # don't keep the summary up to date while loading a lot of rows, rebuild it once at the end instead
+    session.info["summary_deferred"] = True
+    try:
+        yield
+    finally:
+        session.info.pop("summary_deferred", None)
+    rebuild_summaries(session)
+    session.commit()
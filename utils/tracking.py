@@ -0,0 +1,86 @@
+from collections import namedtuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# one changed row - the table name, its primary key (None when a bulk statement changed an unknown set of rows),
+# the operation: "insert", "update" or "delete", and the (table, primary key) of every row its foreign keys
+# point to, before and after the change
+Change = namedtuple("Change", ["table", "key", "op", "references"])
+
+# tables whose own changes are bookkeeping and are never tracked
+ignored_tables = {"table_versions"}
+
+# functions called as handler(session, changes) right after the rows change, inside the same transaction
+flush_handlers = []
+# functions called as handler(changes) once the transaction with the changes has been committed
+commit_handlers = []
+
+
+def record(session, changes):
+    # run the in-transaction handlers and keep the changes until the transaction ends
+    if not changes:
+        return
+    for handler in flush_handlers:
+        handler(session, changes)
+    session.info.setdefault("changes", []).extend(changes)
+
+
+def row_key(instance):
+    key = inspect(instance).mapper.primary_key_from_instance(instance)
+    return key[0] if len(key) == 1 else tuple(key)
+
+
+def row_references(instance):
+    # the rows this one points to through its foreign keys, including the old values of changed foreign keys
+    state = inspect(instance)
+    references = set()
+    for foreign_key in instance.__table__.foreign_keys:
+        history = state.attrs[state.mapper.get_property_by_column(foreign_key.parent).key].history
+        for value in history.sum():
+            if value is not None:
+                references.add((foreign_key.column.table.name, value))
+    return frozenset(references)
+
+
+@event.listens_for(Session, "after_flush")
+def track_flush(session, flush_context):
+    # rows written by the unit of work, including the ones removed by cascades
+    changes = []
+    for op, instances in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for instance in instances:
+            if instance.__table__.name in ignored_tables:
+                continue
+            if op == "update" and not session.is_modified(instance, include_collections=False):
+                continue
+            changes.append(Change(instance.__table__.name, row_key(instance), op, row_references(instance)))
+    record(session, changes)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def track_bulk_statement(orm_execute_state):
+    # rows written by insert/update/delete statements run through the session, unless the caller records
+    # exactly which rows changed itself (e.g. utils.bulk) and says so with the changes_recorded execution option
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    if orm_execute_state.execution_options.get("changes_recorded"):
+        return None
+    table = orm_execute_state.statement.table
+    if table.name in ignored_tables:
+        return None
+    result = orm_execute_state.invoke_statement()
+    op = "insert" if orm_execute_state.is_insert else "update" if orm_execute_state.is_update else "delete"
+    record(orm_execute_state.session, [Change(table.name, None, op, frozenset())])
+    return result
+
+
+@event.listens_for(Session, "after_commit")
+def run_commit_handlers(session):
+    changes = session.info.pop("changes", None)
+    if changes:
+        for handler in commit_handlers:
+            handler(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changes(session):
+    session.info.pop("changes", None)